@@ -0,0 +1,236 @@
+"""
+两阶段分布式批量出图（各分片共用同一色标）：
+    阶段一 scan   流式扫描数据文件（.npy 内存映射分块读取），输出本分片的可合并范围摘要
+           merge  合并各分片摘要得到全局摘要（与分片方式、合并顺序无关）
+    阶段二 render 按全局摘要给出的共享色标渲染本分片
+    run          本机多进程：分片扫描 → 合并 → 分片渲染
+数据文件：.npy（二维 (m, n) 为一张图，三维 (N, m, n) 为 N 张图）或逗号分隔的 .csv
+绘图单元按文件名排序后连续切分，各机器只要拿到同一文件列表即得到一致的分片
+示例：
+    python pizza_plot_batch.py scan data/*.npy --shard 0/4 --percentiles -o shard0.json
+    python pizza_plot_batch.py merge shard*.json -o scale.json
+    python pizza_plot_batch.py render data/*.npy --shard 0/4 --scale scale.json --clip 1 99 --out out/
+"""
+import json
+import time
+import pathlib
+import argparse
+import functools
+import concurrent.futures
+import numpy as np
+from pizza_plot_scale import (
+    DEFAULT_RELATIVE_ACCURACY, RangeSummary, merge_summaries, save_summary, load_summary
+)
+
+DATA_SUFFIXES = ('.npy', '.csv')
+CHUNK_ELEMENTS = 1 << 22  # 扫描时每块约驻留的元素数（float64 约32 MiB）
+
+
+def open_data_file(path):
+    """打开数据文件：.npy 以内存映射方式打开，.csv 整体读入；返回二维或三维数组"""
+    path = pathlib.Path(path)
+    suffix = path.suffix.lower()
+    if suffix == '.npy':
+        data = np.load(path, mmap_mode='r')
+    elif suffix == '.csv':
+        data = np.loadtxt(path, delimiter=',', ndmin=2)
+    else:
+        raise ValueError(f"数据文件需为{DATA_SUFFIXES}之一，当前{path.name}")
+    if data.ndim not in (2, 3):
+        raise ValueError(f"{path.name}维度需为(m, n)或(N, m, n)，当前{data.shape}")
+    return data
+
+
+def list_plot_units(paths):
+    """把数据文件展开为绘图单元 [(路径, 序号)]，二维文件序号为 None；按路径排序保证各分片划分一致"""
+    units = []
+    for path in sorted(pathlib.Path(p) for p in paths):
+        data = open_data_file(path)
+        units.extend([(path, None)] if data.ndim == 2 else [(path, i) for i in range(data.shape[0])])
+    return units
+
+
+def parse_shard(text):
+    """'i/n' → (i, n)，i 从0计"""
+    try:
+        index, total = (int(v) for v in text.split('/'))
+    except ValueError:
+        raise ValueError(f"分片格式需为 序号/总数（如 0/4），当前{text}") from None
+    if not 0 <= index < total:
+        raise ValueError(f"分片序号需在0~{total - 1}之间，当前{index}")
+    return index, total
+
+
+def shard_units(units, index, total):
+    """连续切分：同一三维文件中相邻的图尽量落在同一分片，扫描时可整块读取"""
+    return units[index * len(units) // total:(index + 1) * len(units) // total]
+
+
+def _iter_runs(units):
+    """把同一文件中序号连续的单元合并为 (路径, 起, 止)；二维文件起止为 None"""
+    run = None
+    for path, i in units:
+        if run and i is not None and run[0] == path and run[2] == i:
+            run[2] = i + 1
+            continue
+        if run:
+            yield tuple(run)
+        run = [path, i, None if i is None else i + 1]
+    if run:
+        yield tuple(run)
+
+
+def iter_unit_chunks(units, chunk_elements=CHUNK_ELEMENTS):
+    """按块产出各单元的数据；内存映射数据每次只驻留约 chunk_elements 个元素"""
+    for path, start, stop in _iter_runs(units):
+        data = open_data_file(path)
+        if start is None:
+            start, stop = 0, data.shape[0]  # 二维文件按行分块
+        step = max(1, chunk_elements // max(data[0].size, 1))
+        for s in range(start, stop, step):
+            yield np.asarray(data[s:min(s + step, stop)])
+
+
+def scan_units(units, percentiles=False, relative_accuracy=DEFAULT_RELATIVE_ACCURACY,
+               chunk_elements=CHUNK_ELEMENTS):
+    """阶段一：流式扫描一组绘图单元，返回 RangeSummary"""
+    summary = RangeSummary.empty(percentiles, relative_accuracy)
+    for block in iter_unit_chunks(units, chunk_elements):
+        summary.update(block)
+    return summary
+
+
+def unit_name(path, index, n_plots):
+    return path.stem if index is None else f"{path.stem}_{index:0{len(str(n_plots - 1))}d}"
+
+
+def render_units(units, out_dir, vmin, vmax, layer_points=None, render_mode='polygon', tick_count=9,
+                 dpi=300, fmt='png', workers=4, tile_mb=64, progress=None, cmap=None):
+    """
+    阶段二：按共享色标 [vmin, vmax] 渲染一组绘图单元，文件名为 数据文件名[_序号].{fmt}
+    超出色标范围的值取两端颜色；返回 (写出的路径列表, 导出耗时统计)
+    """
+    from pizza_plot_export import ExportPipeline, EXPORT_FORMATS
+    from pizza_plot_spec import build_plot_spec
+    from pizza_plot_core import generate_spec_plot
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"导出格式需为{EXPORT_FORMATS}之一，当前{fmt}")
+    out_dir = pathlib.Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    params = {"vmin": vmin, "vmax": vmax, "layer_points": layer_points,
+              "render_mode": render_mode, "tick_count": tick_count, "cmap": cmap}
+    paths = []
+    files = {}
+    with ExportPipeline(workers=workers, tile_bytes=int(tile_mb * 2**20) if tile_mb else None) as pipeline:
+        for path, index in units:
+            if path not in files:  # 每个文件只打开一次（.csv 整体解析开销大）
+                files[path] = open_data_file(path)
+            data = files[path]
+            spec = build_plot_spec(params, data if index is None else data[index])
+            fig, _ = generate_spec_plot(spec, target_dpi=dpi)
+            out_path = out_dir / f"{unit_name(path, index, len(data))}.{fmt}"
+            pipeline.submit(fig, out_path, dpi=dpi, pad_inches=0.1, transparent=True)
+            paths.append(out_path)
+            if progress:
+                progress(len(paths), len(units))
+    return paths, pipeline.report()
+
+
+def _scan_shard(paths, index, total, percentiles, relative_accuracy):
+    return scan_units(shard_units(list_plot_units(paths), index, total), percentiles, relative_accuracy)
+
+
+def _render_shard(paths, index, total, vmin, vmax, render_kwargs):
+    return render_units(shard_units(list_plot_units(paths), index, total), vmin=vmin, vmax=vmax,
+                        **render_kwargs)
+
+
+def run_local(paths, out_dir, jobs=4, clip=None, symmetric=False,
+              relative_accuracy=DEFAULT_RELATIVE_ACCURACY, **render_kwargs):
+    """本机多进程跑完两个阶段，返回 (全局摘要, 色标范围, 统计)"""
+    start = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(jobs) as ex:
+        parts = list(ex.map(functools.partial(_scan_shard, paths, total=jobs, percentiles=bool(clip),
+                                              relative_accuracy=relative_accuracy), range(jobs)))
+        summary = merge_summaries(parts)
+        vmin, vmax = summary.color_range(clip, symmetric)
+        scanned = time.perf_counter()
+        results = list(ex.map(functools.partial(_render_shard, paths, total=jobs, vmin=vmin, vmax=vmax,
+                                                render_kwargs=dict(render_kwargs, out_dir=out_dir)),
+                              range(jobs)))
+    stats = {"scan_seconds": scanned - start, "render_seconds": time.perf_counter() - scanned,
+             "files": sum(len(p) for p, _ in results)}
+    return summary, (vmin, vmax), stats
+
+
+def _add_render_args(parser):
+    parser.add_argument("--out", required=True, help="输出目录")
+    parser.add_argument("--layer-points", default=None, help="逗号分隔的层区域值（默认等分）")
+    parser.add_argument("--render-mode", default="polygon")
+    parser.add_argument("--tick-count", type=int, default=9)
+    parser.add_argument("--cmap", default=None, help="色图名（默认jet）")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--format", default="png")
+    parser.add_argument("--workers", type=int, default=4, help="每个进程的编码线程数")
+    parser.add_argument("--tile-mb", type=float, default=64)
+    parser.add_argument("--clip", type=float, nargs=2, metavar=("LOW", "HIGH"), default=None,
+                        help="按百分位数取色标（如 1 99），需摘要含分位数")
+    parser.add_argument("--symmetric", action="store_true", help="色标取 ±max|x|（0居中）")
+
+
+def _render_kwargs(args):
+    return {"out_dir": args.out, "layer_points": args.layer_points, "render_mode": args.render_mode,
+            "tick_count": args.tick_count, "cmap": args.cmap, "dpi": args.dpi, "fmt": args.format,
+            "workers": args.workers, "tile_mb": args.tile_mb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="披萨图两阶段批量出图（共享色标）")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    scan = sub.add_parser("scan")
+    scan.add_argument("files", nargs="+")
+    scan.add_argument("--shard", default="0/1", help="本分片 序号/总数，序号从0计")
+    scan.add_argument("--percentiles", action="store_true", help="同时统计分位数草图")
+    scan.add_argument("--accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY, help="分位数相对精度")
+    scan.add_argument("-o", "--output", required=True, help="分片摘要（JSON）")
+    merge = sub.add_parser("merge")
+    merge.add_argument("summaries", nargs="+")
+    merge.add_argument("-o", "--output", required=True)
+    render = sub.add_parser("render")
+    render.add_argument("files", nargs="+")
+    render.add_argument("--shard", default="0/1")
+    render.add_argument("--scale", required=True, help="merge 输出的全局摘要")
+    _add_render_args(render)
+    run = sub.add_parser("run")
+    run.add_argument("files", nargs="+")
+    run.add_argument("--jobs", type=int, default=4, help="进程数（即分片数）")
+    run.add_argument("--accuracy", type=float, default=DEFAULT_RELATIVE_ACCURACY)
+    _add_render_args(run)
+    args = parser.parse_args()
+
+    if args.cmd == "scan":
+        start = time.perf_counter()
+        units = shard_units(list_plot_units(args.files), *parse_shard(args.shard))
+        summary = scan_units(units, args.percentiles, args.accuracy)
+        save_summary(summary, args.output)
+        print(f"扫描{len(units)}张图、{summary.count}个数值，用时{time.perf_counter() - start:.2f}s")
+    elif args.cmd == "merge":
+        summary = merge_summaries(load_summary(p) for p in args.summaries)
+        save_summary(summary, args.output)
+        print(json.dumps({"count": summary.count, "vmin": summary.vmin, "vmax": summary.vmax},
+                         ensure_ascii=False))
+    elif args.cmd == "render":
+        vmin, vmax = load_summary(args.scale).color_range(args.clip, args.symmetric)
+        units = shard_units(list_plot_units(args.files), *parse_shard(args.shard))
+        paths, report = render_units(units, vmin=vmin, vmax=vmax, **_render_kwargs(args))
+        print(f"色标[{vmin:g}, {vmax:g}]，写出{len(paths)}个文件，用时{report['wall']:.2f}s")
+    else:
+        summary, (vmin, vmax), stats = run_local(args.files, jobs=args.jobs, clip=args.clip,
+                                                 symmetric=args.symmetric, relative_accuracy=args.accuracy,
+                                                 **_render_kwargs(args))
+        print(f"色标[{vmin:g}, {vmax:g}]，写出{stats['files']}个文件；"
+              f"扫描{stats['scan_seconds']:.2f}s，渲染{stats['render_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import functools
+import threading
+import dataclasses
+import numpy as np
+
+LUT_SIZE = 256
+BAD_INDEX = LUT_SIZE  # LUT末尾保留的坏值槽（NaN/inf数据），全透明，与 matplotlib 色图默认的 bad 颜色一致
+DEFAULT_COLORMAP = 'jet'
+COLORMAP_BANK_SIZE = 16  # LUT库最多保留的色图数，超出时淘汰最久未用的
+# 界面列出的常用色图（任何 matplotlib 已注册的色图名及 register_colormap 注册的自定义色图均可使用）
+COMMON_COLORMAPS = (
+    'jet', 'viridis', 'cividis', 'plasma', 'inferno', 'magma', 'turbo',  # 顺序型（除jet外感知均匀）
+    'coolwarm', 'RdBu_r', 'seismic', 'PuOr_r', 'BrBG',  # 发散型，适合对称色标
+)
+
+_custom_stops = {}
+_custom_lock = threading.Lock()
+
+
+@dataclasses.dataclass(frozen=True)
+class CompiledColormap:
+    """
+    编译好的色图：lut 为 (LUT_SIZE+1, 4) uint8 RGBA（只读，末行为坏值槽 BAD_INDEX），colors 为同一LUT的0~1浮点形式，
+    cmap 为前 LUT_SIZE 色构成的 ListedColormap（色条、按数值着色用），index_cmap 含坏值槽，供按LUT索引着色的网格使用；
+    披萨图元、缩略图模板与色条都取自同一份LUT，颜色严格一致
+    """
+    name: str
+    lut: np.ndarray
+    colors: np.ndarray
+    cmap: object
+    index_cmap: object
+
+
+def register_colormap(name, colors):
+    """
+    注册自定义色图：colors 为按顺序均匀分布的色标点（十六进制如 '#1f77b4' 或其他 matplotlib 颜色写法），至少2个
+    重名时覆盖，之后取用即重新编译
+    """
+    from matplotlib.colors import to_rgba_array
+    if not name:
+        raise ValueError("色图名称不能为空！")
+    colors = [c.strip() if isinstance(c, str) else c for c in colors]
+    if len(colors) < 2:
+        raise ValueError("自定义色图至少需要2个色标点！")
+    try:
+        stops = tuple(map(tuple, to_rgba_array(colors).tolist()))
+    except ValueError:
+        raise ValueError(f"无法识别的颜色：{colors}") from None
+    with _custom_lock:
+        _custom_stops[name] = stops
+    return name
+
+
+def available_colormaps():
+    """界面可选的色图：常用色图 + 已注册的自定义色图"""
+    with _custom_lock:
+        custom = [name for name in _custom_stops if name not in COMMON_COLORMAPS]
+    return list(COMMON_COLORMAPS) + custom
+
+
+def get_colormap(name=DEFAULT_COLORMAP):
+    """从LUT库取编译好的色图（首次使用时编译）；未知色图名抛出 ValueError"""
+    with _custom_lock:
+        stops = _custom_stops.get(name)
+    return _compile_colormap(name, stops)
+
+
+@functools.lru_cache(maxsize=COLORMAP_BANK_SIZE)
+def _compile_colormap(name, stops):
+    # 自定义色图的色标点也参与缓存键，重新注册后自动换成新LUT
+    from matplotlib import colormaps
+    from matplotlib.colors import LinearSegmentedColormap, ListedColormap
+    if stops is not None:
+        source = LinearSegmentedColormap.from_list(name, stops, N=LUT_SIZE)
+    elif name in colormaps:
+        source = colormaps[name].resampled(LUT_SIZE)
+    else:
+        raise ValueError(f"未知色图：{name}")
+    # 按“四舍五入（.5进位）”量化为8位，与Agg把浮点颜色转为8位的方式一致，用浮点或uint8形式绘制结果相同
+    lut = np.zeros((LUT_SIZE + 1, 4), dtype=np.uint8)
+    lut[:LUT_SIZE] = np.floor(source(np.arange(LUT_SIZE)) * 255 + 0.5)
+    colors = lut / 255.0
+    lut.flags.writeable = False
+    colors.flags.writeable = False
+    return CompiledColormap(name, lut, colors, ListedColormap(colors[:LUT_SIZE], name=name),
+                            ListedColormap(colors, name=name))
@@ -1,53 +1,194 @@
+import io
+import threading
+import functools
+import contextlib
+import dataclasses
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Polygon
+from pizza_plot_geometry import (
+    RENDER_MODES, build_sector_verts, build_mesh_grid, unit_pizza_geometry
+)
+from pizza_plot_colormap import LUT_SIZE, BAD_INDEX, DEFAULT_COLORMAP, get_colormap
 
-def generate_pizza_plot(
-        m_layers, n_blocks, layer_points, data,
-        vmin, vmax, tick_count=9,figsize=(2, 2), dpi=64):
-    if m_layers < 2 or n_blocks < 2:
-        raise ValueError("层数和块数必须≥2")
-    if data.shape != (m_layers, n_blocks):
-        raise ValueError(f"数据维度需为{m_layers}×{n_blocks}，当前{data.shape}")
 
-    layer_points = np.clip(np.array(layer_points), 0.01, 0.99).tolist()
-    fig, ax = plt.subplots(figsize=figsize, dpi=dpi, facecolor='white')
+class ColorScratch:
+    """
+    单个绘图项的颜色映射缓冲区：数据形状不变时跨重绘复用，重绘不再分配临时数组
+    同一时刻只借给一个渲染，并发渲染同一项时其余调用临时分配
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buffers = {}
+
+
+@contextlib.contextmanager
+def _borrow_buffers(scratch):
+    if scratch is not None and scratch.lock.acquire(blocking=False):
+        try:
+            yield scratch.buffers
+        finally:
+            scratch.lock.release()
+    else:
+        yield {}
+
+
+def _scratch_buffer(buffers, name, shape, dtype):
+    buf = buffers.get(name)
+    if buf is None or buf.shape != shape or buf.dtype != dtype:
+        buf = buffers[name] = np.empty(shape, dtype=dtype)
+    return buf
+
+
+def map_color_indices(data, vmin, vmax, buffers=None, n_colors=LUT_SIZE):
+    """
+    钳位 + 归一化 + LUT索引一步完成，全部写入 buffers 中的复用缓冲，返回 intp 索引数组
+    超出 [vmin, vmax] 的值取两端颜色，与钳位后再着色结果一致，因此无需单独钳位拷贝
+    NaN/inf 单元取坏值槽 BAD_INDEX（透明）
+    """
+    buffers = {} if buffers is None else buffers
+    values = _scratch_buffer(buffers, "values", data.shape, np.result_type(data.dtype, np.float32))
+    index = _scratch_buffer(buffers, "index", data.shape, np.intp)
+    bad = _scratch_buffer(buffers, "bad", data.shape, np.bool_)
+    np.isfinite(data, out=bad)
+    np.logical_not(bad, out=bad)
+    has_bad = bad.any()
+    np.clip(data, vmin, vmax, out=values)
+    if has_bad:
+        np.copyto(values, vmin, where=bad)  # 先占位，避免 NaN 转整数
+    values -= vmin
+    values *= n_colors / (vmax - vmin) if vmax > vmin else 0
+    np.minimum(values, n_colors - 1, out=values)
+    np.copyto(index, values, casting='unsafe')  # 向下取整，与 Colormap 的分箱方式一致
+    if has_bad:
+        np.copyto(index, BAD_INDEX, where=bad)
+    return index
+
+
+def finite_data_range(data):
+    """有限值的 (最小值, 最大值)；没有有限值时返回 None"""
+    data = np.asarray(data)
+    finite = np.isfinite(data)
+    if not finite.all():
+        data = data[finite]
+    if data.size == 0:
+        return None
+    return float(data.min()), float(data.max())
+
+
+def _repeat_blocks(index, seg, buffers):
+    """把每块的颜色索引重复到其 seg 个角向分段（写入复用缓冲），返回 (m, n·seg) 视图"""
+    m_layers, n_blocks = index.shape
+    grid = _scratch_buffer(buffers, "mesh", (m_layers, n_blocks, seg), np.intp)
+    grid[...] = index[:, :, None]
+    return grid.reshape(m_layers, n_blocks * seg)
+
+
+@functools.lru_cache(maxsize=64)
+def pizza_cell_edges(layer_points, n_blocks):
+    """
+    命中测试用的单元分界（只读，按配置缓存）：
+    径向 [0, 层区域..., 1]（与绘图一致钳位到0.01~0.99），角向 [0, 2π] 上 n_blocks+1 个升序分界
+    """
+    r_edges = np.concatenate([[0], np.clip(np.array(layer_points, dtype=float), 0.01, 0.99), [1.0]])
+    theta_edges = np.linspace(0, 2 * np.pi, n_blocks + 1)
+    r_edges.flags.writeable = False
+    theta_edges.flags.writeable = False
+    return r_edges, theta_edges
+
+
+def pizza_cells_at(x, y, layer_points, n_blocks, radius=1.0):
+    """
+    坐标 → 单元索引（向量化）：转极坐标后分别在径向、角向分界上 searchsorted，每点 O(log m + log n)
+    x, y: 标量或数组，坐标系与绘图相同（圆心为原点、外圈半径为 radius）
+    返回 (layer, block) 整型数组（从0计），落在披萨外的点为 -1
+    """
+    r_edges, theta_edges = pizza_cell_edges(tuple(layer_points), n_blocks)
+    x = np.asarray(x, dtype=float) / radius
+    y = np.asarray(y, dtype=float) / radius
+    r = np.hypot(x, y)
+    # 块从0°起顺时针编号（与绘图时 theta 从2π递减一致）
+    theta = (2 * np.pi - np.arctan2(y, x)) % (2 * np.pi)
+    layer = np.searchsorted(r_edges, r, side='right') - 1
+    block = np.minimum(np.searchsorted(theta_edges, theta, side='right') - 1, n_blocks - 1)
+    outside = r >= 1.0
+    return np.where(outside, -1, layer), np.where(outside, -1, block)
+
+
+def sample_pizza_points(data, layer_points, x, y, radius=1.0, fill=np.nan):
+    """批量取样：返回各坐标点所在单元的数值（与 x, y 同形），披萨外的点为 fill"""
+    data = np.asarray(data)
+    if len(layer_points) != data.shape[0] - 1:
+        raise ValueError(f"需{data.shape[0] - 1}个层区域值，当前{len(layer_points)}")
+    layer, block = pizza_cells_at(x, y, layer_points, data.shape[1], radius)
+    inside = layer >= 0
+    values = np.full(layer.shape, fill, dtype=float)
+    values[inside] = data[layer[inside], block[inside]]
+    return values
+
+
+def pizza_sector_table(spec):
+    """
+    一张图全部扇区的列式描述（向量化，按层、块顺序排列）：
+        layer, block                  层号、块号（从0计，块自0°起顺时针编号）
+        r_inner, r_outer              径向范围（外圈半径为1，层区域与绘图一样钳位到0.01~0.99）
+        theta_start, theta_end        角向范围（弧度，自+x轴逆时针计，theta_start < theta_end）
+        value, rgba                   数值与绘制颜色（同一色标与色图LUT，(N, 4) uint8）
+    几何取自 pizza_cell_edges，与绘图和命中测试一致
+    """
+    m_layers, n_blocks = spec.data.shape
+    r_edges, theta_edges = pizza_cell_edges(tuple(spec.layer_points), n_blocks)
+    layer = np.repeat(np.arange(m_layers, dtype=np.int32), n_blocks)
+    block = np.tile(np.arange(n_blocks, dtype=np.int32), m_layers)
+    index = map_color_indices(spec.data, spec.vmin, spec.vmax)
+    return {
+        "layer": layer,
+        "block": block,
+        "r_inner": r_edges[layer],
+        "r_outer": r_edges[layer + 1],
+        "theta_start": 2 * np.pi - theta_edges[block + 1],
+        "theta_end": 2 * np.pi - theta_edges[block],
+        "value": spec.data.ravel().astype(np.float64),
+        "rgba": get_colormap(spec.cmap).lut[index.ravel()],
+    }
+
+
+def _new_figure(figsize, dpi, facecolor):
+    """
+    不经pyplot创建figure并绑定独立的Agg画布：不进入全局figure管理器，随持有者回收，
+    可在工作线程中调用；matplotlib在首次绘图时才导入，仅做几何计算的调用方不承担该开销
+    需要在Tk中显示时，由UI层用FigureCanvasTkAgg替换画布即可
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize, dpi=dpi, facecolor=facecolor)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def create_pizza_axes(figsize, dpi):
+    """创建披萨图画布与坐标轴（等比例、四边内向刻度、无刻度标签）"""
+    fig = _new_figure(figsize, dpi, 'white')
+    ax = fig.add_subplot()
     ax.set_aspect('equal')
     ax.tick_params(
         axis='both', labelsize=8, direction='in', length=4,
         top=True, right=True, bottom=True, left=True,
         labelbottom=False, labelleft=False, labeltop=False, labelright=False
     )
+    return fig, ax
+
 
+def measure_r_max(fig, ax, figsize, dpi):
+    """绘制一次画布，按坐标轴实际尺寸计算外圈半径（英寸）"""
     fig.canvas.draw()
     bbox = ax.get_window_extent().transformed(fig.dpi_scale_trans.inverted())
     plot_width = bbox.width * fig.dpi if bbox.width > 0 else figsize[0] * dpi
     plot_height = bbox.height * fig.dpi if bbox.height > 0 else figsize[1] * dpi
-    r_max = min(plot_width, plot_height) * 0.45 / dpi
-
-    all_points = np.array([0] + layer_points + [1.0]) * r_max
-    r_inner = all_points[:-1]
-    r_outer = all_points[1:]
-    theta = np.linspace(0, 2 * np.pi, n_blocks + 1)[::-1]
-    norm = plt.Normalize(vmin, vmax)
-    patches = []
+    return min(plot_width, plot_height) * 0.45 / dpi
 
-    for i in range(m_layers):
-        for j in range(n_blocks):
-            t = np.linspace(theta[j], theta[j + 1], 20)
-            x_outer = r_outer[i] * np.cos(t)
-            y_outer = r_outer[i] * np.sin(t)
-            x_inner = r_inner[i] * np.cos(np.flip(t))
-            y_inner = r_inner[i] * np.sin(np.flip(t))
-            x = np.concatenate([x_outer, x_inner, [x_outer[0]]])
-            y = np.concatenate([y_outer, y_inner, [y_outer[0]]])
-            verts = np.column_stack([x, y])
-
-            poly = Polygon(verts, facecolor=plt.cm.jet(norm(data[i, j])),
-                           edgecolor='none', linewidth=0)
-            ax.add_patch(poly)
-            patches.append(poly)
 
+def apply_pizza_limits(ax, r_max, tick_count):
+    """按外圈半径设置坐标范围，并在内部均匀放置tick_count个刻度"""
     ax.set_xlim(-r_max, r_max)
     ax.set_ylim(-r_max, r_max)
     edge = np.linspace(-r_max, r_max, tick_count+2)
@@ -55,27 +196,141 @@ def generate_pizza_plot(
     ax.set_xticks(tick_vals)
     ax.set_yticks(tick_vals)
 
+
+def _make_pizza_artist(layer_points, data, vmin, vmax, radius_px,
+                       max_chord_error=0.25, render_mode='polygon', scratch=None, cmap=DEFAULT_COLORMAP):
+    """生成单位外半径的披萨图集合图元（未加入任何坐标轴）"""
+    from matplotlib.collections import PolyCollection, QuadMesh
+    from matplotlib.colors import NoNorm
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"绘制模式需为{RENDER_MODES}之一，当前{render_mode}")
+    data = np.asarray(data)
+    m_layers, n_blocks = data.shape
+    layer_points = tuple(np.clip(np.array(layer_points, dtype=float), 0.01, 0.99).tolist())
+    if len(layer_points) != m_layers - 1:
+        raise ValueError(f"需{m_layers - 1}个层区域值，当前{len(layer_points)}")
+    # 像素半径取整，避免尺寸微小差异导致缓存失效
+    geometry = unit_pizza_geometry(n_blocks, layer_points, int(np.ceil(radius_px)),
+                                    max_chord_error, render_mode)
+    colormap = get_colormap(cmap)
+    with _borrow_buffers(scratch) as buffers:
+        index = map_color_indices(data, vmin, vmax, buffers)
+        if render_mode == 'mesh':
+            coords, seg = geometry
+            from matplotlib import rcParams
+            return QuadMesh(coords, array=_repeat_blocks(index, seg, buffers), cmap=colormap.index_cmap,
+                            norm=NoNorm(), shading='flat', edgecolors='none', antialiased=False,
+                            snap=rcParams['pcolormesh.snap'])  # 与 pcolormesh 一致
+        return PolyCollection(geometry, facecolors=colormap.colors[index.ravel()],
+                              edgecolors='none', linewidths=0)
+
+
+def _recolor_pizza_artist(artist, data, vmin, vmax, buffers=None, cmap=DEFAULT_COLORMAP):
+    """按新的色标范围/色图重设 _make_pizza_artist 图元的颜色（几何不变）"""
+    from matplotlib.collections import QuadMesh
+    buffers = {} if buffers is None else buffers
+    colormap = get_colormap(cmap)
+    index = map_color_indices(data, vmin, vmax, buffers)
+    if isinstance(artist, QuadMesh):
+        seg = (artist.get_coordinates().shape[1] - 1) // index.shape[1]
+        artist.set_cmap(colormap.index_cmap)
+        artist.set_array(_repeat_blocks(index, seg, buffers))
+    else:
+        artist.set_facecolor(colormap.colors[index.ravel()])
+
+
+def draw_pizza_on_axes(ax, layer_points, data, vmin, vmax, radius_px,
+                       max_chord_error=0.25, render_mode='polygon', cmap=DEFAULT_COLORMAP):
+    """
+    在已有坐标轴上以单位外半径绘制一张披萨图（单个集合图元），返回该图元
+    radius_px: 外圈在输出图像中的像素半径，用于决定圆弧采样密度
+    """
+    artist = _make_pizza_artist(layer_points, data, vmin, vmax, radius_px,
+                                max_chord_error, render_mode, cmap=cmap)
+    ax.add_collection(artist)
+    ax.set_xlim(-1, 1)
+    ax.set_ylim(-1, 1)
+    ax.set_aspect('equal')
+    return artist
+
+
+def generate_pizza_plot(
+        m_layers, n_blocks, layer_points, data,
+        vmin, vmax, tick_count=9,figsize=(2, 2), dpi=64,
+        target_dpi=None, max_chord_error=0.25, render_mode='polygon', scratch=None,
+        cmap=DEFAULT_COLORMAP):
+    """
+    target_dpi: 最终输出分辨率（导出时为保存dpi），None时取dpi
+    max_chord_error: 圆弧折线化允许的最大弦高误差（像素）
+    render_mode: 'polygon' 逐扇区多边形；'mesh' 整体一个极坐标网格（块数多时更快且无接缝）
+    scratch: 可选 ColorScratch，颜色映射的中间数组写入其中复用
+    cmap: 色图名（见 pizza_plot_colormap），颜色取自LUT库中编译好的查找表
+    数据超出 [vmin, vmax] 时取两端颜色（等同钳位）
+    """
+    from matplotlib.patches import Polygon
+    from matplotlib.colors import NoNorm
+    if m_layers < 2 or n_blocks < 2:
+        raise ValueError("层数和块数必须≥2")
+    if data.shape != (m_layers, n_blocks):
+        raise ValueError(f"数据维度需为{m_layers}×{n_blocks}，当前{data.shape}")
+    if max_chord_error <= 0:
+        raise ValueError("最大弦高误差必须>0")
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"绘制模式需为{RENDER_MODES}之一，当前{render_mode}")
+
+    layer_points = np.clip(np.array(layer_points), 0.01, 0.99).tolist()
+    fig, ax = create_pizza_axes(figsize, dpi)
+    r_max = measure_r_max(fig, ax, figsize, dpi)
+
+    all_points = np.array([0] + layer_points + [1.0]) * r_max
+    r_inner = all_points[:-1]
+    r_outer = all_points[1:]
+    theta = np.linspace(0, 2 * np.pi, n_blocks + 1)[::-1]
+    colormap = get_colormap(cmap)
+    norm = NoNorm()
+    lut = colormap.colors
+    patches = []
+    mesh = None
+
+    # 坐标单位为英寸，乘以输出dpi即为像素半径
+    px_per_unit = target_dpi or dpi
+    with _borrow_buffers(scratch) as buffers:
+        index = map_color_indices(data, vmin, vmax, buffers)
+        if render_mode == 'mesh':
+            # pcolormesh 会复制颜色数组，缓冲归还后可被下次重绘覆盖
+            x, y, seg = build_mesh_grid(all_points, theta, px_per_unit, max_chord_error)
+            mesh = ax.pcolormesh(x, y, _repeat_blocks(index, seg, buffers), cmap=colormap.index_cmap, norm=norm,
+                                 shading='flat', edgecolors='none', antialiased=False)
+        else:
+            layer_verts = build_sector_verts(r_inner, r_outer, theta, px_per_unit, max_chord_error)
+            for i in range(m_layers):
+                for j in range(n_blocks):
+                    poly = Polygon(layer_verts[i][j], facecolor=lut[index[i, j]],
+                                   edgecolor='none', linewidth=0)
+                    ax.add_patch(poly)
+                    patches.append(poly)
+
+    apply_pizza_limits(ax, r_max, tick_count)
+
     def on_resize(event):
-        nonlocal r_max
-        fig.canvas.draw()
-        bbox = ax.get_window_extent().transformed(fig.dpi_scale_trans.inverted())
-        plot_width = bbox.width * fig.dpi if bbox.width > 0 else figsize[0] * dpi
-        plot_height = bbox.height * fig.dpi if bbox.height > 0 else figsize[1] * dpi
-        r_max = min(plot_width, plot_height) * 0.45 / dpi
+        nonlocal r_max, mesh
+        r_max = measure_r_max(fig, ax, figsize, dpi)
         all_points = np.array([0] + layer_points + [1.0]) * r_max
         r_inner = all_points[:-1]
         r_outer = all_points[1:]
-        for idx, p in enumerate(patches):
-            i = idx // n_blocks
-            j = idx % n_blocks
-            t = np.linspace(theta[j], theta[j + 1], 20)
-            x_outer = r_outer[i] * np.cos(t)
-            y_outer = r_outer[i] * np.sin(t)
-            x_inner = r_inner[i] * np.cos(np.flip(t))
-            y_inner = r_inner[i] * np.sin(np.flip(t))
-            x = np.concatenate([x_outer, x_inner, [x_outer[0]]])
-            y = np.concatenate([y_outer, y_inner, [y_outer[0]]])
-            p.set_xy(np.column_stack([x, y]))
+        if mesh is not None:
+            # 从现有网格取回每块的颜色索引，按新的分段数重复
+            index = mesh.get_array().reshape(m_layers, n_blocks, -1)[:, :, 0]
+            x, y, seg = build_mesh_grid(all_points, theta, px_per_unit, max_chord_error)
+            mesh.remove()
+            mesh = ax.pcolormesh(x, y, np.repeat(index, seg, axis=1), cmap=colormap.index_cmap, norm=norm,
+                                 shading='flat', edgecolors='none', antialiased=False)
+        else:
+            layer_verts = build_sector_verts(r_inner, r_outer, theta, px_per_unit, max_chord_error)
+            for idx, p in enumerate(patches):
+                i = idx // n_blocks
+                j = idx % n_blocks
+                p.set_xy(layer_verts[i][j])
         ax.set_xlim(-r_max, r_max)
         ax.set_ylim(-r_max, r_max)
         fig.canvas.draw()
@@ -84,30 +339,186 @@ def generate_pizza_plot(
     return fig, ax
 
 
-def generate_colorbar(vmin, vmax, cb_font_size=10, cb_custom_ticks=[],
-                      figsize=(5, 5),  # 预览界面常用尺寸
-                      dpi=100):
-    # 1. 创建居中布局的画布+轴
-    fig, ax = plt.subplots(figsize=figsize, dpi=dpi, facecolor='none')
-    fig.patch.set_visible(False)
-    ax.set_facecolor('none')
-    # 强制轴居中（覆盖默认的边缘布局）
-    ax.set_position([0.4, 0.1, 0.2, 0.8])  # [左, 下, 宽, 高]：让轴在画布中间
+class PizzaFigureTemplate:
+    """
+    按 (figsize, dpi, tick_count) 预先配置好的画布：坐标轴、刻度与边框只绘制一次并缓存为背景，
+    之后每张图只恢复背景（blit）再绘制数据图元，批量重绘的耗时只取决于数据
+    同一模板的渲染在模板锁内串行进行
+    """
 
-    norm = plt.Normalize(vmin, vmax)
-    sm = plt.cm.ScalarMappable(cmap='jet', norm=norm)
-    sm.set_array([])
+    def __init__(self, figsize, dpi, tick_count):
+        self.figsize = figsize
+        self.dpi = dpi
+        self.tick_count = tick_count
+        self.fig, self.ax = create_pizza_axes(figsize, dpi)
+        self.r_max = measure_r_max(self.fig, self.ax, figsize, dpi)
+        apply_pizza_limits(self.ax, self.r_max, tick_count)
+        self.fig.canvas.draw()  # 完整绘制一次，确定刻度线位置
+        # 外圈可能压到边框：边框与刻度线需画在数据之上，因此不进背景，每次在数据之后直接重画
+        # 刻度线取已定位好的 Line2D，跳过 Axis.draw 中每次重算刻度的开销
+        decorations = sorted([*self.ax.spines.values(), self.ax.xaxis, self.ax.yaxis],
+                             key=lambda a: a.get_zorder())  # 与 Axes.draw 的绘制顺序一致
+        self._overlay = []
+        for artist in decorations:
+            if artist in (self.ax.xaxis, self.ax.yaxis):
+                for tick in artist.get_major_ticks():
+                    self._overlay += [line for line in (tick.tick1line, tick.tick2line) if line.get_visible()]
+            else:
+                self._overlay.append(artist)
+        for artist in decorations:
+            artist.set_animated(True)
+        self.fig.canvas.draw()
+        self._background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._lock = threading.Lock()
 
-    # 2. 色条居中显示（锚定在轴的中心）
-    cb = fig.colorbar(
-        sm, ax=ax, orientation='vertical',
-        shrink=0.9,  # 色条占轴高度的90%（避免顶边/底边溢出）
-        aspect=20,   # 调整色条长宽比（更修长，适配居中）
-        pad=0.05,    # 色条与轴的边距（避免贴边）
-        anchor=(0.5, 0.5)  # 色条锚定在轴的中心→整体居中
+    def render(self, layer_points, data, vmin, vmax, target_dpi=None,
+               max_chord_error=0.25, render_mode='polygon', scratch=None, cmap=DEFAULT_COLORMAP):
+        """返回 (高, 宽, 4) 的 uint8 RGBA 图像"""
+        from matplotlib.transforms import Affine2D
+        radius_px = self.r_max * (target_dpi or self.dpi)
+        artist = _make_pizza_artist(layer_points, data, vmin, vmax, radius_px,
+                                    max_chord_error, render_mode, scratch, cmap)
+        artist.set_transform(Affine2D().scale(self.r_max) + self.ax.transData)
+        with self._lock:
+            self.fig.canvas.restore_region(self._background)
+            self.ax.add_collection(artist, autolim=False)
+            self.ax.draw_artist(artist)
+            for overlay in self._overlay:
+                self.ax.draw_artist(overlay)
+            artist.remove()
+            return np.array(self.fig.canvas.buffer_rgba())
+
+
+@functools.lru_cache(maxsize=16)
+def get_pizza_template(figsize, dpi, tick_count):
+    """取（或首次创建）对应尺寸与刻度数的画布模板"""
+    return PizzaFigureTemplate(tuple(figsize), dpi, tick_count)
+
+
+@dataclasses.dataclass(frozen=True)
+class PlotSpec:
+    """
+    一张披萨图的不可变描述（配置 + 数据 + 色标），可安全地在线程间传递
+    data 应为只读数组（flags.writeable=False），由调用方保证之后不再原地修改
+    """
+    m_layers: int
+    n_blocks: int
+    layer_points: tuple
+    data: np.ndarray
+    vmin: float
+    vmax: float
+    tick_count: int = 9
+    render_mode: str = 'polygon'
+    figsize: tuple = (7, 7)
+    dpi: int = 100
+    cmap: str = DEFAULT_COLORMAP
+
+
+def generate_spec_plot(spec, target_dpi=None, max_chord_error=0.25, scratch=None):
+    """
+    按 PlotSpec 生成 fig, ax（每次新建独立figure）
+    钳位在颜色映射中完成，不拷贝数据；scratch 仅在调用方独占该绘图项的缓冲时传入
+    """
+    return generate_pizza_plot(
+        m_layers=spec.m_layers,
+        n_blocks=spec.n_blocks,
+        layer_points=list(spec.layer_points),
+        data=spec.data,
+        vmin=spec.vmin,
+        vmax=spec.vmax,
+        tick_count=spec.tick_count,
+        figsize=spec.figsize,
+        dpi=spec.dpi,
+        target_dpi=target_dpi,
+        max_chord_error=max_chord_error,
+        render_mode=spec.render_mode,
+        scratch=scratch,
+        cmap=spec.cmap,
+    )
+
+
+def render_spec_image(spec, max_chord_error=0.25, scratch=None):
+    """按 PlotSpec 套用画布模板渲染为 RGBA 图像（缩略图等固定版式的批量场景）"""
+    if spec.data.shape != (spec.m_layers, spec.n_blocks):
+        raise ValueError(f"数据维度需为{spec.m_layers}×{spec.n_blocks}，当前{spec.data.shape}")
+    template = get_pizza_template(spec.figsize, spec.dpi, spec.tick_count)
+    return template.render(spec.layer_points, spec.data, spec.vmin, spec.vmax,
+                           max_chord_error=max_chord_error, render_mode=spec.render_mode,
+                           scratch=scratch, cmap=spec.cmap)
+
+
+def render_plot_spec(spec, fmt='png', dpi=300, max_chord_error=0.25):
+    """
+    线程安全的渲染入口：只读取不可变的 spec，返回图像字节（fmt 为 savefig 支持的格式，如 png/svg）
+    可在多个工作线程中并发调用
+    """
+    fig, ax = generate_spec_plot(spec, target_dpi=dpi, max_chord_error=max_chord_error)
+    buf = io.BytesIO()
+    fig.savefig(
+        buf,
+        format=fmt,
+        dpi=dpi,
+        bbox_inches='tight',
+        pad_inches=0.1,
+        transparent=True,
+        facecolor='none',
     )
+    return buf.getvalue()
 
-    # 3. label对齐+防错位
+
+def generate_pizza_sheet(items, vmin, vmax, rows, cols, cell_size=2.5, dpi=150,
+                         tick_count=9, cb_font_size=18, cb_custom_ticks=[], max_chord_error=0.25,
+                         cmap=DEFAULT_COLORMAP):
+    """
+    拼版：把多张披萨图按 rows×cols 网格画在同一张画布上，右侧一条共享色条（各图色标范围相同）
+    items: [{"label", "layer_points", "data", "render_mode", "cmap"}...]，数量不超过 rows×cols；"cmap" 可省略
+    cmap: 未指定色图的图项所用色图；全页图项色图相同时色条即用该色图，
+          否则色条用 cmap，与之不同的图项在标题中注明所用色图
+    """
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.colors import Normalize
+    if len(items) > rows * cols:
+        raise ValueError(f"单页最多{rows * cols}张图，当前{len(items)}张")
+    cb_width = 1.2 + cb_font_size / 24  # 色条及其label所需宽度（英寸）
+    fig_w = cols * cell_size + cb_width
+    fig_h = rows * cell_size
+    fig = _new_figure((fig_w, fig_h), dpi, 'white')
+    item_cmaps = [item.get("cmap") or cmap for item in items]
+    if len(set(item_cmaps)) == 1:
+        cmap = item_cmaps[0]
+
+    # 每格内留出标题与边距，坐标轴占格子的 80%
+    box = cell_size * 0.8
+    radius_px = box / 2 * dpi
+    for idx, (item, item_cmap) in enumerate(zip(items, item_cmaps)):
+        r, c = divmod(idx, cols)
+        left = (c * cell_size + (cell_size - box) / 2) / fig_w
+        bottom = ((rows - 1 - r) * cell_size + (cell_size - box) * 0.3) / fig_h
+        ax = fig.add_axes([left, bottom, box / fig_w, box / fig_h])
+        ax.tick_params(
+            axis='both', labelsize=8, direction='in', length=4,
+            top=True, right=True, bottom=True, left=True,
+            labelbottom=False, labelleft=False, labeltop=False, labelright=False
+        )
+        draw_pizza_on_axes(ax, item["layer_points"], item["data"], vmin, vmax, radius_px,
+                           max_chord_error=max_chord_error,
+                           render_mode=item.get("render_mode", "polygon"), cmap=item_cmap)
+        apply_pizza_limits(ax, 1.0, tick_count)
+        title = item["label"] if item_cmap == cmap else f"{item['label']} ({item_cmap})"
+        ax.set_title(title, fontsize=10, pad=4)
+
+    cax = fig.add_axes([(cols * cell_size + 0.3) / fig_w, 0.1, 0.25 / fig_w, 0.8])
+    sm = ScalarMappable(cmap=get_colormap(cmap).cmap, norm=Normalize(vmin, vmax))
+    sm.set_array([])
+    cb = fig.colorbar(sm, cax=cax)
+    _style_colorbar(cb, cb_font_size, cb_custom_ticks)
+    cb.outline.set_visible(False)
+    return fig
+
+
+def _style_colorbar(cb, cb_font_size, cb_custom_ticks):
+    """色条刻度样式（内向刻度、右侧label、自定义刻度对齐），单独导出与拼版共用"""
+    # label对齐+防错位
     dynamic_pad = cb_font_size * 0.5  # 适配字体的label间距
     cb.ax.tick_params(
         labelsize=cb_font_size,
@@ -121,7 +532,7 @@ def generate_colorbar(vmin, vmax, cb_font_size=10, cb_custom_ticks=[],
         width=1.0
     )
 
-    # 4. 强制自定义刻度+label精准对齐
+    # 强制自定义刻度+label精准对齐
     if cb_custom_ticks:
         cb.set_ticks(cb_custom_ticks)
         cb.ax.set_ylim(min(cb_custom_ticks), max(cb_custom_ticks))
@@ -133,7 +544,38 @@ def generate_colorbar(vmin, vmax, cb_font_size=10, cb_custom_ticks=[],
             fontsize=cb_font_size,
             ma='left'
         )
-        plt.setp(cb.ax.get_yticklabels(), rotation=0)
+        for label in cb.ax.get_yticklabels():
+            label.set_rotation(0)
+
+
+def generate_colorbar(vmin, vmax, cb_font_size=10, cb_custom_ticks=[],
+                      figsize=(5, 5),  # 预览界面常用尺寸
+                      dpi=100, cmap=DEFAULT_COLORMAP):
+    from matplotlib.cm import ScalarMappable
+    from matplotlib.colors import Normalize
+    # 1. 创建居中布局的画布+轴
+    fig = _new_figure(figsize, dpi, 'none')
+    ax = fig.add_subplot()
+    fig.patch.set_visible(False)
+    ax.set_facecolor('none')
+    # 强制轴居中（覆盖默认的边缘布局）
+    ax.set_position([0.4, 0.1, 0.2, 0.8])  # [左, 下, 宽, 高]：让轴在画布中间
+
+    norm = Normalize(vmin, vmax)
+    sm = ScalarMappable(cmap=get_colormap(cmap).cmap, norm=norm)
+    sm.set_array([])
+
+    # 2. 色条居中显示（锚定在轴的中心）
+    cb = fig.colorbar(
+        sm, ax=ax, orientation='vertical',
+        shrink=0.9,  # 色条占轴高度的90%（避免顶边/底边溢出）
+        aspect=20,   # 调整色条长宽比（更修长，适配居中）
+        pad=0.05,    # 色条与轴的边距（避免贴边）
+        anchor=(0.5, 0.5)  # 色条锚定在轴的中心→整体居中
+    )
+
+    # 3. label对齐+防错位；4. 强制自定义刻度+label精准对齐
+    _style_colorbar(cb, cb_font_size, cb_custom_ticks)
 
     # 隐藏冗余元素
     ax.axis('off')
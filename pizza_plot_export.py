@@ -0,0 +1,659 @@
+import io
+import zlib
+import time
+import pathlib
+import shutil
+import struct
+import fractions
+import threading
+import contextlib
+import collections
+import concurrent.futures
+import numpy as np
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DRAFT_COMPRESS_LEVEL = 1
+EXPORT_FORMATS = ('png', 'tiff')
+TIFF_SUFFIXES = ('.tif', '.tiff')
+SIDECAR_FORMATS = ('npz', 'parquet')
+STRIP_OVERLAP_PT = 8  # 条带上下多绘制的余量（磅），需大于最粗线宽的一半
+
+
+def _png_chunk(tag, payload):
+    return (struct.pack('>I', len(payload)) + tag + payload
+            + struct.pack('>I', zlib.crc32(tag + payload) & 0xffffffff))
+
+
+def _png_header(width, height, dpi=None):
+    # 8位 RGBA（颜色类型6），无隔行；给出dpi时写入pHYs块（单位：像素/米）
+    header = PNG_SIGNATURE + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+    if dpi:
+        ppm = int(round(dpi / 0.0254))
+        header += _png_chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1))
+    return header
+
+
+def _filter_rows_up(rows, prev_row=None):
+    """PNG “Up” 滤波（向量化）：每行减去上一行，大片同色区域压缩率高；返回带滤波类型字节的行"""
+    height, row_bytes = rows.shape
+    out = np.empty((height, row_bytes + 1), dtype=np.uint8)
+    out[:, 0] = 2
+    np.subtract(rows[1:], rows[:-1], out=out[1:, 1:])  # uint8 自然按256取模
+    if prev_row is None:
+        out[0, 1:] = rows[0]
+    else:
+        np.subtract(rows[0], prev_row, out=out[0, 1:])
+    return out
+
+
+class _ImageStreamWriter:
+    """
+    逐行流式写图像的公共部分：行数校验与上下文管理（正常退出时自动 close）
+    dpi: 写入文件的分辨率元数据（None 不写），与导出dpi一致，排版软件据此得到物理尺寸
+    """
+
+    def __init__(self, fileobj, width, height, dpi=None):
+        if width < 1 or height < 1:
+            raise ValueError(f"图像尺寸无效：{width}×{height}")
+        self._file = fileobj
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self._rows_written = 0
+
+    def _take_rows(self, rgba):
+        """RGBA(uint8, 行数×宽×4) → 每行字节展平的二维数组，并累计行数"""
+        if rgba.shape[1:] != (self.width, 4) or rgba.dtype != np.uint8:
+            raise ValueError(f"行数据需为 uint8 (行数, {self.width}, 4)，当前{rgba.dtype} {rgba.shape}")
+        if self._rows_written + rgba.shape[0] > self.height:
+            raise ValueError(f"写入行数超出图像高度{self.height}")
+        self._rows_written += rgba.shape[0]
+        return np.ascontiguousarray(rgba).reshape(rgba.shape[0], self.width * 4)
+
+    def _check_complete(self):
+        if self._rows_written != self.height:
+            raise ValueError(f"图像高度{self.height}，实际只写入{self._rows_written}行")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        return False
+
+
+class PngStreamWriter(_ImageStreamWriter):
+    """逐行流式写PNG：各批行按“Up”滤波后送入同一个zlib流，压缩输出随到随写为IDAT块"""
+
+    def __init__(self, fileobj, width, height, compress_level=6, dpi=None):
+        super().__init__(fileobj, width, height, dpi)
+        self._compressor = zlib.compressobj(compress_level)
+        self._prev_row = None
+        fileobj.write(_png_header(width, height, dpi))
+
+    def write_rows(self, rgba):
+        rows = self._take_rows(rgba)
+        if rows.shape[0] == 0:
+            return
+        data = self._compressor.compress(_filter_rows_up(rows, self._prev_row))
+        self._prev_row = rows[-1].copy()  # 下一批首行的滤波基准，不持有整批引用
+        if data:
+            self._file.write(_png_chunk(b'IDAT', data))
+
+    def close(self):
+        self._check_complete()
+        self._file.write(_png_chunk(b'IDAT', self._compressor.flush()) + _png_chunk(b'IEND', b''))
+
+
+class TiffStreamWriter(_ImageStreamWriter):
+    """
+    逐行流式写TIFF（8位RGBA，非预乘alpha）：按固定行数分条，compress_level>0 时每条
+    水平差分预测 + Deflate 压缩，=0 时不压缩；图像数据依次写出，IFD放在文件末尾后回填偏移，
+    因此文件对象需可 seek；偏移为32位，单个文件需小于4GB
+    """
+
+    ROWS_PER_STRIP = 64
+
+    def __init__(self, fileobj, width, height, compress_level=6, dpi=None):
+        super().__init__(fileobj, width, height, dpi)
+        self.compress_level = compress_level
+        self._base = fileobj.tell()
+        self._strip_offsets = []
+        self._strip_sizes = []
+        self._pending = None
+        fileobj.write(b'II*\x00' + struct.pack('<I', 0))  # 首个IFD偏移在 close 时回填
+
+    def _write_strip(self, rows):
+        if self.compress_level > 0:
+            predicted = np.empty_like(rows)
+            predicted[:, :4] = rows[:, :4]
+            np.subtract(rows[:, 4:], rows[:, :-4], out=predicted[:, 4:])  # 同通道与左侧像素之差
+            data = zlib.compress(predicted, self.compress_level)
+        else:
+            data = rows.tobytes()
+        self._strip_offsets.append(self._file.tell() - self._base)
+        self._strip_sizes.append(len(data))
+        self._file.write(data)
+
+    def write_rows(self, rgba):
+        rows = self._take_rows(rgba)
+        if self._pending is not None:
+            rows = np.concatenate([self._pending, rows])  # 上一批不足一条的余行（<ROWS_PER_STRIP）
+            self._pending = None
+        n_full = rows.shape[0] // self.ROWS_PER_STRIP * self.ROWS_PER_STRIP
+        for start in range(0, n_full, self.ROWS_PER_STRIP):
+            self._write_strip(rows[start:start + self.ROWS_PER_STRIP])
+        if n_full < rows.shape[0]:
+            self._pending = rows[n_full:].copy()
+
+    def close(self):
+        self._check_complete()
+        if self._pending is not None:
+            self._write_strip(self._pending)
+            self._pending = None
+        short, long_, rational = 3, 4, 5
+        entries = [
+            (256, long_, [self.width]),
+            (257, long_, [self.height]),
+            (258, short, [8, 8, 8, 8]),
+            (259, short, [8 if self.compress_level > 0 else 1]),  # Deflate / 不压缩
+            (262, short, [2]),  # RGB
+            (273, long_, self._strip_offsets),
+            (277, short, [4]),
+            (278, long_, [self.ROWS_PER_STRIP]),
+            (279, long_, self._strip_sizes),
+            (284, short, [1]),
+            (317, short, [2 if self.compress_level > 0 else 1]),  # 水平差分预测
+            (338, short, [2]),  # 第4通道为非预乘alpha
+        ]
+        if self.dpi:
+            resolution = fractions.Fraction(self.dpi).limit_denominator(1000)
+            resolution = [resolution.numerator, resolution.denominator]
+            entries += [(282, rational, resolution), (283, rational, resolution), (296, short, [2])]  # 单位：英寸
+            entries.sort(key=lambda entry: entry[0])  # IFD条目需按标签号升序
+        if self._file.tell() - self._base > 0xffffffff - 4096:
+            raise ValueError("TIFF文件超过4GB，请降低导出dpi")
+        ifd_offset = self._file.tell() - self._base
+        ifd_offset += ifd_offset % 2  # IFD需字对齐
+        extra_offset = ifd_offset + 2 + len(entries) * 12 + 4
+        ifd, extra = [struct.pack('<H', len(entries))], []
+        for tag, type_, values in entries:
+            count = len(values) // 2 if type_ == rational else len(values)  # 有理数为两个LONG（分子、分母）
+            payload = struct.pack(f"<{len(values)}{'H' if type_ == short else 'I'}", *values)
+            if len(payload) <= 4:
+                ifd.append(struct.pack('<HHI', tag, type_, count) + payload.ljust(4, b'\x00'))
+            else:
+                ifd.append(struct.pack('<HHII', tag, type_, count, extra_offset))
+                extra.append(payload)
+                extra_offset += len(payload)
+        ifd.append(struct.pack('<I', 0))  # 无下一个IFD
+        self._file.write(b'\x00' * (ifd_offset - (self._file.tell() - self._base)))
+        self._file.write(b''.join(ifd + extra))
+        end = self._file.tell()
+        self._file.seek(self._base + 4)
+        self._file.write(struct.pack('<I', ifd_offset))
+        self._file.seek(end)
+
+
+IMAGE_WRITERS = {'png': PngStreamWriter, 'tiff': TiffStreamWriter}
+
+
+def image_format(path):
+    """按扩展名选择输出格式：.tif/.tiff 为TIFF，其余为PNG"""
+    return 'tiff' if pathlib.PurePath(path).suffix.lower() in TIFF_SUFFIXES else 'png'
+
+
+def encode_image(rgba, compress_level=6, fmt='png', dpi=None):
+    """RGBA(uint8, 高×宽×4) → PNG/TIFF字节；zlib压缩期间释放GIL，可在线程池中并行"""
+    height, width = rgba.shape[:2]
+    buf = io.BytesIO()
+    with IMAGE_WRITERS[fmt](buf, width, height, compress_level, dpi) as writer:
+        writer.write_rows(rgba)
+    return buf.getvalue()
+
+
+def encode_png(rgba, compress_level=6, dpi=None):
+    return encode_image(rgba, compress_level, 'png', dpi)
+
+
+@contextlib.contextmanager
+def _export_facecolors(fig, transparent):
+    """与 savefig(facecolor='none', transparent=...) 相同：导出期间临时去掉画布（及坐标轴）底色"""
+    patches = [fig.patch] + ([ax.patch for ax in fig.axes] if transparent else [])
+    saved = [(p.get_facecolor(), p.get_edgecolor()) for p in patches]
+    for p in patches:
+        p.set_facecolor('none')
+        p.set_edgecolor('none')
+    try:
+        yield
+    finally:
+        for p, (fc, ec) in zip(patches, saved):
+            p.set_facecolor(fc)
+            p.set_edgecolor(ec)
+
+
+@contextlib.contextmanager
+def _figure_at_dpi(fig, dpi):
+    """临时把 fig 切换到导出dpi并挂上Agg画布，返回画布像素尺寸 (宽, 高)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    original_dpi = fig.dpi
+    canvas = FigureCanvasAgg(fig)
+    fig.set_dpi(dpi)
+    try:
+        yield canvas.get_width_height(physical=True)
+    finally:
+        fig.set_dpi(original_dpi)
+
+
+def figure_buffer_nbytes(fig, dpi):
+    """按 dpi 整图绘制时RGBA缓冲的字节数"""
+    width, height = fig.get_size_inches() * dpi
+    return int(width) * int(height) * 4
+
+
+def render_figure_rgba(fig, dpi, transparent=True):
+    """按目标dpi绘制一次，返回RGBA数组（拷贝）；不做 bbox_inches='tight' 的二次绘制"""
+    with _figure_at_dpi(fig, dpi), _export_facecolors(fig, transparent):
+        fig.canvas.draw()
+        return np.array(fig.canvas.buffer_rgba())
+
+
+def _render_rows(fig, dpi, d0, d1, width, height):
+    """
+    只绘制整图第 d0~d1 行（整像素，全宽），返回RGBA数组 (d1-d0)×width×4
+    借助 savefig(bbox_inches=Bbox) 平移画布：坐标轴位置按整图固定，平移量为整像素，像素相位与整图一次绘制一致
+    宽高各加半个像素，避免浮点误差使画布尺寸向下取整时少一行/列（savefig 按 int 截断）
+    """
+    from matplotlib.transforms import Bbox
+    bbox = Bbox.from_bounds(0, (height - d1) / dpi, (width + 0.5) / dpi, (d1 - d0 + 0.5) / dpi)
+    buf = io.BytesIO()
+    fig.savefig(buf, format='raw', dpi=dpi, bbox_inches=bbox, facecolor='none', edgecolor='none')
+    return np.frombuffer(buf.getbuffer(), dtype=np.uint8).reshape(d1 - d0, width, 4)
+
+
+def figure_crop_box(fig, dpi, pad_px, artists=None):
+    """
+    按图元包围盒（与 bbox_inches='tight' 相同）求导出裁剪框 (top, bottom, left, right)，
+    单位为整图像素、向外取整并四周留 pad_px；不需要绘制整图，可用于分块导出
+    artists: 只按这些图元（如色条坐标轴）求包围盒，None 为整张图
+    """
+    from matplotlib.backends.backend_agg import RendererAgg
+    from matplotlib.transforms import Bbox
+    with _figure_at_dpi(fig, dpi) as (width, height):
+        renderer = RendererAgg(1, 1, dpi)  # 只用于文字测量，缓冲不随dpi增大
+        if artists is None:
+            x0, y0, x1, y1 = fig.get_tightbbox(renderer).extents * dpi
+        else:
+            x0, y0, x1, y1 = Bbox.union([a.get_tightbbox(renderer) for a in artists]).extents
+    return (int(np.floor(height - y1)) - pad_px, int(np.ceil(height - y0)) + pad_px,
+            int(np.floor(x0)) - pad_px, int(np.ceil(x1)) + pad_px)
+
+
+def iter_figure_strips(fig, dpi, strip_rows, box=None, transparent=True):
+    """
+    按水平条带分块绘制 fig，自上而下逐条产出RGBA数组（条带行数×裁剪宽×4）；
+    每次只分配 画布宽×(strip_rows+上下余量) 的绘制缓冲，拼接结果与整图一次绘制后按 box 截取逐像素一致
+    box: (top, bottom, left, right) 整图像素坐标，可超出画布（超出部分为透明）；None 为整张画布
+    """
+    if strip_rows < 1:
+        raise ValueError("条带行数必须≥1")
+    # Agg按中心线裁剪描边：中心线在缓冲外的线条整条不画，条带边缘需多画一段再丢弃
+    overlap = int(np.ceil(STRIP_OVERLAP_PT * dpi / 72))
+    with _figure_at_dpi(fig, dpi) as (width, height), _export_facecolors(fig, transparent):
+        top, bottom, left, right = box or (0, height, 0, width)
+        c0, c1 = max(left, 0), min(right, width)
+        for out_top in range(top, bottom, strip_rows):
+            out_bottom = min(out_top + strip_rows, bottom)
+            strip = np.zeros((out_bottom - out_top, right - left, 4), dtype=np.uint8)
+            r0, r1 = max(out_top, 0), min(out_bottom, height)
+            if r0 < r1 and c0 < c1:
+                d0, d1 = max(r0 - overlap, 0), min(r1 + overlap, height)
+                rows = _render_rows(fig, dpi, d0, d1, width, height)
+                strip[r0 - out_top:r1 - out_top, c0 - left:c1 - left] = rows[r0 - d0:r1 - d0, c0:c1]
+            yield strip
+
+
+def tight_crop_alpha(rgba, pad_px):
+    """按alpha通道求非透明内容的包围盒并四周留 pad_px 透明边（等效 bbox_inches='tight'）"""
+    alpha = rgba[:, :, 3]
+    rows = np.flatnonzero(alpha.any(axis=1))
+    cols = np.flatnonzero(alpha.any(axis=0))
+    if rows.size == 0:
+        return rgba
+    top, bottom = rows[0] - pad_px, rows[-1] + 1 + pad_px
+    left, right = cols[0] - pad_px, cols[-1] + 1 + pad_px
+    out = np.zeros((bottom - top, right - left, 4), dtype=np.uint8)
+    src = rgba[max(top, 0):bottom, max(left, 0):right]
+    out[max(-top, 0):max(-top, 0) + src.shape[0], max(-left, 0):max(-left, 0) + src.shape[1]] = src
+    return out
+
+
+def write_sector_sidecar(path, tables, fmt='npz'):
+    """
+    把多张图的扇区表（列名 → 数组，见 pizza_sector_table）按列拼接，整批写成一个文件：
+    'npz' 用 numpy 写出（rgba 为 (N, 4) 数组）；'parquet' 需安装 pyarrow（rgba 为定长4的 uint8 列表列）
+    """
+    if fmt not in SIDECAR_FORMATS:
+        raise ValueError(f"数据表格式需为{SIDECAR_FORMATS}之一，当前{fmt}")
+    if not tables:
+        raise ValueError("没有可写出的扇区数据！")
+    columns = {name: np.concatenate([table[name] for table in tables]) for name in tables[0]}
+    if fmt == 'npz':
+        with open(path, 'wb') as f:
+            np.savez(f, **columns)
+        return path
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("写出Parquet需要安装pyarrow") from None
+    rgba = columns.pop("rgba")
+    arrays = {name: pa.array(values) for name, values in columns.items()}
+    arrays["rgba"] = pa.FixedSizeListArray.from_arrays(pa.array(rgba.ravel()), 4)
+    pq.write_table(pa.table(arrays), path)
+    return path
+
+
+class RenderCache:
+    """
+    渲染结果缓存：按键保存渲染好的 RGBA 图像（只读，可直接多次提交导出），
+    总字节数超过 max_bytes 时淘汰最久未用的条目；同一键并发未命中时各自渲染，结果相同
+    """
+
+    def __init__(self, max_bytes=64 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        """命中时直接返回缓存图像，否则调用 render() 渲染（在锁外进行）并存入"""
+        with self._lock:
+            image = self._data.get(key)
+            if image is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return image
+            self.misses += 1
+        image = render()
+        image.flags.writeable = False
+        if image.nbytes > self.max_bytes:
+            return image  # 单张超过上限的不缓存
+        with self._lock:
+            old = self._data.pop(key, None)
+            self.nbytes += image.nbytes - (old.nbytes if old is not None else 0)
+            self._data[key] = image
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ExportCancelled(Exception):
+    """导出任务已被取消"""
+
+
+class ExportJob:
+    """
+    后台导出任务句柄：工作线程执行 run(job)，调用方可随时查询进度、取消，并取得已写完的部分结果
+    回调均在导出线程中调用，界面需自行转回主线程：
+        on_file(path)            每个文件完整写出后
+        on_progress(done, total) 与 on_file 同时，done 为已写完的文件数
+        on_done(job)             结束（完成/取消/失败）后，job.status 为 'done'/'cancelled'/'failed'
+    取消为协作式：正在写的文件会写完，已绘制未编码的排队文件被丢弃，不会留下写了一半的文件
+    """
+
+    def __init__(self, run, total, on_progress=None, on_file=None, on_done=None):
+        self.total = total
+        self.on_progress = on_progress
+        self.on_file = on_file
+        self.on_done = on_done
+        self.status = 'pending'
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._run_func = run
+        self._result = None
+        self._paths = []
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.status = 'running'
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """请求取消；立即返回，可用 wait() 等待导出线程停下"""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self._finished.is_set()
+
+    @property
+    def paths(self):
+        """已完整写出的文件（按完成顺序）"""
+        with self._lock:
+            return list(self._paths)
+
+    @property
+    def progress(self):
+        with self._lock:
+            return len(self._paths), self.total
+
+    def file_written(self, path):
+        with self._lock:
+            self._paths.append(path)
+            done = len(self._paths)
+        if self.on_file:
+            self.on_file(path)
+        if self.on_progress:
+            self.on_progress(done, self.total)
+
+    def _run(self):
+        try:
+            if self.cancelled:
+                raise ExportCancelled()
+            self._result = self._run_func(self)
+            self.status = 'done'
+        except ExportCancelled:
+            self.status = 'cancelled'
+        except Exception as e:  # 失败同样保留已写完的部分结果，由调用方决定如何提示
+            self.error = e
+            self.status = 'failed'
+        finally:
+            self._finished.set()
+            if self.on_done:
+                self.on_done(self)
+
+    def wait(self, timeout=None):
+        """等待导出线程结束，超时返回 False"""
+        return self._finished.wait(timeout)
+
+    def result(self, timeout=None):
+        """等待结束并返回 run 的返回值；失败时抛出原异常，取消时抛出 ExportCancelled"""
+        if not self.wait(timeout):
+            raise TimeoutError("导出任务尚未结束")
+        if self.status == 'failed':
+            raise self.error
+        if self.status == 'cancelled':
+            raise ExportCancelled()
+        return self._result
+
+
+class ExportPipeline:
+    """
+    导出流水线：调用线程依次绘制（matplotlib绘制需持有GIL，串行即可），
+    alpha裁剪、PNG/TIFF滤波压缩与写盘交给线程池并行；待处理图像数有上限，内存不随文件数增长
+    tile_bytes: 整图RGBA缓冲超过该字节数时改为分条带绘制、逐条流式写出（None 不分块），内存不随dpi增长
+    on_written: 可选回调 on_written(path)，每个文件完整写出后调用（在线程池或调用线程中）
+    cancel_event: 可选 threading.Event，置位后 check_cancelled/分块导出抛出 ExportCancelled
+    timings 记录各阶段累计耗时（秒，线程池内各阶段为各线程之和）；输出格式按文件扩展名选择
+    """
+
+    def __init__(self, workers=4, compress_level=6, max_pending=None, tile_bytes=None,
+                 on_written=None, cancel_event=None):
+        if not 0 <= compress_level <= 9:
+            raise ValueError("压缩级别需在0~9之间")
+        self.compress_level = compress_level
+        self.tile_bytes = tile_bytes
+        self.on_written = on_written
+        self._cancel_event = cancel_event
+        self.timings = {"render": 0.0, "crop": 0.0, "encode": 0.0, "write": 0.0}
+        self.files = 0
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 2)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._futures = []
+
+    def check_cancelled(self):
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise ExportCancelled()
+
+    def render(self, fig, dpi=300, transparent=True):
+        """在调用线程绘制 fig，返回RGBA数组（计入绘制耗时）"""
+        start = time.perf_counter()
+        rgba = render_figure_rgba(fig, dpi, transparent)
+        with self._lock:
+            self.timings["render"] += time.perf_counter() - start
+        return rgba
+
+    def submit(self, fig, path, dpi=300, pad_inches=0.1, transparent=True, crop_artists=None):
+        """
+        绘制 fig 并排队裁剪/编码/写盘，返回 Future（结果为写出的路径）
+        整图缓冲超过 tile_bytes 时分块导出（返回时已写完）；crop_artists 仅在分块导出时用于求裁剪框
+        """
+        pad_px = int(round(pad_inches * dpi))
+        if self.tile_bytes and figure_buffer_nbytes(fig, dpi) > self.tile_bytes:
+            return self._write_tiled(fig, path, dpi, pad_px, transparent, crop_artists)
+        rgba = self.render(fig, dpi, transparent)
+        return self.submit_rgba(rgba, path, pad_px=pad_px, dpi=dpi)
+
+    def submit_rgba(self, rgba, path, pad_px=0, dpi=None):
+        """排队裁剪/编码/写盘一张已绘制好的图像；同一数组可提交多次（只读使用）；dpi 写入文件元数据"""
+        self._slots.acquire()  # 排队图像过多时阻塞绘制端，限制内存
+        future = self._executor.submit(self._encode_and_write, rgba, path, pad_px, dpi)
+        future.add_done_callback(lambda f: self._slots.release())
+        self._futures.append(future)
+        return future
+
+    def _encode_and_write(self, rgba, path, pad_px, dpi):
+        t0 = time.perf_counter()
+        rgba = tight_crop_alpha(rgba, pad_px)
+        t1 = time.perf_counter()
+        data = encode_image(rgba, self.compress_level, image_format(path), dpi)
+        t2 = time.perf_counter()
+        with open(path, 'wb') as f:
+            f.write(data)
+        t3 = time.perf_counter()
+        with self._lock:
+            self.timings["crop"] += t1 - t0
+            self.timings["encode"] += t2 - t1
+            self.timings["write"] += t3 - t2
+            self.files += 1
+        if self.on_written:
+            self.on_written(path)
+        return path
+
+    def _write_tiled(self, fig, path, dpi, pad_px, transparent, crop_artists):
+        """
+        分块导出：调用线程逐条绘制，上一条在线程池中压缩写盘的同时绘制下一条；
+        同时存在的条带大小缓冲约四份（绘制缓冲、待写条带及其滤波结果、下一条），条带高度据此取，峰值约为 tile_bytes
+        整图alpha范围要等全部条带画完才知道，因此裁剪框改按图元包围盒计算（同 bbox_inches='tight'）
+        """
+        start = time.perf_counter()
+        strip_rows = max(1, self.tile_bytes // (int(fig.get_figwidth() * dpi) * 4 * 4))
+        top, bottom, left, right = box = figure_crop_box(fig, dpi, pad_px, crop_artists)
+        render_time = time.perf_counter() - start
+        writer_cls = IMAGE_WRITERS[image_format(path)]
+        writing = None
+        try:
+            with open(path, 'wb') as f, \
+                    writer_cls(f, right - left, bottom - top, self.compress_level, dpi) as writer, \
+                    contextlib.closing(iter_figure_strips(fig, dpi, strip_rows, box, transparent)) as strips:
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        strip = next(strips, None)
+                        render_time += time.perf_counter() - start
+                        if writing is not None:
+                            writing.result()  # 按顺序写入：上一条写完才提交下一条
+                        if strip is None:
+                            break
+                        self.check_cancelled()  # 条带之间检查，大图导出也能及时停止
+                        writing = self._executor.submit(self._write_strip, writer, strip)
+                finally:
+                    if writing is not None:
+                        concurrent.futures.wait([writing])  # 出错时也等写线程放开文件再关闭
+        except BaseException:
+            pathlib.Path(path).unlink(missing_ok=True)  # 不留下写了一半的文件
+            raise
+        with self._lock:
+            self.timings["render"] += render_time
+            self.files += 1
+        if self.on_written:
+            self.on_written(path)
+        future = concurrent.futures.Future()
+        future.set_result(path)
+        return future
+
+    def copy_file(self, src, dst):
+        """把已写出的文件复制为 dst（如各图共用的色条），计入写盘耗时与文件数"""
+        start = time.perf_counter()
+        shutil.copyfile(src, dst)
+        self.record_written(dst, time.perf_counter() - start)
+        return dst
+
+    def record_written(self, path, seconds):
+        """记录一个不经流水线编码、由调用方直接写出的文件（如扇区数据表）"""
+        with self._lock:
+            self.timings["write"] += seconds
+            self.files += 1
+        if self.on_written:
+            self.on_written(path)
+
+    def _write_strip(self, writer, strip):
+        start = time.perf_counter()
+        writer.write_rows(strip)
+        with self._lock:
+            self.timings["encode"] += time.perf_counter() - start  # 流式写出时压缩与写盘不再分开计时
+
+    def close(self):
+        """等待全部写完（有失败时抛出第一个异常），返回耗时统计"""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._executor.shutdown(wait=True)
+        return self.report()
+
+    def report(self):
+        return dict(self.timings, files=self.files, wall=time.perf_counter() - self._start,
+                    compress_level=self.compress_level)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        return False
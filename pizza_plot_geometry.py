@@ -0,0 +1,109 @@
+import functools
+import numpy as np
+
+RENDER_MODES = ('polygon', 'mesh')
+
+
+def _cos_sin(t):
+    """单位圆坐标；π/2 整数倍处的舍入残差（~1e-16）置零，轴线上的边精确落在轴线上，平移后像素取整结果不变"""
+    c, s = np.cos(t), np.sin(t)
+    c[np.abs(c) < 1e-12] = 0.0
+    s[np.abs(s) < 1e-12] = 0.0
+    return c, s
+
+
+def arc_point_counts(theta_span, radii_px, max_chord_error):
+    """按最大弦高误差（像素）计算每个半径上圆弧的采样点数（含两端点）"""
+    radii_px = np.asarray(radii_px, dtype=float)
+    counts = np.full(radii_px.shape, 2, dtype=int)
+    curved = radii_px > max_chord_error
+    # 弦高误差 e = r·(1 - cos(Δ/2)) → 单段允许的最大张角 Δ = 2·arccos(1 - e/r)
+    max_step = 2 * np.arccos(1 - max_chord_error / radii_px[curved])
+    counts[curved] = np.ceil(abs(theta_span) / max_step).astype(int) + 1
+    return np.maximum(counts, 2)
+
+
+def build_sector_verts(r_inner, r_outer, theta, px_per_unit, max_chord_error):
+    """逐层生成扇区顶点，返回列表，每层为 (n_blocks, k, 2) 数组"""
+    theta_start = theta[:-1, None]
+    theta_span = theta[1] - theta[0]
+    k_outer = arc_point_counts(theta_span, r_outer * px_per_unit, max_chord_error)
+    k_inner = arc_point_counts(theta_span, r_inner * px_per_unit, max_chord_error)
+
+    layer_verts = []
+    for i in range(len(r_outer)):
+        t_out = theta_start + theta_span * np.linspace(0, 1, k_outer[i])
+        t_in = theta_start + theta_span * np.linspace(1, 0, k_inner[i])
+        cos_out, sin_out = _cos_sin(t_out)
+        cos_in, sin_in = _cos_sin(t_in)
+        x = np.concatenate([r_outer[i] * cos_out, r_inner[i] * cos_in, r_outer[i] * cos_out[:, :1]], axis=1)
+        y = np.concatenate([r_outer[i] * sin_out, r_inner[i] * sin_in, r_outer[i] * sin_out[:, :1]], axis=1)
+        layer_verts.append(np.stack([x, y], axis=-1))
+    return layer_verts
+
+
+def build_mesh_grid(all_points, theta, px_per_unit, max_chord_error):
+    """生成整环网格的 (X, Y) 节点，返回 X, Y 及每块的角向分段数"""
+    theta_span = theta[1] - theta[0]
+    seg = arc_point_counts(theta_span, all_points[-1:] * px_per_unit, max_chord_error)[0] - 1
+    t = np.linspace(theta[0], theta[-1], (len(theta) - 1) * seg + 1)
+    cos_t, sin_t = _cos_sin(t)
+    x = all_points[:, None] * cos_t[None, :]
+    y = all_points[:, None] * sin_t[None, :]
+    return x, y, seg
+
+
+@functools.lru_cache(maxsize=64)
+def unit_pizza_geometry(n_blocks, layer_points, radius_px, max_chord_error, render_mode):
+    """单位外半径下的扇区几何（按配置缓存，调用方不得修改返回的数组）"""
+    all_points = np.array((0,) + layer_points + (1.0,))
+    theta = np.linspace(0, 2 * np.pi, n_blocks + 1)[::-1]
+    if render_mode == 'mesh':
+        x, y, seg = build_mesh_grid(all_points, theta, radius_px, max_chord_error)
+        return np.stack([x, y], axis=-1), seg
+    layer_verts = build_sector_verts(all_points[:-1], all_points[1:], theta, radius_px, max_chord_error)
+    return [v for verts in layer_verts for v in verts]
+
+
+LOD_METHODS = ('mean', 'max')
+
+
+def display_detail_limits(radius_px):
+    """外圈像素半径下可分辨的最大层数与块数（径向每像素一层、外圈周长每像素一块）"""
+    radius_px = max(float(radius_px), 2.0)
+    return int(np.ceil(radius_px)), int(np.ceil(2 * np.pi * radius_px))
+
+
+def downsample_pizza(data, layer_points, max_layers, max_blocks, method='mean'):
+    """
+    把数据矩阵聚合到可显示分辨率（LOD），返回 (data, layer_points)，未超限的轴保持不变
+    层向：按半径均匀取目标分界，吸附到最近的原始层分界，合并层的半径保持准确
+    块向：连续的块按组合并（组大小相差至多1块，角度偏差小于一个原始块，已在像素以下）
+    method: 'mean' 组内平均；'max' 组内最大值（保留孤立峰值）
+    """
+    if method not in LOD_METHODS:
+        raise ValueError(f"聚合方式需为{LOD_METHODS}之一，当前{method}")
+    reduce = np.add.reduceat if method == 'mean' else np.maximum.reduceat
+    data = np.asarray(data)
+    m_layers, n_blocks = data.shape
+    layer_points = tuple(layer_points)
+
+    if m_layers > max_layers >= 2:
+        bounds = np.clip(np.array((0,) + layer_points + (1.0,)), 0, 1)
+        targets = np.linspace(0, 1, max_layers + 1)[1:-1]
+        idx = np.clip(np.searchsorted(bounds, targets), 1, m_layers)
+        idx -= (targets - bounds[idx - 1]) < (bounds[idx] - targets)
+        cuts = np.unique(np.concatenate([[0], np.clip(idx, 1, m_layers - 1), [m_layers]]))
+        if len(cuts) > 2:
+            starts = cuts[:-1]
+            data = reduce(data, starts, axis=0)
+            if method == 'mean':
+                data /= np.diff(cuts)[:, None]  # 原地相除，保持存储精度
+            layer_points = tuple(bounds[cuts[1:-1]].tolist())
+
+    if n_blocks > max_blocks >= 2:
+        cuts = np.unique(np.round(np.linspace(0, n_blocks, max_blocks + 1)).astype(int))
+        data = reduce(data, cuts[:-1], axis=1)
+        if method == 'mean':
+            data /= np.diff(cuts)[None, :]
+    return data, layer_points
@@ -0,0 +1,382 @@
+"""
+渲染回归检查（金标准图像比对）：
+    update  渲染全部用例（Agg），写入参考图与基准耗时；--baseline <git版本> 时用该版本的绘图代码渲染
+    check   用当前代码重新渲染并与参考图做感知比对（CIELAB 色差 ΔE），同时给出各用例耗时及相对基准的倍率
+用例矩阵覆盖：层数/块数、自定义层区域、自定义刻度（钳位）、超出色标的数据、两种绘制模式、色条、缩略图模板
+改动绘图引擎（几何向量化、图元合并、LOD、栅格预览等）前先 update，改动后 check，一次运行同时确认速度与画面
+参考图与字体、matplotlib、FreeType 版本有关，golden.json 记录生成时的版本，应在同一环境中生成与比对
+仓库内 tests/golden/ 的参考图由重构前的基线版本（BASELINE_REV）绘制，tests/test_golden.py 逐用例比对；
+基线没有的功能（如 viridis 色图）无从比对，这类用例的参考图由当前代码生成，golden.json 中 source 注明
+示例：
+    python pizza_plot_golden.py update --dir tests/golden/ --baseline 3cb8522
+    python pizza_plot_golden.py check --dir tests/golden/ --diff-dir golden_diff/
+"""
+import json
+import time
+import pathlib
+import tempfile
+import subprocess
+import importlib.util
+import argparse
+import dataclasses
+import numpy as np
+
+DELTA_E_JND = 2.3  # CIELAB ΔE76 的“刚可察觉差异”
+DEFAULT_MAX_FRACTION = 0.05  # 允许超过 ΔE 阈值的像素比例（亚像素几何变化带来的抗锯齿边缘差异）
+EDGE_SHIFT_PX = 2  # 颜色落在参考图该半径邻域颜色范围内的像素视为边缘移动（如弧线分段数不同），不计差异
+MESH_MIN_CELL_PX = 2  # mesh 模式不抗锯齿：中心处扇区宽度不足该像素数的区域逐像素取样与基线不同，不参与比对
+GOLDEN_DPI = 100
+GOLDEN_FIGSIZE = (4, 4)
+MANIFEST_NAME = "golden.json"
+BASELINE_REV = "3cb8522"  # 重构前的基线版本（只有多边形绘制与 jet 色图）
+
+# 用例矩阵：kind 为 plot（generate_spec_plot 整图）、template（缩略图模板）或 colorbar
+# data 由 seed 确定性生成（标准正态 × scale + offset），params 与 build_plot_spec（pizza_plot_spec）的参数一致
+# 基线版本中，mesh 与缩略图模板用例按同尺寸的多边形整图绘制（画面应一致）；baseline=False 的用例基线无法绘制
+GOLDEN_CASES = (
+    {"name": "minimal_2x2", "m": 2, "n": 2, "seed": 0},
+    {"name": "default_5x12", "m": 5, "n": 12, "seed": 1},
+    {"name": "dense_20x180_mesh", "m": 20, "n": 180, "seed": 2, "params": {"render_mode": "mesh"}},
+    {"name": "dense_20x180_polygon", "m": 20, "n": 180, "seed": 2},
+    {"name": "fine_50x360_mesh", "m": 50, "n": 360, "seed": 3, "params": {"render_mode": "mesh"}},
+    {"name": "custom_layers", "m": 4, "n": 24, "seed": 4,
+     "params": {"layer_points": "0.1,0.5,0.6"}},
+    {"name": "edge_layers_clipped", "m": 4, "n": 16, "seed": 5,
+     "params": {"layer_points": "0.001,0.5,0.999"}},  # 层区域超出0.01~0.99时钳位
+    {"name": "custom_ticks_clamped", "m": 6, "n": 36, "seed": 6, "scale": 3.0,
+     "params": {"custom_ticks": "-1,0,1"}},
+    {"name": "out_of_range_vmin_vmax", "m": 6, "n": 36, "seed": 7, "scale": 2.0,
+     "params": {"vmin": -0.5, "vmax": 0.5, "render_mode": "mesh"}},
+    {"name": "few_ticks", "m": 3, "n": 8, "seed": 8, "params": {"tick_count": 3}},
+    {"name": "constant_data", "m": 3, "n": 6, "seed": 9, "scale": 0.0, "offset": 1.0},
+    {"name": "viridis", "m": 8, "n": 60, "seed": 10, "params": {"cmap": "viridis"}, "baseline": False},
+    {"name": "template_thumbnail", "kind": "template", "m": 10, "n": 72, "seed": 11},
+    {"name": "colorbar_default", "kind": "colorbar", "m": 2, "n": 2, "seed": 12},
+    {"name": "colorbar_custom_ticks", "kind": "colorbar", "m": 2, "n": 2, "seed": 12,
+     "params": {"custom_ticks": "-1,-0.5,0,0.5,1"}},
+)
+
+
+def case_data(case):
+    rng = np.random.default_rng(case["seed"])
+    return rng.standard_normal((case["m"], case["n"])) * case.get("scale", 1.0) + case.get("offset", 0.0)
+
+
+def case_spec(case):
+    from pizza_plot_spec import build_plot_spec
+    spec = build_plot_spec(case.get("params", {}), case_data(case))
+    return dataclasses.replace(spec, figsize=GOLDEN_FIGSIZE, dpi=GOLDEN_DPI)
+
+
+def render_case(case):
+    """按用例渲染为白底 RGBA uint8 图像（不透明，便于比对与查看）"""
+    from pizza_plot_core import generate_spec_plot, render_spec_image, generate_colorbar
+    from pizza_plot_export import render_figure_rgba
+    spec = case_spec(case)
+    kind = case.get("kind", "plot")
+    if kind == "template":
+        return flatten_rgba(render_spec_image(spec))
+    if kind == "colorbar":
+        ticks = [float(t) for t in case.get("params", {}).get("custom_ticks", "").split(",") if t]
+        fig, _ = generate_colorbar(spec.vmin, spec.vmax, 10, ticks, figsize=GOLDEN_FIGSIZE,
+                                   dpi=GOLDEN_DPI, cmap=spec.cmap)
+    elif kind == "plot":
+        fig, _ = generate_spec_plot(spec, target_dpi=GOLDEN_DPI)
+    else:
+        raise ValueError(f"未知用例类型：{kind}")
+    return flatten_rgba(render_figure_rgba(fig, GOLDEN_DPI, transparent=True))
+
+
+def load_baseline_core(rev=BASELINE_REV, repo_dir=None):
+    """从 git 取出 rev 版本的 pizza_plot_core.py 并以独立模块名导入（不影响当前的 pizza_plot_core）"""
+    repo_dir = pathlib.Path(repo_dir or pathlib.Path(__file__).resolve().parent)
+    try:
+        source = subprocess.run(["git", "show", f"{rev}:pizza_plot_core.py"], cwd=repo_dir,
+                                capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise ValueError(f"无法从 git 取出基线版本{rev}：{e}") from e
+    path = pathlib.Path(tempfile.mkdtemp()) / "pizza_plot_core_baseline.py"
+    path.write_bytes(source)
+    spec = importlib.util.spec_from_file_location(f"pizza_plot_core_baseline_{rev}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def render_baseline_case(core, case):
+    """
+    用基线版本的 generate_pizza_plot/generate_colorbar 渲染用例，规则同基线逻辑层：
+    启用自定义刻度时先把数据钳位到刻度范围；返回与 render_case 相同格式的图像
+    """
+    from pizza_plot_export import render_figure_rgba
+    if case.get("baseline", True) is False:
+        raise ValueError(f"用例{case['name']}使用了基线版本没有的功能")
+    spec = case_spec(case)
+    if case.get("kind", "plot") == "colorbar":
+        ticks = [float(t) for t in case.get("params", {}).get("custom_ticks", "").split(",") if t]
+        fig, _ = core.generate_colorbar(spec.vmin, spec.vmax, 10, ticks, figsize=GOLDEN_FIGSIZE, dpi=GOLDEN_DPI)
+    else:
+        data = np.array(spec.data)
+        if case.get("params", {}).get("custom_ticks"):
+            data = np.clip(data, spec.vmin, spec.vmax)
+        fig, _ = core.generate_pizza_plot(spec.m_layers, spec.n_blocks, list(spec.layer_points), data,
+                                          spec.vmin, spec.vmax, spec.tick_count,
+                                          figsize=GOLDEN_FIGSIZE, dpi=GOLDEN_DPI)
+    try:
+        return flatten_rgba(render_figure_rgba(fig, GOLDEN_DPI, transparent=True))
+    finally:
+        core.plt.close(fig)  # 基线经 pyplot 创建画布，需显式关闭
+
+
+def case_ignore_mask(case, shape):
+    """
+    不参与比对的像素：mesh 模式用例中心附近扇区宽度不足 MESH_MIN_CELL_PX 的圆盘
+    （不抗锯齿的逐像素取样与基线多边形的抗锯齿混色本就不同）；其余用例返回 None
+    """
+    spec = case_spec(case)
+    if spec.render_mode != "mesh" or case.get("kind", "plot") != "plot":
+        return None
+    from pizza_plot_core import generate_spec_plot
+    fig, ax = generate_spec_plot(spec, target_dpi=GOLDEN_DPI)
+    ax.apply_aspect()
+    cx, cy = ax.transData.transform((0, 0))
+    radius = MESH_MIN_CELL_PX * spec.n_blocks / (2 * np.pi) + EDGE_SHIFT_PX
+    rows, cols = np.ogrid[:shape[0], :shape[1]]
+    return np.hypot(rows + 0.5 - (shape[0] - cy), cols + 0.5 - cx) <= radius
+
+
+def time_case(case, repeat=3, render=render_case):
+    """渲染 repeat 次，返回 (图像, 最短耗时毫秒)；取最短值以减少调度抖动"""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = render(case)
+        best = min(best, time.perf_counter() - start)
+    return image, best * 1000
+
+
+def environment_versions():
+    """影响像素结果的依赖版本，写入 golden.json 并在比对时核对"""
+    import matplotlib
+    from matplotlib import ft2font
+    return {"matplotlib": matplotlib.__version__, "numpy": np.__version__,
+            "freetype": ft2font.__freetype_version__}
+
+
+def flatten_rgba(rgba):
+    """半透明像素按 alpha 合成到白底，返回不透明 RGBA uint8"""
+    rgba = np.asarray(rgba)
+    alpha = rgba[..., 3:4].astype(np.float32) / 255
+    rgb = rgba[..., :3].astype(np.float32) * alpha + 255 * (1 - alpha)
+    out = np.empty(rgba.shape, dtype=np.uint8)
+    out[..., :3] = np.floor(rgb + 0.5)
+    out[..., 3] = 255
+    return out
+
+
+def srgb_to_lab(rgb):
+    """sRGB（uint8）→ CIELAB（D65），向量化"""
+    c = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                             [0.3575761, 0.7151522, 0.1191920],
+                             [0.1804375, 0.0721750, 0.9503041]])
+    xyz /= (0.95047, 1.0, 1.08883)
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])],
+                    axis=-1)
+
+
+def _neighborhood_range(rgb, radius):
+    """每个像素 (2r+1)×(2r+1) 邻域内各通道的最小/最大值"""
+    h, w = rgb.shape[:2]
+    padded = np.pad(rgb, ((radius, radius), (radius, radius), (0, 0)), mode='edge')
+    lo, hi = rgb.copy(), rgb.copy()
+    for dy in range(2 * radius + 1):
+        for dx in range(2 * radius + 1):
+            window = padded[dy:dy + h, dx:dx + w]
+            np.minimum(lo, window, out=lo)
+            np.maximum(hi, window, out=hi)
+    return lo, hi
+
+
+def compare_images(reference, image, delta_e=DELTA_E_JND, max_fraction=DEFAULT_MAX_FRACTION,
+                   shift_px=EDGE_SHIFT_PX, ignore=None):
+    """
+    感知比对：逐像素 CIELAB ΔE76，超过 delta_e 的像素比例不超过 max_fraction，且没有成片（2×2全部超阈）的差异即通过
+    颜色仍在参考图 shift_px 邻域颜色范围内的像素（边缘亚像素移动后的抗锯齿混色）不计差异；
+    单个扇区变色、色标错位等成片差异即使面积很小也判为失败
+    ignore: 与图像同尺寸的布尔数组，为 True 的像素不参与比对
+    返回 {"passed", "mean_delta_e", "max_delta_e", "bad_fraction", "solid_pixels",
+          "delta_e"（逐像素，尺寸不同时为 None）}
+    """
+    if reference.shape != image.shape:
+        return {"passed": False, "mean_delta_e": np.inf, "max_delta_e": np.inf, "bad_fraction": 1.0,
+                "solid_pixels": None, "delta_e": None, "reason": f"尺寸不同：参考{reference.shape}，当前{image.shape}"}
+    diff = np.zeros(reference.shape[:2])
+    changed = np.any(reference[..., :3] != image[..., :3], axis=-1)
+    # 只对有变化的像素做色彩空间换算
+    if changed.any():
+        diff[changed] = np.linalg.norm(srgb_to_lab(reference[..., :3][changed])
+                                       - srgb_to_lab(image[..., :3][changed]), axis=-1)
+    if ignore is not None:
+        diff[ignore] = 0
+    bad = diff > delta_e
+    if shift_px and bad.any():
+        lo, hi = _neighborhood_range(reference[..., :3], shift_px)
+        bad &= np.any((image[..., :3] < lo) | (image[..., :3] > hi), axis=-1)
+    bad_fraction = float(np.count_nonzero(bad)) / diff.size
+    # 2×2 腐蚀：只留下所在2×2块全部超阈的像素
+    solid = bad[:-1, :-1] & bad[1:, :-1] & bad[:-1, 1:] & bad[1:, 1:]
+    solid_pixels = int(np.count_nonzero(solid))
+    return {"passed": bad_fraction <= max_fraction and solid_pixels == 0, "mean_delta_e": float(diff.mean()),
+            "max_delta_e": float(diff.max()), "bad_fraction": bad_fraction, "solid_pixels": solid_pixels,
+            "delta_e": diff}
+
+
+def diff_image(reference, delta_e_map, delta_e=DELTA_E_JND):
+    """差异可视化：参考图转淡灰作底，超过阈值的像素标红、低于阈值但有变化的标黄"""
+    gray = srgb_to_lab(reference[..., :3])[..., 0] / 100 * 255
+    out = np.empty(reference.shape, dtype=np.uint8)
+    out[..., :3] = (gray[..., None] * 0.3 + 255 * 0.7).astype(np.uint8)
+    out[..., 3] = 255
+    out[(delta_e_map > 0) & (delta_e_map <= delta_e)] = (255, 200, 0, 255)
+    out[delta_e_map > delta_e] = (255, 0, 0, 255)
+    return out
+
+
+def _read_png(path):
+    from PIL import Image  # matplotlib 的依赖，随其安装
+    with Image.open(path) as im:
+        return np.asarray(im.convert("RGBA"))
+
+
+def _write_png(path, rgba):
+    from pizza_plot_export import encode_png
+    pathlib.Path(path).write_bytes(encode_png(rgba))
+
+
+def _select_cases(names):
+    if not names:
+        return list(GOLDEN_CASES)
+    known = {case["name"]: case for case in GOLDEN_CASES}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"未知用例：{unknown}")
+    return [known[name] for name in names]
+
+
+def update_golden(golden_dir, names=None, repeat=3, baseline=None):
+    """
+    渲染用例并写入参考图与基准耗时（只更新选中的用例，其余保留）
+    baseline: git 版本号，非 None 时用该版本的绘图代码渲染（基线无法绘制的用例仍用当前代码，source 注明）
+    """
+    golden_dir = pathlib.Path(golden_dir)
+    golden_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = golden_dir / MANIFEST_NAME
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+    manifest.update(environment_versions())
+    core = load_baseline_core(baseline) if baseline else None
+    cases = manifest.setdefault("cases", {})
+    for case in _select_cases(names):
+        if core is not None and case.get("baseline", True):
+            image, ms = time_case(case, repeat, lambda c: render_baseline_case(core, c))
+            source = f"baseline {baseline}"
+        else:
+            image, ms = time_case(case, repeat)
+            source = "current"
+        _write_png(golden_dir / f"{case['name']}.png", image)
+        cases[case["name"]] = {"ms": round(ms, 3), "shape": list(image.shape), "source": source}
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    return manifest
+
+
+def check_golden(golden_dir, names=None, repeat=3, delta_e=DELTA_E_JND, max_fraction=DEFAULT_MAX_FRACTION,
+                 diff_dir=None):
+    """
+    重新渲染并与参考图比对，返回各用例结果列表：
+    {"name", "passed", "mean_delta_e", "max_delta_e", "bad_fraction", "solid_pixels", "ms", "baseline_ms", "speedup"}
+    diff_dir 非 None 时为未通过的用例写出差异图与当前渲染结果
+    """
+    golden_dir = pathlib.Path(golden_dir)
+    manifest_path = golden_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise ValueError(f"{golden_dir}中没有参考图，请先运行 update")
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    for name, version in environment_versions().items():
+        if manifest.get(name) != version:
+            print(f"注意：参考图由 {name} {manifest.get(name)} 生成，当前为 {version}")
+    results = []
+    for case in _select_cases(names):
+        baseline = manifest.get("cases", {}).get(case["name"])
+        ref_path = golden_dir / f"{case['name']}.png"
+        image, ms = time_case(case, repeat)
+        if baseline is None or not ref_path.exists():
+            result = {"passed": False, "mean_delta_e": np.inf, "max_delta_e": np.inf, "bad_fraction": 1.0,
+                      "solid_pixels": None, "delta_e": None, "reason": "缺少参考图"}
+            reference = None
+        else:
+            reference = _read_png(ref_path)
+            result = compare_images(reference, image, delta_e, max_fraction,
+                                    ignore=case_ignore_mask(case, image.shape))
+        delta_e_map = result.pop("delta_e")
+        if diff_dir is not None and not result["passed"]:
+            diff_dir = pathlib.Path(diff_dir)
+            diff_dir.mkdir(parents=True, exist_ok=True)
+            _write_png(diff_dir / f"{case['name']}_actual.png", image)
+            if delta_e_map is not None:
+                _write_png(diff_dir / f"{case['name']}_diff.png", diff_image(reference, delta_e_map, delta_e))
+        baseline_ms = baseline["ms"] if baseline else None
+        results.append({"name": case["name"], **result, "ms": ms, "baseline_ms": baseline_ms,
+                        "speedup": baseline_ms / ms if baseline_ms and ms > 0 else None})
+    return results
+
+
+def format_results(results):
+    lines = [f"{'用例':<26}{'结果':<6}{'平均ΔE':>8}{'最大ΔE':>8}{'超阈%':>8}{'成片':>6}{'耗时ms':>9}{'基准ms':>9}{'倍率':>7}"]
+    for r in results:
+        speedup = f"{r['speedup']:.2f}x" if r["speedup"] else "-"
+        baseline = f"{r['baseline_ms']:.1f}" if r["baseline_ms"] else "-"
+        lines.append(f"{r['name']:<28}{'通过' if r['passed'] else '失败':<6}{r['mean_delta_e']:>10.3f}"
+                     f"{r['max_delta_e']:>10.2f}{r['bad_fraction'] * 100:>10.3f}"
+                     f"{'-' if r['solid_pixels'] is None else r['solid_pixels']:>8}{r['ms']:>11.1f}"
+                     f"{baseline:>11}{speedup:>9}" + (f"  {r['reason']}" if r.get("reason") else ""))
+    failed = sum(not r["passed"] for r in results)
+    lines.append(f"共{len(results)}个用例，{failed}个未通过")
+    return "\n".join(lines)
+
+
+def main():
+    import matplotlib
+    matplotlib.use("Agg")
+    parser = argparse.ArgumentParser(description="披萨图渲染回归检查（金标准图像比对 + 计时）")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("update", "check"):
+        p = sub.add_parser(name)
+        p.add_argument("--dir", default="golden", help="参考图目录")
+        p.add_argument("--case", action="append", default=None, help="只处理指定用例（可重复）")
+        p.add_argument("--repeat", type=int, default=3, help="每个用例渲染次数（耗时取最短）")
+    sub.choices["update"].add_argument("--baseline", default=None,
+                                       help=f"用该 git 版本的绘图代码生成参考图（如 {BASELINE_REV}）")
+    check = sub.choices["check"]
+    check.add_argument("--delta-e", type=float, default=DELTA_E_JND, help="单像素色差阈值（CIELAB ΔE76）")
+    check.add_argument("--max-fraction", type=float, default=DEFAULT_MAX_FRACTION,
+                       help="允许超过阈值的像素比例")
+    check.add_argument("--diff-dir", default=None, help="为未通过的用例写出差异图")
+    sub.add_parser("list")
+    args = parser.parse_args()
+
+    if args.cmd == "list":
+        for case in GOLDEN_CASES:
+            print(case["name"])
+    elif args.cmd == "update":
+        manifest = update_golden(args.dir, args.case, args.repeat, args.baseline)
+        print(f"已写入{len(args.case or GOLDEN_CASES)}个参考图（共{len(manifest['cases'])}个）至{args.dir}")
+    else:
+        results = check_golden(args.dir, args.case, args.repeat, args.delta_e, args.max_fraction, args.diff_dir)
+        print(format_results(results))
+        raise SystemExit(0 if all(r["passed"] for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
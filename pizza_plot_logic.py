@@ -1,17 +1,76 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import pathlib
+import dataclasses
+import threading
+import time
+import contextlib
 from datetime import datetime
-from pizza_plot_core import generate_pizza_plot, generate_colorbar
+import math
+from pizza_plot_core import (
+    generate_colorbar, generate_pizza_sheet, generate_spec_plot, render_plot_spec,
+    render_spec_image, sample_pizza_points, pizza_sector_table, finite_data_range, ColorScratch, PlotSpec,
+    RENDER_MODES
+)
+from pizza_plot_geometry import LOD_METHODS, display_detail_limits, downsample_pizza
+from pizza_plot_timeseries import load_timeseries, write_pizza_timeseries
+from pizza_plot_stream import PlotStream, open_frame_reader
+from pizza_plot_export import (
+    ExportJob, ExportPipeline, RenderCache, render_figure_rgba, write_sector_sidecar,
+    DRAFT_COMPRESS_LEVEL, EXPORT_FORMATS, SIDECAR_FORMATS
+)
+from pizza_plot_colormap import DEFAULT_COLORMAP, get_colormap, register_colormap
+from pizza_plot_scale import (
+    load_summary, resolve_color_range, QuantileSketch, SCALE_MODES, DEFAULT_PERCENTILES
+)
+
+from pizza_plot_memory import MemoryMonitor
+
+COLORBAR_FIGSIZE = (5, 5)  # 色条画布尺寸（英寸），预览与导出一致
+
+
+def _freeze(data):
+    """
+    绘图项数据只整体替换、不原地修改：置为只读后快照可直接共享同一数组
+    只能用于逻辑层自己持有的数组；外部传入的数组须先拷贝，否则会把调用方的缓冲也置为只读
+    """
+    data.flags.writeable = False
+    return data
 
 
 class PizzaPlotLogic:
-    def __init__(self):
+    """
+    线程安全约定：plot_items 与全局数据范围的增删改均在 self._lock 内完成；
+    渲染前先用 snapshot_spec 在锁内取不可变快照，渲染本身在锁外进行
+    storage_dtype: 绘图项数据的存储精度，默认float32（显示足够，内存减半），需要时可设为float64
+    """
+
+    def __init__(self, storage_dtype=np.float32):
+        if np.dtype(storage_dtype).kind != 'f':
+            raise ValueError("存储精度需为浮点类型（如float32/float64）")
+        self.storage_dtype = np.dtype(storage_dtype)
+        self._lock = threading.RLock()
         self.plot_items = {}
+        self.streams = {}
         self.global_data_min = 0
         self.global_data_max = 1
+        self.shared_range = None  # 批处理合并得到的共享色标 (vmin, vmax)；设置后不再按已加载数据计算
+        self.scale_mode = 'minmax'  # 色标模式（SCALE_MODES之一），未启用自定义刻度时生效
+        self.scale_percentiles = DEFAULT_PERCENTILES  # 百分位模式的低/高百分位数
+        self._sketch = None  # 百分位模式下增量维护的全部数据分位数草图
+        self.colormap = DEFAULT_COLORMAP  # 会话色图（缩略图、预览、导出与色条共用）；绘图项可在 config["cmap"] 单独指定
+        self.max_chord_error = 0.25  # 圆弧折线化最大弦高误差（像素）
+        self.preview_lod = 'mean'  # 缩略图聚合方式（LOD_METHODS之一），None时缩略图也用全分辨率
+        self.export_workers = 4  # 导出时PNG编码/写盘线程数
+        self.export_compress_level = 6  # PNG压缩级别（0~9），草稿导出固定用最低压缩
+        self.export_dpi = 300  # 单图/色条导出分辨率
+        self.export_format = 'png'  # 导出格式（EXPORT_FORMATS之一）
+        self.export_tile_mb = 64  # 整图缓冲超过该值（MiB）时分条带绘制并流式写出，海报级dpi内存也有上限
+        self.export_sidecar = None  # 批量导出时附带的扇区数据表格式（SIDECAR_FORMATS之一），None 不写
+        self._colorbar_cache = RenderCache(max_bytes=64 * 2**20)  # 色条渲染结果，全局数据范围变化时清空
+        self.memory_monitor = None  # 内存诊断（MemoryMonitor），None 时不跟踪
         self._refresh_hook = None
         self._rebuild_ui_hook = None
+        self._log_hook = None
 
     # ---------- 钩子 ----------
     def set_refresh_hook(self, func):
@@ -20,9 +79,16 @@ class PizzaPlotLogic:
     def set_rebuild_ui_hook(self, func):
         self._rebuild_ui_hook = func
 
+    def set_log_hook(self, func):
+        self._log_hook = func
+
+    def _log(self, msg):
+        if self._log_hook:
+            self._log_hook(msg)
+
     # ---------- 配置解析 ----------
     def parse_config(self, m_str, n_str, tick_str, custom_layer, layer_str,
-                     cb_font_str, enable_custom_ticks, cb_tick_str):
+                     cb_font_str, enable_custom_ticks, cb_tick_str, render_mode='polygon'):
         try:
             m = int(m_str)
             n = int(n_str)
@@ -31,6 +97,8 @@ class PizzaPlotLogic:
                 raise ValueError("层数/块数必须≥2！")
             if tick_count < 3:
                 raise ValueError("刻度数量必须≥3！")
+            if render_mode not in RENDER_MODES:
+                raise ValueError(f"绘制模式需为{RENDER_MODES}之一！")
 
             layer_points = []
             if custom_layer:
@@ -50,42 +118,50 @@ class PizzaPlotLogic:
             return {
                 "m_layers": m, "n_blocks": n, "layer_points": layer_points,
                 "tick_count": tick_count, "cb_font_size": cb_font,
-                "cb_custom_ticks": cb_ticks
+                "cb_custom_ticks": cb_ticks, "render_mode": render_mode
             }
         except ValueError as e:
             raise ValueError(f"配置解析失败：{str(e)}")
 
     # ---------- 绘图项管理 ----------
     def create_plot_item(self, config):
-        max_num = max((int(k.split('_')[1]) for k in self.plot_items), default=0)
-        plot_id = f"plot_{max_num + 1}"
         m = config["m_layers"]
         n = config["n_blocks"]
-        self.plot_items[plot_id] = {
-            "config": config,
-            "data": np.zeros((m, n)),
-            "fig": None
-        }
-        self.update_global_min_max()
+        with self._lock:
+            max_num = max((int(k.split('_')[1]) for k in self.plot_items), default=0)
+            plot_id = f"plot_{max_num + 1}"
+            self.plot_items[plot_id] = {
+                "config": config,
+                "data": None,
+                "range": None,  # 数据的 (最小值, 最大值)，随数据一起更新
+                "scratch": ColorScratch(),  # 重绘复用的颜色映射缓冲
+                "preview": None,  # 最近一次渲染的缩略图：(数据, 渲染参数, RGBA数组)，输入未变时直接复用
+                "fig": None
+            }
+            self._set_item_data(self.plot_items[plot_id], np.zeros((m, n), dtype=self.storage_dtype))
+            self.update_global_min_max()
         return plot_id
 
     def delete_plot_item(self, plot_id):
-        if plot_id not in self.plot_items:
-            raise ValueError(f"绘图项{plot_id}不存在！")
-        item = self.plot_items[plot_id]
-        if item["fig"]:
-            plt.close(item["fig"])
-
-        del_num = int(plot_id.split('_')[1])
-        del self.plot_items[plot_id]
-        self.update_global_min_max()
-
-        old_keys = sorted(self.plot_items, key=lambda k: int(k.split('_')[1]))
-        for old_id in old_keys:
-            cur_num = int(old_id.split('_')[1])
-            if cur_num > del_num:
-                new_id = f"plot_{cur_num - 1}"
-                self.plot_items[new_id] = self.plot_items.pop(old_id)
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+
+            del_num = int(plot_id.split('_')[1])
+            if self._sketch is not None:
+                self._sketch.remove(self.plot_items[plot_id]["data"])
+            del self.plot_items[plot_id]
+            self.stop_stream(plot_id)
+            self.update_global_min_max()
+
+            old_keys = sorted(self.plot_items, key=lambda k: int(k.split('_')[1]))
+            for old_id in old_keys:
+                cur_num = int(old_id.split('_')[1])
+                if cur_num > del_num:
+                    new_id = f"plot_{cur_num - 1}"
+                    self.plot_items[new_id] = self.plot_items.pop(old_id)
+                    if old_id in self.streams:
+                        self.streams[new_id] = self.streams.pop(old_id)
 
         self.regenerate_all_plots()
         if self._refresh_hook:
@@ -94,124 +170,392 @@ class PizzaPlotLogic:
             self._rebuild_ui_hook()
 
     def delete_all_plots(self):
-        for item in self.plot_items.values():
-            if item["fig"]:
-                plt.close(item["fig"])
-        self.plot_items.clear()
+        with self._lock:
+            self.plot_items.clear()
+            if self._sketch is not None:
+                self._sketch = QuantileSketch()
+            self.update_global_min_max()
+        for plot_id in list(self.streams):
+            self.stop_stream(plot_id)
         if self._refresh_hook:
             self._refresh_hook()
         if self._rebuild_ui_hook:
             self._rebuild_ui_hook()
 
-    def update_plot_data(self, plot_id, new_data_str):
-        if plot_id not in self.plot_items:
-            raise ValueError(f"绘图项{plot_id}不存在！")
-        item = self.plot_items[plot_id]
-        m = item["config"]["m_layers"]
-        n = item["config"]["n_blocks"]
+    def _set_item_data(self, item, data):
+        """替换绘图项数据（调用方持锁）：只更新该项的极值与草图中它的那部分，不重扫其他绘图项"""
+        data = _freeze(data)
+        if self._sketch is not None:
+            if item["data"] is not None:
+                self._sketch.remove(item["data"])
+            self._sketch.add(data)
+        item["data"] = data
+        # NaN/inf 单元绘制为透明，不参与色标范围；全部非有限时记为空范围
+        item["range"] = finite_data_range(data) or (np.inf, -np.inf)
 
-        lines = new_data_str.strip().split('\n')
-        data_rows = []
-        for line_idx, line in enumerate(lines, 1):
-            line = line.strip()
-            if not line:
-                raise ValueError(f"第{line_idx}行不能为空！")
-            nums = [float(x.strip()) for x in line.split(',')]
-            if len(nums) != n:
-                raise ValueError(f"第{line_idx}行需输入{n}个值！")
-            data_rows.append(nums)
-        if len(data_rows) != m:
-            raise ValueError(f"需输入{m}行数据！")
-
-        item["data"] = np.array(data_rows)
-        self.update_global_min_max()
+    def update_plot_data(self, plot_id, new_data_str):
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            item = self.plot_items[plot_id]
+            m = item["config"]["m_layers"]
+            n = item["config"]["n_blocks"]
+
+        data = self._parse_data_str(new_data_str, m, n)
+        with self._lock:
+            # 解析期间该项可能已被删除或因删除其他项而重新编号，此时不能再写入（草图中它的数据已移除）
+            if self.plot_items.get(plot_id) is not item:
+                raise ValueError(f"绘图项{plot_id}已被删除或重新编号，请重试！")
+            self._set_item_data(item, data)
+            self.update_global_min_max()
         self.regenerate_all_plots()
         if self._refresh_hook:
             self._refresh_hook()
 
-    # ---------- 绘图 ----------
-    def generate_plot_fig(self, plot_id, cb_custom_ticks=[], is_preview=True):
+    # ---------- 实时数据流 ----------
+    def start_stream(self, plot_id, source, kind='queue', max_fps=10):
+        """
+        为绘图项接入实时数据流，返回 PlotStream
+        kind: 'queue'（queue.Queue，元素为m×n数组或文本）、'file'（追加写入的文本文件）、
+              'fifo'（命名管道）、'unix'（在该路径监听Unix套接字）
+        文本帧格式与“设置数据”一致：m行，每行n个逗号分隔数值，帧之间空一行
+        """
         if plot_id not in self.plot_items:
             raise ValueError(f"绘图项{plot_id}不存在！")
-        item = self.plot_items[plot_id]
-        config = item["config"]
-        raw_data = item["data"]  # 原始数据（不修改）
-        
-        # 步骤1：获取vmin/vmax（取消时回落全局数据范围）
-        plot_vmin, plot_vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks)
-        
-        # 步骤2：仅启用自定义刻度时才钳位数据，取消时直接用原始数据
-        if cb_custom_ticks:
-            data_to_plot = self._clamp_data_to_range(raw_data, plot_vmin, plot_vmax)
-        else:
-            data_to_plot = raw_data  # 取消时用原始数据，不做任何钳位
-        
-        # 步骤3：传递数据给core层绘制
-        fig, ax = generate_pizza_plot(
-            m_layers=config["m_layers"],
-            n_blocks=config["n_blocks"],
-            layer_points=config["layer_points"],
-            data=data_to_plot,  # 取消时为原始数据，启用时为钳位后数据
-            vmin=plot_vmin,
-            vmax=plot_vmax,
-            tick_count=config["tick_count"],
-            figsize=(2, 2) if is_preview else (7, 7),
-            dpi=80 if is_preview else 100,
+        self.stop_stream(plot_id)
+        config = self.plot_items[plot_id]["config"]
+        m, n = config["m_layers"], config["n_blocks"]
+
+        def parse_frame(raw):
+            if isinstance(raw, str):
+                return self._parse_data_str(raw, m, n)
+            # 必须拷贝：生产者推入的数组可能继续被其原地复用，不能把它冻结为只读
+            frame = np.array(raw, dtype=self.storage_dtype, copy=True)
+            if frame.shape != (m, n):
+                raise ValueError(f"数据维度需为{m}×{n}，当前{frame.shape}")
+            return frame
+
+        stream = PlotStream(open_frame_reader(source, kind), parse_frame, max_fps=max_fps)
+        self.streams[plot_id] = stream.start()
+        return stream
+
+    def stop_stream(self, plot_id):
+        stream = self.streams.pop(plot_id, None)
+        if stream:
+            stream.stop()
+
+    def poll_streams(self):
+        """
+        主线程定时调用：把各流的最新帧写入对应绘图项（受各自刷新上限约束）
+        返回 (有新数据的plot_id列表, 全局数据范围是否变化)；范围不变时只需重绘这些图
+        """
+        updated = []
+        range_changed = False
+        with self._lock:
+            for plot_id, stream in self.streams.items():
+                frame = stream.take_frame()
+                if frame is not None:
+                    self._set_item_data(self.plot_items[plot_id], frame)
+                    updated.append(plot_id)
+            if updated:
+                old_range = (self.global_data_min, self.global_data_max)
+                self.update_global_min_max()
+                range_changed = old_range != (self.global_data_min, self.global_data_max)
+        return updated, range_changed
+
+    # ---------- 绘图 ----------
+    def snapshot_spec(self, plot_id, cb_custom_ticks=[], is_preview=False):
+        """在锁内取绘图项的不可变快照（PlotSpec），之后可在任意线程渲染"""
+        spec = self._snapshot_full_spec(plot_id, cb_custom_ticks, is_preview)
+        if is_preview and self.preview_lod:
+            spec = self._apply_preview_lod(spec)
+        return spec
+
+    def _snapshot_full_spec(self, plot_id, cb_custom_ticks, is_preview):
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            config = self.plot_items[plot_id]["config"]
+            # 获取vmin/vmax（取消时回落全局数据范围）；超出范围的值着色时取两端颜色
+            plot_vmin, plot_vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks)
+            spec = PlotSpec(
+                m_layers=config["m_layers"],
+                n_blocks=config["n_blocks"],
+                layer_points=tuple(config["layer_points"]),
+                data=self.plot_items[plot_id]["data"],  # 只读数组，整体替换而非原地修改，无需拷贝
+                vmin=plot_vmin,
+                vmax=plot_vmax,
+                tick_count=config["tick_count"],
+                render_mode=config.get("render_mode", "polygon"),
+                figsize=(1.5, 1.5) if is_preview else (7, 7),  # 缩略图按120像素显示区域渲染
+                dpi=80 if is_preview else 100,
+                cmap=config.get("cmap") or self.colormap,
+            )
+        return spec
+
+    def _apply_preview_lod(self, spec):
+        """
+        缩略图LOD：超出可显示分辨率的矩阵先聚合再绘制，并改用整环网格，
+        缩略图耗时与矩阵大小无关；放大预览与导出仍用全分辨率数据
+        """
+        if self.preview_lod not in LOD_METHODS:
+            raise ValueError(f"缩略图聚合方式需为{LOD_METHODS}之一")
+        max_layers, max_blocks = display_detail_limits(0.45 * min(spec.figsize) * spec.dpi)
+        if spec.m_layers <= max_layers and spec.n_blocks <= max_blocks:
+            return spec
+        data, layer_points = downsample_pizza(spec.data, spec.layer_points,
+                                              max_layers, max_blocks, self.preview_lod)
+        return dataclasses.replace(
+            spec, m_layers=data.shape[0], n_blocks=data.shape[1],
+            layer_points=layer_points, data=_freeze(data), render_mode='mesh',
         )
-        item["fig"] = fig
+
+    def generate_plot_fig(self, plot_id, cb_custom_ticks=[], is_preview=True, target_dpi=None):
+        spec = self.snapshot_spec(plot_id, cb_custom_ticks, is_preview)
+        return self._figure_from_spec(plot_id, spec, target_dpi)
+
+    def _figure_from_spec(self, plot_id, spec, target_dpi=None):
+        with self._lock:
+            scratch = self.plot_items[plot_id].get("scratch") if plot_id in self.plot_items else None
+        # 导出时按保存dpi（target_dpi）计算圆弧采样密度
+        # figure 只交给调用方、不再存入绘图项：导出完即可回收，避免每项常驻一张全分辨率画布
+        fig, ax = generate_spec_plot(spec, target_dpi=target_dpi, max_chord_error=self.max_chord_error,
+                                     scratch=scratch)
         return fig
 
+    def render_preview_image(self, plot_id, cb_custom_ticks=[]):
+        """
+        缩略图：套用缓存的画布模板，只绘制数据图元，返回只读 RGBA 图像（uint8数组）
+        数据（按对象）与渲染参数都未变时直接返回上次的缩略图，批量重绘后再重建列表不会重复渲染
+        """
+        full_spec = self._snapshot_full_spec(plot_id, cb_custom_ticks, is_preview=True)
+        # 自定义色图可同名重新注册，参数中带上LUT内容
+        params = (dataclasses.replace(full_spec, data=None), get_colormap(full_spec.cmap).lut.tobytes(),
+                  self.preview_lod, self.max_chord_error)
+        with self._lock:
+            item = self.plot_items.get(plot_id)
+            if item is None:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            cached = item["preview"]
+            if cached is not None and cached[0] is full_spec.data and cached[1] == params:
+                return cached[2]
+            scratch = item.get("scratch")
+        spec = self._apply_preview_lod(full_spec) if self.preview_lod else full_spec
+        image = render_spec_image(spec, max_chord_error=self.max_chord_error, scratch=scratch)
+        image.flags.writeable = False
+        with self._lock:
+            if self.plot_items.get(plot_id) is item:
+                item["preview"] = (full_spec.data, params, image)
+        return image
+
+    def render_plot_bytes(self, plot_id, cb_custom_ticks=[], fmt='png', dpi=300):
+        """线程安全：快照后在调用线程内渲染，返回图像字节（png/svg等）"""
+        spec = self.snapshot_spec(plot_id, cb_custom_ticks, is_preview=False)
+        return render_plot_spec(spec, fmt=fmt, dpi=dpi, max_chord_error=self.max_chord_error)
+
     # 修正前：def regenerate_all_plots(self): （无参数）
     # 修正后：添加cb_custom_ticks参数，与UI层调用匹配
     def regenerate_all_plots(self, cb_custom_ticks=[]):
-        """重绘所有图（接收自定义刻度参数，传递给generate_plot_fig）"""
-        for plot_id in list(self.plot_items.keys()):
-            self.generate_plot_fig(
-                plot_id,
-                cb_custom_ticks=cb_custom_ticks,  # 传递自定义刻度
-                is_preview=True,
-            )
+        """重绘所有缩略图（接收自定义刻度参数，传递给render_preview_image）"""
+        with self.memory_section("regenerate_all_plots"):
+            for plot_id in self.get_all_plot_ids():
+                try:
+                    self.render_preview_image(
+                        plot_id,
+                        cb_custom_ticks=cb_custom_ticks,  # 传递自定义刻度
+                    )
+                except ValueError:
+                    continue  # 重绘期间已被其他线程删除
+
+    def _colorbar_rgba(self, cb_font_size, cb_custom_ticks, dpi, transparent, render=render_figure_rgba):
+        vmin, vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks)
+        cmap = self.colormap
+        # 自定义色图可用同名重新注册，键中带上LUT内容，换了色标点的同名色图不会命中旧色条
+        lut = get_colormap(cmap).lut.tobytes()
+        key = (vmin, vmax, cb_font_size, tuple(cb_custom_ticks), COLORBAR_FIGSIZE, dpi, cmap, lut, transparent)
+
+        def render_colorbar():
+            fig, ax = generate_colorbar(vmin=vmin, vmax=vmax, cb_font_size=cb_font_size,
+                                        cb_custom_ticks=cb_custom_ticks, figsize=COLORBAR_FIGSIZE, cmap=cmap)
+            return render(fig, dpi, transparent)
+
+        return self._colorbar_cache.get(key, render_colorbar)
+
+    def render_colorbar_image(self, cb_font_size, cb_custom_ticks, dpi=100):
+        """
+        色条 RGBA 图像（只读，背景透明）：结果只取决于色标范围、字号、自定义刻度、尺寸、dpi 与色图，
+        重复预览/导出直接取缓存，不再建图、tight_layout 与绘制
+        """
+        return self._colorbar_rgba(cb_font_size, cb_custom_ticks, dpi, transparent=True)
 
     def generate_colorbar_fig(self, cb_font_size, cb_custom_ticks):
+        vmin, vmax = self.get_global_min_max()
         fig, ax = generate_colorbar(
-            vmin=self.global_data_min,
-            vmax=self.global_data_max,
+            vmin=vmin,
+            vmax=vmax,
             cb_font_size=cb_font_size,
-            cb_custom_ticks=cb_custom_ticks
+            cb_custom_ticks=cb_custom_ticks,
+            cmap=self.colormap,
         )
         return fig
 
     # ---------- 辅助 ----------
     def update_global_min_max(self):
-        all_data = []
-        for plot_id in self.plot_items:
-            all_data.append(self.plot_items[plot_id]["data"].flatten())
-        if all_data:
-            combined_data = np.concatenate(all_data)
-            self.global_data_min = combined_data.min()
-            self.global_data_max = combined_data.max()
-            if self.global_data_min == self.global_data_max:
+        with self._lock:
+            old_range = (self.global_data_min, self.global_data_max)
+            if self.shared_range is not None:
+                self.global_data_min, self.global_data_max = self.shared_range
+            elif self.plot_items:
+                # 各项极值在数据更新时已求好，这里只汇总
+                ranges = [item["range"] for item in self.plot_items.values()]
+                lo, hi = min(r[0] for r in ranges), max(r[1] for r in ranges)
+                if lo > hi:  # 没有任何有限值
+                    self.global_data_min, self.global_data_max = 0, 1
+                else:
+                    self.global_data_min, self.global_data_max = resolve_color_range(
+                        lo, hi, self.scale_mode, self._sketch, self.scale_percentiles,
+                    )
+            else:
                 self.global_data_min = 0
                 self.global_data_max = 1
-        else:
-            self.global_data_min = 0
-            self.global_data_max = 1
+            if (self.global_data_min, self.global_data_max) != old_range:
+                self._colorbar_cache.clear()  # 旧范围的色条不会再被命中，及时释放
 
     def get_plot_item(self, plot_id):
-        if plot_id not in self.plot_items:
-            raise ValueError(f"绘图项{plot_id}不存在！")
-        return self.plot_items[plot_id].copy()
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            return self.plot_items[plot_id].copy()
 
     def get_all_plot_ids(self):
-        return list(self.plot_items.keys())
+        with self._lock:
+            return list(self.plot_items.keys())
+
+    def set_scale_mode(self, mode, percentiles=None):
+        """
+        设置色标模式：'minmax' 全局最小/最大值，'percentile' 按 percentiles=(低, 高) 百分位数（默认1~99），
+        'symmetric' ±max|x|；百分位模式首次启用时扫描一遍全部数据建草图，之后随数据增删改增量更新
+        """
+        if mode not in SCALE_MODES:
+            raise ValueError(f"色标模式需为{SCALE_MODES}之一，当前{mode}")
+        percentiles = tuple(percentiles or self.scale_percentiles)
+        if len(percentiles) != 2 or not 0 <= percentiles[0] < percentiles[1] <= 100:
+            raise ValueError("百分位数需满足0≤低<高≤100！")
+        with self._lock:
+            self.scale_mode = mode
+            self.scale_percentiles = percentiles
+            if mode != 'percentile':
+                self._sketch = None
+            elif self._sketch is None:
+                self._sketch = QuantileSketch()
+                for item in self.plot_items.values():
+                    self._sketch.add(item["data"])
+        self.update_global_min_max()
+
+    def set_colormap(self, name, stops=None):
+        """
+        设置会话色图：name 为已注册色图名；传入 stops（十六进制色标点列表）时先以 name 注册为自定义色图
+        色图只在首次使用时编译进LUT库，之后切换不再重复计算
+        """
+        if stops is not None:
+            register_colormap(name, stops)
+        get_colormap(name)  # 校验并预先编译
+        with self._lock:
+            self.colormap = name
+
+    def set_plot_colormap(self, plot_id, name=None):
+        """单独指定某个绘图项的色图；name 为 None 时恢复跟随会话色图"""
+        if name is not None:
+            get_colormap(name)
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            self.plot_items[plot_id]["config"]["cmap"] = name
+
+    def set_shared_range(self, vmin=None, vmax=None):
+        """固定会话色标为共享范围（与其他分片/机器一致）；不传参数时恢复按已加载数据计算"""
+        with self._lock:
+            if vmin is None or vmax is None:
+                self.shared_range = None
+            elif vmin >= vmax:
+                raise ValueError("最小值必须小于最大值！")
+            else:
+                self.shared_range = (float(vmin), float(vmax))
+        self.update_global_min_max()
+
+    def load_shared_scale(self, path, percentiles=None):
+        """载入 pizza_plot_batch merge 输出的全局摘要并设为共享色标；percentiles=(低, 高) 时取稳健分位数"""
+        vmin, vmax = load_summary(path).color_range(percentiles)
+        self.set_shared_range(vmin, vmax)
+        self._log(f"已载入共享色标[{vmin:g}, {vmax:g}]")
+        return vmin, vmax
 
     def get_global_min_max(self):
-        return self.global_data_min, self.global_data_max
+        with self._lock:
+            return self.global_data_min, self.global_data_max
+
+    def sample_plot_points(self, plot_id, x, y):
+        """
+        批量取样：x, y 为数组（绘图坐标系，外圈半径为1），返回各点所在单元的数值，披萨外为NaN
+        用于按坐标批量查询，不经过任何图形对象
+        """
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            item = self.plot_items[plot_id]
+            layer_points, data = item["config"]["layer_points"], item["data"]
+        return sample_pizza_points(data, layer_points, x, y)
+
+    def get_plot_nbytes(self, plot_id):
+        """绘图项数据矩阵占用的内存（字节）"""
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            return self.plot_items[plot_id]["data"].nbytes
+
+    def get_memory_report(self):
+        """各绘图项数据内存 {plot_id: 字节数} 及合计"""
+        with self._lock:
+            per_item = {pid: item["data"].nbytes for pid, item in self.plot_items.items()}
+        return {"dtype": self.storage_dtype.name, "items": per_item, "total": sum(per_item.values())}
+
+    # ---------- 内存诊断 ----------
+    def enable_memory_diagnostics(self, report_path=None):
+        """开启内存诊断（tracemalloc），report_path 非 None 时报告同时追加写入该文件"""
+        if self.memory_monitor is None:
+            self.memory_monitor = MemoryMonitor(report_path).start()
+            self._log("内存诊断已开启" + (f"，报告写入：{report_path}" if report_path else ""))
+        return self.memory_monitor
+
+    def disable_memory_diagnostics(self):
+        if self.memory_monitor is not None:
+            self.memory_monitor.stop()
+            self.memory_monitor = None
+            self._log("内存诊断已关闭")
+
+    def memory_section(self, name):
+        """诊断开启时记录该段操作的净分配，否则什么也不做"""
+        monitor = self.memory_monitor
+        return monitor.track(name) if monitor is not None else contextlib.nullcontext()
+
+    def memory_diagnostics_report(self, tk_root=None):
+        """生成一次内存诊断报告，另统计绘图项数及仍持有 figure/缩略图的绘图项数"""
+        if self.memory_monitor is None:
+            raise ValueError("内存诊断未开启")
+        with self._lock:
+            items = list(self.plot_items.values())
+        extra = {
+            "plot_items": len(items),
+            "item_figs": sum(item.get("fig") is not None for item in items),
+            "item_previews": sum(item.get("preview") is not None for item in items),
+        }
+        return self.memory_monitor.report(tk_root, extra)
 
     def get_plot_data_str(self, plot_id):
-        if plot_id not in self.plot_items:
-            raise ValueError(f"绘图项{plot_id}不存在！")
-        data = self.plot_items[plot_id]["data"]
+        with self._lock:
+            if plot_id not in self.plot_items:
+                raise ValueError(f"绘图项{plot_id}不存在！")
+            data = self.plot_items[plot_id]["data"]
         return "\n".join([",".join(map(str, row)) for row in data])
     
     def _get_vmin_vmax_from_ticks(self, cb_custom_ticks):
@@ -220,8 +564,7 @@ class PizzaPlotLogic:
             vmin = unique_ticks[0]
             vmax = unique_ticks[-1]
         else:
-            vmin = self.global_data_min
-            vmax = self.global_data_max
+            vmin, vmax = self.get_global_min_max()
         
         if vmin == vmax:
             vmin = 0
@@ -229,9 +572,22 @@ class PizzaPlotLogic:
         
         return vmin, vmax
 
-    def _clamp_data_to_range(self, data, vmin, vmax):
-        return np.clip(data, vmin, vmax)
-    
+    def _parse_data_str(self, new_data_str, m, n):
+        lines = new_data_str.strip().split('\n')
+        data_rows = []
+        for line_idx, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line:
+                raise ValueError(f"第{line_idx}行不能为空！")
+            nums = [float(x.strip()) for x in line.split(',')]
+            if len(nums) != n:
+                raise ValueError(f"第{line_idx}行需输入{n}个值！")
+            data_rows.append(nums)
+        if len(data_rows) != m:
+            raise ValueError(f"需输入{m}行数据！")
+
+        return np.array(data_rows, dtype=self.storage_dtype)
+
     def _get_export_dir(self):
         """生成当前目录下的时间戳导出目录（如：export_20240520_153045）"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -239,95 +595,234 @@ class PizzaPlotLogic:
         export_dir.mkdir(parents=True, exist_ok=True)  # 自动创建目录，不存在则创建
         return export_dir
 
-    def export_single_plot(self, plot_id, cb_custom_ticks=[]):
-        """导出单张图到时间戳目录，文件名格式：plot{编号}_{时间戳}.png"""
+    def _open_export_pipeline(self, draft=False, job=None):
+        if self.export_format not in EXPORT_FORMATS:
+            raise ValueError(f"导出格式需为{EXPORT_FORMATS}之一，当前{self.export_format}")
+        if self.export_dpi <= 0:
+            raise ValueError("导出DPI必须为正数！")
+        return ExportPipeline(
+            workers=self.export_workers,
+            compress_level=DRAFT_COMPRESS_LEVEL if draft else self.export_compress_level,
+            tile_bytes=int(self.export_tile_mb * 2**20) if self.export_tile_mb else None,
+            on_written=job.file_written if job else None,
+            cancel_event=job.cancel_event if job else None,
+        )
+
+    def _log_export_timings(self, report):
+        self._log(
+            f"导出耗时：渲染{report['render']:.2f}s，裁剪{report['crop']:.2f}s，"
+            f"编码{report['encode']:.2f}s，写盘{report['write']:.2f}s（编码/写盘为各线程累计）；"
+            f"共{report['files']}个文件，总计{report['wall']:.2f}s，压缩级别{report['compress_level']}"
+        )
+
+    def export_single_plot(self, plot_id, cb_custom_ticks=[], draft=False, job=None):
+        """
+        导出单张图到时间戳目录，文件名格式：plot{编号}_{时间戳}.png；draft=True 时低压缩快速导出
+        job: 由 start_export_single 传入的 ExportJob，用于上报进度与响应取消
+        """
         if plot_id not in self.plot_items:
             raise ValueError(f"绘图项{plot_id}不存在！")
         
         export_dir = self._get_export_dir()
         plot_num = plot_id.split('_')[1]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        main_filename = f"plot{plot_num}_{timestamp}.png"
+        main_filename = f"plot{plot_num}_{timestamp}.{self.export_format}"
         main_path = export_dir / main_filename
 
-        # 生成主图并保存
+        # 生成主图并保存（透明背景，按alpha通道紧凑裁剪，留0.1英寸边）
         fig = self.generate_plot_fig(
             plot_id, 
             cb_custom_ticks=cb_custom_ticks,
             is_preview=False, 
+            target_dpi=self.export_dpi,
         )
-        fig.savefig(
-            main_path,
-            dpi=300,
-            bbox_inches='tight',
-            pad_inches=0.1,
-            transparent=True,  # 透明背景核心参数
-            facecolor='none',  # 画布背景设为无
-        )
-        plt.close(fig)
+        with self._open_export_pipeline(draft, job) as pipeline:
+            pipeline.submit(fig, main_path, dpi=self.export_dpi, pad_inches=0.1, transparent=True)
+        self._log_export_timings(pipeline.report())
 
         return main_path
 
-    def export_all_plots(self, export_cb=False, cb_font_size=18, cb_custom_ticks=[]):
-        """批量导出所有图到同一个时间戳目录"""
+    def export_all_plots(self, export_cb=False, cb_font_size=18, cb_custom_ticks=[], draft=False, job=None):
+        """
+        批量导出所有图到同一个时间戳目录：调用线程逐张绘制，编码与写盘在线程池中并行
+        job: 由 start_export_all 传入的 ExportJob，每张图之前检查取消；导出期间被删除的绘图项直接跳过
+        export_sidecar 非 None 时，另把本批全部扇区的几何/数值/颜色写成一个列式数据表 sectors_{时间戳}.{格式}
+        （plot_id 列为图编号，与图片文件名 plot{编号} 对应），取自与绘图相同的快照
+        """
         if not self.plot_items:
             raise ValueError("没有可导出的绘图项！")
+        if self.export_sidecar is not None and self.export_sidecar not in SIDECAR_FORMATS:
+            raise ValueError(f"数据表格式需为{SIDECAR_FORMATS}之一，当前{self.export_sidecar}")
         
         export_dir = self._get_export_dir()
         export_paths = []
-
-        # 导出所有图
-        for plot_id in self.plot_items:
-            plot_num = plot_id.split('_')[1]
+        cb_paths = []
+        sector_tables = []
+
+        with self._open_export_pipeline(draft, job) as pipeline:
+            # 导出所有图
+            for plot_id in self.get_all_plot_ids():
+                pipeline.check_cancelled()
+                plot_num = plot_id.split('_')[1]
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                main_filename = f"plot{plot_num}_{timestamp}.{self.export_format}"
+                main_path = export_dir / main_filename
+
+                try:
+                    spec = self.snapshot_spec(plot_id, cb_custom_ticks=cb_custom_ticks, is_preview=False)
+                except ValueError:
+                    if plot_id in self.plot_items:
+                        raise
+                    continue
+                fig = self._figure_from_spec(plot_id, spec, target_dpi=self.export_dpi)
+                pipeline.submit(fig, main_path, dpi=self.export_dpi, pad_inches=0.1, transparent=True)
+                export_paths.append(main_path)
+                if self.export_sidecar:
+                    table = pizza_sector_table(spec)
+                    sector_tables.append({"plot_id": np.full(table["value"].size, int(plot_num), np.int32),
+                                          **table})
+
+                # 导出对应Colorbar（各图共用同一色标，只绘制编码一次，其余复制文件）
+                if export_cb:
+                    cb_filename = f"colorbar_plot{plot_num}_{timestamp}.{self.export_format}"
+                    cb_path = export_dir / cb_filename
+                    if not cb_paths:
+                        self._submit_colorbar(pipeline, cb_path, cb_font_size, cb_custom_ticks)
+                    cb_paths.append(cb_path)
+                    export_paths.append(cb_path)
+        for cb_path in cb_paths[1:]:
+            pipeline.check_cancelled()
+            pipeline.copy_file(cb_paths[0], cb_path)
+        if sector_tables:
+            pipeline.check_cancelled()
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            main_filename = f"plot{plot_num}_{timestamp}.png"
-            main_path = export_dir / main_filename
+            start = time.perf_counter()
+            sidecar_path = write_sector_sidecar(export_dir / f"sectors_{timestamp}.{self.export_sidecar}",
+                                                sector_tables, self.export_sidecar)
+            pipeline.record_written(sidecar_path, time.perf_counter() - start)
+            export_paths.append(sidecar_path)
+        self._log_export_timings(pipeline.report())
+        return export_paths, export_dir
 
-            fig = self.generate_plot_fig(
-                plot_id,
-                cb_custom_ticks=cb_custom_ticks,
-                is_preview=False,
-            )
-            fig.savefig(
-                main_path,
-                dpi=300,
-                bbox_inches='tight',
-                pad_inches=0.1,
-                transparent=True,  # 透明背景核心参数
-                facecolor='none',  # 画布背景设为无
+    def export_plot_sheets(self, rows=4, cols=5, cb_font_size=18, cb_custom_ticks=[],
+                           cell_size=2.5, dpi=150):
+        """拼版导出：所有绘图项按 rows×cols 排在同一画布（共享色条），超出一页自动分页"""
+        if not self.plot_items:
+            raise ValueError("没有可导出的绘图项！")
+        if rows < 1 or cols < 1:
+            raise ValueError("拼版行数/列数必须≥1！")
+
+        plot_vmin, plot_vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks)
+        specs = {pid: self.snapshot_spec(pid, cb_custom_ticks) for pid in self.get_all_plot_ids()}
+        items = []
+        for plot_id, spec in specs.items():
+            # 超出色标范围的值在颜色映射中取两端颜色，无需钳位拷贝
+            items.append({
+                "label": f"plot{plot_id.split('_')[1]}",
+                "layer_points": spec.layer_points,
+                "data": spec.data,
+                "render_mode": spec.render_mode,
+                "cmap": spec.cmap,  # 单独指定了色图的绘图项按其色图绘制
+            })
+
+        export_dir = self._get_export_dir()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        per_page = rows * cols
+        n_pages = math.ceil(len(items) / per_page)
+        tick_count = next(iter(specs.values())).tick_count
+        export_paths = []
+        for page in range(n_pages):
+            page_items = items[page * per_page:(page + 1) * per_page]
+            # 最后一页不满时按实际数量收缩行数，避免大片空白
+            page_rows = min(rows, math.ceil(len(page_items) / cols))
+            fig = generate_pizza_sheet(
+                page_items, plot_vmin, plot_vmax, page_rows, cols,
+                cell_size=cell_size, dpi=dpi, tick_count=tick_count,
+                cb_font_size=cb_font_size, cb_custom_ticks=cb_custom_ticks,
+                max_chord_error=self.max_chord_error, cmap=self.colormap,
             )
-            plt.close(fig)
-            export_paths.append(main_path)
-
-            # 导出对应Colorbar
-            if export_cb:
-                cb_filename = f"colorbar_plot{plot_num}_{timestamp}.png"
-                cb_path = export_dir / cb_filename
-                self.export_colorbar(
-                    cb_path,
-                    cb_font_size=cb_font_size,
-                    cb_custom_ticks=cb_custom_ticks
-                )
-                export_paths.append(cb_path)
+            sheet_path = export_dir / f"sheet{page + 1}_{timestamp}.png"
+            fig.savefig(sheet_path, dpi=dpi)  # 固定版式，不做tight二次绘制
+            export_paths.append(sheet_path)
         return export_paths, export_dir
 
-    def export_colorbar(self, save_path, cb_font_size=18, cb_custom_ticks=[]):
-        """保存Colorbar到指定路径（由_logic层自动生成路径，不再依赖UI选择）"""
+    def _submit_colorbar(self, pipeline, save_path, cb_font_size, cb_custom_ticks):
+        dpi = self.export_dpi
+        width, height = (int(size * dpi) for size in COLORBAR_FIGSIZE)
+        if not pipeline.tile_bytes or width * height * 4 <= pipeline.tile_bytes:
+            # 整图绘制的色条走缓存：相同设置重复导出只需裁剪编码
+            rgba = self._colorbar_rgba(cb_font_size, cb_custom_ticks, dpi, transparent=False,
+                                       render=pipeline.render)
+            return pipeline.submit_rgba(rgba, save_path, pad_px=int(round(0.1 * dpi)), dpi=dpi)
         cb_vmin, cb_vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks)
         fig, ax = generate_colorbar(
             vmin=cb_vmin,
             vmax=cb_vmax,
             cb_font_size=cb_font_size,
-            cb_custom_ticks=cb_custom_ticks
-        )
-        fig.savefig(
-            save_path,
-            dpi=300,
-            bbox_inches='tight',
-            pad_inches=0.1,
-            facecolor='none',
-            edgecolor='none'
+            cb_custom_ticks=cb_custom_ticks,
+            figsize=COLORBAR_FIGSIZE,
+            cmap=self.colormap,
         )
-        plt.close(fig)
+        # 与原 savefig(facecolor='none') 一致，不去坐标轴底色；分块导出时只按色条求裁剪框（宿主坐标轴已隐藏）
+        return pipeline.submit(fig, save_path, dpi=self.export_dpi, pad_inches=0.1, transparent=False,
+                               crop_artists=[a for a in fig.axes if a is not ax])
+
+    def export_colorbar(self, save_path, cb_font_size=18, cb_custom_ticks=[], draft=False, job=None):
+        """保存Colorbar到指定路径（由_logic层自动生成路径，不再依赖UI选择）"""
+        with self._open_export_pipeline(draft, job) as pipeline:
+            self._submit_colorbar(pipeline, save_path, cb_font_size, cb_custom_ticks)
+        self._log_export_timings(pipeline.report())
         return save_path
-        
\ No newline at end of file
+
+    # ---------- 后台导出 ----------
+    def _start_export_job(self, run, total, callbacks):
+        return ExportJob(run, total, **callbacks).start()
+
+    def start_export_all(self, export_cb=False, cb_font_size=18, cb_custom_ticks=[], draft=False, **callbacks):
+        """
+        后台批量导出，立即返回 ExportJob 句柄（job.result() 与 export_all_plots 返回值相同）
+        callbacks: on_progress / on_file / on_done，见 ExportJob；取消后 job.paths 为已写完的文件
+        """
+        if not self.plot_items:
+            raise ValueError("没有可导出的绘图项！")
+        total = len(self.plot_items) * (2 if export_cb else 1) + (1 if self.export_sidecar else 0)
+        return self._start_export_job(
+            lambda job: self.export_all_plots(export_cb, cb_font_size, cb_custom_ticks, draft, job=job),
+            total, callbacks)
+
+    def start_export_single(self, plot_id, cb_custom_ticks=[], draft=False, **callbacks):
+        """后台导出单张图（高dpi分块导出耗时较长时可取消），返回 ExportJob"""
+        if plot_id not in self.plot_items:
+            raise ValueError(f"绘图项{plot_id}不存在！")
+        return self._start_export_job(
+            lambda job: self.export_single_plot(plot_id, cb_custom_ticks, draft, job=job), 1, callbacks)
+
+    def start_export_colorbar(self, save_path, cb_font_size=18, cb_custom_ticks=[], draft=False, **callbacks):
+        """后台导出Colorbar，返回 ExportJob"""
+        return self._start_export_job(
+            lambda job: self.export_colorbar(save_path, cb_font_size, cb_custom_ticks, draft, job=job),
+            1, callbacks)
+
+    def export_timeseries(self, plot_id, series, fmt='mp4', fps=10, cb_custom_ticks=[], progress=None):
+        """按绘图项配置导出时序动画（series为(T, m, n)数组或.npy路径），返回帧率/吞吐统计"""
+        if plot_id not in self.plot_items:
+            raise ValueError(f"绘图项{plot_id}不存在！")
+        config = self.plot_items[plot_id]["config"]
+        series = load_timeseries(series)
+        if series.shape[1:] != (config["m_layers"], config["n_blocks"]):
+            raise ValueError(f"时序数据每帧需为{config['m_layers']}×{config['n_blocks']}，当前{series.shape[1:]}")
+
+        # 启用自定义刻度时用刻度范围，否则由写出函数扫描整段数据
+        vmin, vmax = self._get_vmin_vmax_from_ticks(cb_custom_ticks) if cb_custom_ticks else (None, None)
+        export_dir = self._get_export_dir()
+        plot_num = plot_id.split('_')[1]
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = "_frames" if fmt == 'png' else f".{fmt}"
+        return write_pizza_timeseries(
+            series, export_dir / f"plot{plot_num}_{timestamp}{suffix}",
+            layer_points=config["layer_points"], fmt=fmt, fps=fps,
+            vmin=vmin, vmax=vmax, tick_count=config["tick_count"],
+            max_chord_error=self.max_chord_error,
+            render_mode=config.get("render_mode", "polygon"), progress=progress,
+            cmap=config.get("cmap") or self.colormap,
+        )
@@ -0,0 +1,194 @@
+"""
+内存诊断：长时间编辑会话中确认内存是否稳定
+    - tracemalloc 快照：记录指定操作（重绘缩略图、重建列表等）前后的净增长及增长最多的代码行
+    - 存活对象计数：matplotlib Figure、FigureCanvasTkAgg（区分Tk控件已销毁但仍被引用的画布）、Tk控件数
+    - 定期报告：与启动诊断时及上一次报告相比的增长，稳态会话应在多次报告后趋于0
+tracemalloc 会让每次内存分配都变慢（绘制这类分配密集的操作实测慢一个数量级），只在诊断时开启
+"""
+import gc
+import os
+import sys
+import time
+import pathlib
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+TRACE_FRAMES = 1  # 每次分配记录的调用栈深度；按代码行统计增长只需1层，层数越多开销越大
+TOP_LINES = 8  # 报告中列出的增长最多的代码行数
+
+
+def _current_rss():
+    """当前进程常驻内存（字节）；非Linux平台返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def count_live_figures():
+    """
+    存活的 matplotlib 对象：{"figures": Figure数, "tk_canvases": FigureCanvasTkAgg数,
+    "dead_tk_canvases": Tk控件已销毁但画布对象仍被引用的数量}；未导入matplotlib时均为0
+    """
+    counts = {"figures": 0, "tk_canvases": 0, "dead_tk_canvases": 0}
+    if "matplotlib.figure" not in sys.modules:
+        return counts
+    from matplotlib.figure import Figure
+    tkagg = sys.modules.get("matplotlib.backends.backend_tkagg")
+    canvas_cls = tkagg.FigureCanvasTkAgg if tkagg else None
+    for obj in gc.get_objects():
+        if isinstance(obj, Figure):
+            counts["figures"] += 1
+        elif canvas_cls is not None and isinstance(obj, canvas_cls):
+            counts["tk_canvases"] += 1
+            try:
+                alive = obj.get_tk_widget().winfo_exists()
+            except Exception:  # Tcl解释器已销毁等
+                alive = False
+            counts["dead_tk_canvases"] += not alive
+    return counts
+
+
+def count_tk_widgets(root):
+    """root 下（含所有 Toplevel）的Tk控件总数"""
+    count, stack = 0, [root]
+    while stack:
+        widget = stack.pop()
+        count += 1
+        stack.extend(widget.winfo_children())
+    return count
+
+
+class MemoryMonitor:
+    """
+    会话级内存诊断；track(名称) 包住要观察的操作，report() 生成报告
+    report_path 非 None 时每次报告另以文本追加写入该文件
+    """
+
+    def __init__(self, report_path=None, frames=TRACE_FRAMES, top_lines=TOP_LINES):
+        self.report_path = pathlib.Path(report_path) if report_path else None
+        self.frames = frames
+        self.top_lines = top_lines
+        self.sections = {}  # 名称 → {"calls", "net", "last", "seconds"}
+        self._baseline = None
+        self._start_traced = 0
+        self._last_traced = 0
+        self._last_counts = None
+        self._started_tracing = False
+        self._reports = 0
+
+    @property
+    def active(self):
+        return self._baseline is not None
+
+    def start(self):
+        if self.active:
+            return self
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        gc.collect()
+        self._baseline = tracemalloc.take_snapshot()
+        self._start_traced = self._last_traced = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._baseline = None
+
+    @contextlib.contextmanager
+    def track(self, name):
+        """记录一次操作的净分配（操作结束后仍被持有的内存）；诊断未开启时直接执行"""
+        if not self.active:
+            yield
+            return
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            net = tracemalloc.get_traced_memory()[0] - before
+            section = self.sections.setdefault(name, {"calls": 0, "net": 0, "last": 0, "seconds": 0.0})
+            section["calls"] += 1
+            section["net"] += net
+            section["last"] = net
+            section["seconds"] += time.perf_counter() - start
+
+    def report(self, tk_root=None, extra=None):
+        """
+        生成一次报告（dict）：tracemalloc 当前/峰值、常驻内存、存活Figure/画布/Tk控件数、
+        各 track 段的累计净增长，及相对启动时增长最多的代码行；extra 为调用方补充的计数
+        """
+        if not self.active:
+            raise ValueError("内存诊断未开启")
+        gc.collect()
+        traced, peak = tracemalloc.get_traced_memory()
+        counts = count_live_figures()
+        if tk_root is not None:
+            counts["tk_widgets"] = count_tk_widgets(tk_root)
+        counts.update(extra or {})
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        growth = [stat for stat in snapshot.compare_to(self._baseline, "lineno") if stat.size_diff > 0]
+        report = {
+            "time": datetime.now(),
+            "index": self._reports,
+            "traced": traced,
+            "peak": peak,
+            "since_start": traced - self._start_traced,
+            "since_last": traced - self._last_traced,
+            "rss": _current_rss(),
+            "counts": counts,
+            "counts_change": {k: v - self._last_counts.get(k, 0) for k, v in counts.items()}
+            if self._last_counts else {},
+            "sections": {name: dict(s) for name, s in self.sections.items()},
+            "top_growth": [(str(stat.traceback[0]), stat.size_diff, stat.count_diff)
+                           for stat in growth[:self.top_lines]],
+        }
+        self._last_traced = traced
+        self._last_counts = counts
+        self._reports += 1
+        if self.report_path:
+            with self.report_path.open("a", encoding="utf-8") as f:
+                f.write(format_memory_report(report) + "\n\n")
+        return report
+
+
+def _mb(nbytes):
+    return f"{nbytes / 2**20:+.2f}MB" if nbytes is not None else "-"
+
+
+def format_memory_summary(report):
+    """一行摘要（日志面板用）"""
+    counts = report["counts"]
+    parts = [f"内存诊断#{report['index']}：跟踪{report['traced'] / 2**20:.1f}MB",
+             f"较上次{_mb(report['since_last'])}", f"较开始{_mb(report['since_start'])}",
+             f"Figure {counts['figures']}"]
+    if counts["dead_tk_canvases"]:
+        parts.append(f"已销毁仍被引用的画布 {counts['dead_tk_canvases']}")
+    if "tk_widgets" in counts:
+        parts.append(f"Tk控件 {counts['tk_widgets']}")
+    return "，".join(parts)
+
+
+def format_memory_report(report):
+    """完整报告文本（写入文件用）"""
+    lines = [f"[{report['time']:%Y-%m-%d %H:%M:%S}] {format_memory_summary(report)}",
+             f"  tracemalloc 当前 {report['traced'] / 2**20:.2f}MB，峰值 {report['peak'] / 2**20:.2f}MB"
+             + (f"；常驻内存 {report['rss'] / 2**20:.1f}MB" if report["rss"] else "")]
+    change = report["counts_change"]
+    lines.append("  存活对象：" + "，".join(
+        f"{k} {v}" + (f"({change[k]:+d})" if change.get(k) else "") for k, v in report["counts"].items()))
+    for name, s in report["sections"].items():
+        lines.append(f"  {name}：{s['calls']}次，累计净增长{_mb(s['net'])}，最近一次{_mb(s['last'])}，"
+                     f"共{s['seconds']:.2f}s")
+    if report["top_growth"]:
+        lines.append("  相对开始增长最多的代码行：")
+        lines.extend(f"    {where}  {_mb(size)}（{count:+d}个对象）" for where, size, count in report["top_growth"])
+    return "\n".join(lines)
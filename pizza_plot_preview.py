@@ -0,0 +1,197 @@
+import numpy as np
+from pizza_plot_geometry import build_sector_verts
+from pizza_plot_core import (
+    pizza_cell_edges, pizza_cells_at,
+    create_pizza_axes, apply_pizza_limits, _make_pizza_artist, _recolor_pizza_artist
+)
+
+
+class PizzaPreview:
+    """
+    可交互的放大预览（与后端无关，Tk窗口只负责把 fig 放进 FigureCanvasTkAgg）
+    悬停读数、滚轮缩放、左键拖动平移、色标范围实时调整均用blit完成：
+        背景（坐标轴底色）→ 数据图元 → 边框/刻度 → 悬停高亮，只重画发生变化的一层
+    on_hover: 可选回调 on_hover(info)，info 为 {"layer", "block", "value"}（从0计）或 None
+    """
+
+    ZOOM_STEP = 1.25
+
+    def __init__(self, spec, max_chord_error=0.25, on_hover=None):
+        from matplotlib.patches import Polygon
+        self.spec = spec
+        self.max_chord_error = max_chord_error
+        self.on_hover = on_hover
+        self.vmin, self.vmax = spec.vmin, spec.vmax
+        self.data = spec.data
+        self.fig, self.ax = create_pizza_axes(spec.figsize, spec.dpi)
+        apply_pizza_limits(self.ax, 1.0, spec.tick_count)
+
+        # 命中测试用的径向/角向分界（按配置缓存）
+        self._r_edges, self._theta_edges = pizza_cell_edges(tuple(spec.layer_points), spec.n_blocks)
+
+        self._buffers = {}
+        self._radius_px = None
+        self._artist = None
+        self._build_artist()
+
+        self._highlight = Polygon(np.zeros((1, 2)), closed=True, fill=False, edgecolor='white',
+                                  linewidth=1.5, visible=False, animated=True)
+        self.ax.add_patch(self._highlight)
+        self._hover_cell = None
+        self._overlay = sorted([*self.ax.spines.values(), self.ax.xaxis, self.ax.yaxis],
+                               key=lambda a: a.get_zorder())
+        for artist in self._overlay:
+            artist.set_animated(True)
+
+        self._bg_static = None
+        self._bg_data = None
+        self._pan_start = None
+        canvas_events = {
+            'draw_event': self._on_draw,
+            'resize_event': self._on_resize,
+            'motion_notify_event': self._on_motion,
+            'scroll_event': self._on_scroll,
+            'button_press_event': self._on_press,
+            'button_release_event': self._on_release,
+            'figure_leave_event': self._on_leave,
+        }
+        self._cids = [self.fig.canvas.mpl_connect(name, func) for name, func in canvas_events.items()]
+
+    # ---------- 图元 ----------
+    def _current_radius_px(self):
+        bbox = self.ax.get_window_extent()
+        x_span = np.diff(self.ax.get_xlim())[0]
+        return 0.5 * min(bbox.width, bbox.height) * 2 / x_span
+
+    def _build_artist(self):
+        """按当前显示半径（像素）生成数据图元；仅在半径明显变大时重建，保证圆弧采样足够"""
+        radius_px = max(self._current_radius_px(), 1.0)
+        if self._artist is not None and radius_px <= self._radius_px * 1.5:
+            return
+        if self._artist is not None:
+            self._artist.remove()
+        self._radius_px = radius_px
+        self._artist = _make_pizza_artist(
+            self.spec.layer_points, self.data, self.vmin, self.vmax, radius_px,
+            self.max_chord_error, self.spec.render_mode, cmap=self.spec.cmap,
+        )
+        self._artist.set_animated(True)
+        self.ax.add_collection(self._artist, autolim=False)
+
+    # ---------- blit ----------
+    def _on_draw(self, event):
+        """整图重绘（缩放/平移/窗口尺寸变化）后重新缓存背景并叠加动画图元"""
+        self._bg_static = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_data()
+
+    def _draw_data(self):
+        canvas = self.fig.canvas
+        canvas.restore_region(self._bg_static)
+        self.ax.draw_artist(self._artist)
+        for artist in self._overlay:
+            self.ax.draw_artist(artist)
+        self._bg_data = canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_highlight()
+
+    def _draw_highlight(self):
+        canvas = self.fig.canvas
+        canvas.restore_region(self._bg_data)
+        if self._highlight.get_visible():
+            self.ax.draw_artist(self._highlight)
+        canvas.blit(self.fig.bbox)
+
+    # ---------- 命中测试 ----------
+    def cell_at(self, x, y):
+        """数据坐标 → (层, 块)，落在披萨外时返回 None"""
+        layer, block = pizza_cells_at(x, y, self.spec.layer_points, self.spec.n_blocks)
+        if layer < 0:
+            return None
+        return int(layer), int(block)
+
+    def _cell_outline(self, layer, block):
+        theta = 2 * np.pi - self._theta_edges[block:block + 2]
+        verts = build_sector_verts(self._r_edges[layer:layer + 1], self._r_edges[layer + 1:layer + 2],
+                                   theta, self._radius_px, self.max_chord_error)
+        return verts[0][0]
+
+    # ---------- 事件 ----------
+    def _on_resize(self, event):
+        self._build_artist()
+
+    def _on_motion(self, event):
+        if self._pan_start is not None:
+            self._pan(event)
+            return
+        cell = self.cell_at(event.xdata, event.ydata) if event.inaxes is self.ax else None
+        if cell == self._hover_cell:
+            return
+        self._hover_cell = cell
+        if cell is None:
+            self._highlight.set_visible(False)
+        else:
+            self._highlight.set_xy(self._cell_outline(*cell))
+            self._highlight.set_visible(True)
+        if self._bg_data is not None:
+            self._draw_highlight()
+        if self.on_hover:
+            self.on_hover(None if cell is None else
+                          {"layer": cell[0], "block": cell[1], "value": float(self.data[cell])})
+
+    def _on_leave(self, event):
+        if self._hover_cell is not None:
+            self._hover_cell = None
+            self._highlight.set_visible(False)
+            if self._bg_data is not None:
+                self._draw_highlight()
+            if self.on_hover:
+                self.on_hover(None)
+
+    def _on_scroll(self, event):
+        if event.inaxes is not self.ax:
+            return
+        scale = 1 / self.ZOOM_STEP if event.button == 'up' else self.ZOOM_STEP
+        self.zoom(scale, event.xdata, event.ydata)
+
+    def _on_press(self, event):
+        if event.inaxes is self.ax and event.button == 1:
+            self._pan_start = (event.x, event.y, self.ax.get_xlim(), self.ax.get_ylim())
+
+    def _on_release(self, event):
+        self._pan_start = None
+
+    def _pan(self, event):
+        x0, y0, xlim, ylim = self._pan_start
+        bbox = self.ax.get_window_extent()
+        dx = (event.x - x0) * (xlim[1] - xlim[0]) / bbox.width
+        dy = (event.y - y0) * (ylim[1] - ylim[0]) / bbox.height
+        self.ax.set_xlim(xlim[0] - dx, xlim[1] - dx)
+        self.ax.set_ylim(ylim[0] - dy, ylim[1] - dy)
+        self.fig.canvas.draw_idle()
+
+    # ---------- 外部操作 ----------
+    def zoom(self, scale, cx=0.0, cy=0.0):
+        """以 (cx, cy) 为中心缩放视野，scale<1 为放大"""
+        xlim, ylim = self.ax.get_xlim(), self.ax.get_ylim()
+        self.ax.set_xlim(cx + (xlim[0] - cx) * scale, cx + (xlim[1] - cx) * scale)
+        self.ax.set_ylim(cy + (ylim[0] - cy) * scale, cy + (ylim[1] - cy) * scale)
+        self._build_artist()
+        self.fig.canvas.draw_idle()
+
+    def reset_view(self):
+        self.ax.set_xlim(-1, 1)
+        self.ax.set_ylim(-1, 1)
+        self.fig.canvas.draw_idle()
+
+    def set_range(self, vmin, vmax):
+        """实时调整色标范围：只重设数据图元颜色并blit，不重绘坐标轴"""
+        if vmin >= vmax:
+            raise ValueError("最小值必须小于最大值！")
+        self.vmin, self.vmax = vmin, vmax
+        _recolor_pizza_artist(self._artist, self.data, vmin, vmax, self._buffers, self.spec.cmap)
+        if self._bg_static is not None:
+            self._draw_data()
+
+    def close(self):
+        for cid in self._cids:
+            self.fig.canvas.mpl_disconnect(cid)
+        self._cids = []
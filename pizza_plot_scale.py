@@ -0,0 +1,267 @@
+"""
+可合并的色标范围归约：
+    QuantileSketch  对数分桶的分位数草图（思路同 DDSketch），只存各桶计数，合并即计数相加
+    RangeSummary    有限值个数 + 精确最小/最大值 + 可选分位数草图
+各分片独立归约后按任意顺序合并，结果逐位一致，可跨进程/机器共享同一色标
+"""
+import json
+import pathlib
+import functools
+import dataclasses
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 1e-3
+ZERO_THRESHOLD = 1e-12  # |x| 小于该值计入零桶
+SCALE_MODES = ('minmax', 'percentile', 'symmetric')
+DEFAULT_PERCENTILES = (1, 99)
+
+
+def _merge_store(keys, counts, new_keys, new_counts):
+    """合并两组 (桶序号, 计数)，结果按桶序号升序，计数为0的桶去掉"""
+    if keys.size == 0:
+        return new_keys, new_counts
+    all_keys = np.concatenate([keys, new_keys])
+    all_counts = np.concatenate([counts, new_counts])
+    merged_keys, inverse = np.unique(all_keys, return_inverse=True)
+    merged_counts = np.zeros(merged_keys.size, dtype=np.int64)
+    np.add.at(merged_counts, inverse, all_counts)
+    keep = merged_counts != 0
+    return merged_keys[keep], merged_counts[keep]
+
+
+def _count_keys(keys):
+    """统计一批桶序号的出现次数；序号跨度不大时用 bincount，否则退回排序计数"""
+    lo, hi = int(keys.min()), int(keys.max())
+    if hi - lo < 1 << 20:
+        counts = np.bincount(keys - lo)
+        nonzero = np.flatnonzero(counts)
+        return nonzero.astype(np.int64) + lo, counts[nonzero].astype(np.int64)
+    unique, counts = np.unique(keys, return_counts=True)
+    return unique, counts.astype(np.int64)
+
+
+class QuantileSketch:
+    """
+    分位数草图：|x| 落在 (γ^(k-1), γ^k] 的值计入第 k 桶（正负值分开，γ=(1+α)/(1-α)），
+    分位数的相对误差不超过 α；桶序号只取决于数值本身，因此任意分片、任意合并顺序得到同一草图
+    内存与数据量无关，只与数据跨越的数量级有关（α=1e-3 时每个数量级约1150个桶）
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, min_value=ZERO_THRESHOLD):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("相对精度需在(0, 1)之间")
+        self.relative_accuracy = float(relative_accuracy)
+        self.min_value = float(min_value)
+        self.gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.zero_count = 0
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        self._stores = {1: empty, -1: empty}
+
+    @property
+    def count(self):
+        return self.zero_count + sum(int(c.sum()) for _, c in self._stores.values())
+
+    def _keys(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _update(self, values, weight):
+        # 统一按 float64 分桶，float32 与 float64 数据落入同一桶，加入与移除严格对应
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        magnitudes = np.abs(values)
+        nonzero = magnitudes >= self.min_value
+        zero_count = self.zero_count + weight * int(values.size - np.count_nonzero(nonzero))
+        stores = dict(self._stores)
+        for sign, mask in ((1, nonzero & (values > 0)), (-1, nonzero & (values < 0))):
+            if mask.any():
+                keys, counts = _count_keys(self._keys(magnitudes[mask]))
+                stores[sign] = _merge_store(*stores[sign], keys, weight * counts)
+        # 移除未加入过的数值会使计数为负，此时整批拒绝，草图保持不变
+        if zero_count < 0 or any((counts < 0).any() for _, counts in stores.values()):
+            raise ValueError("移除的数值未加入过分位数草图！")
+        self.zero_count = zero_count
+        self._stores = stores
+        return self
+
+    def add(self, values):
+        """加入一批数值（忽略 NaN/inf）"""
+        return self._update(values, 1)
+
+    def remove(self, values):
+        """移除之前加入过的一批数值（计数相减），用于替换/删除数据时增量更新，无需重建草图；含未加入过的数值时报错"""
+        return self._update(values, -1)
+
+    def _check_compatible(self, other):
+        if (self.relative_accuracy, self.min_value) != (other.relative_accuracy, other.min_value):
+            raise ValueError("分位数草图参数不一致，无法合并")
+
+    def merge(self, other):
+        """原地并入另一草图（计数相加，满足交换律与结合律）"""
+        self._check_compatible(other)
+        self.zero_count += other.zero_count
+        for sign in (1, -1):
+            self._stores[sign] = _merge_store(*self._stores[sign], *other._stores[sign])
+        return self
+
+    def quantile(self, q):
+        """q 为 [0, 1] 内的标量或数组；秩按 q×(n-1) 取（同 numpy 默认），返回对应桶的代表值"""
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("分位数需在0~1之间")
+        if self.count == 0:
+            raise ValueError("分位数草图为空")
+        neg_keys, neg_counts = self._stores[-1]
+        pos_keys, pos_counts = self._stores[1]
+        # 从小到大：负值（|x|由大到小）→ 零桶 → 正值
+        keys = np.concatenate([neg_keys[::-1], [0], pos_keys])
+        counts = np.concatenate([neg_counts[::-1], [self.zero_count], pos_counts])
+        signs = np.concatenate([-np.ones(neg_keys.size), [0.0], np.ones(pos_keys.size)])
+        cumulative = np.cumsum(counts)
+        idx = np.searchsorted(cumulative, q * (cumulative[-1] - 1), side='right')
+        # 桶 (γ^(k-1), γ^k] 的代表值 2γ^k/(γ+1)，与桶内任意值的相对误差不超过 α
+        values = signs[idx] * 2 * self.gamma ** keys[idx].astype(float) / (self.gamma + 1)
+        return float(values) if values.ndim == 0 else values
+
+    def to_dict(self):
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "zero_count": self.zero_count,
+            **{name: {"keys": self._stores[sign][0].tolist(), "counts": self._stores[sign][1].tolist()}
+               for name, sign in (("positive", 1), ("negative", -1))},
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d["relative_accuracy"], d["min_value"])
+        sketch.zero_count = int(d["zero_count"])
+        for name, sign in (("positive", 1), ("negative", -1)):
+            sketch._stores[sign] = (np.array(d[name]["keys"], dtype=np.int64),
+                                    np.array(d[name]["counts"], dtype=np.int64))
+        return sketch
+
+
+@dataclasses.dataclass
+class RangeSummary:
+    """
+    数据范围摘要：有限值个数、非有限值（NaN/inf）个数、精确最小/最大值，sketch 为 None 时不统计分位数
+    update 分块累加，merge 合并其他分片的摘要
+    """
+    count: int = 0
+    nonfinite: int = 0
+    vmin: float = np.inf
+    vmax: float = -np.inf
+    sketch: QuantileSketch = None
+
+    @classmethod
+    def empty(cls, percentiles=False, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        return cls(sketch=QuantileSketch(relative_accuracy) if percentiles else None)
+
+    def update(self, values):
+        values = np.asarray(values)
+        finite = np.isfinite(values)
+        if not finite.all():
+            self.nonfinite += int(finite.size - np.count_nonzero(finite))
+            values = values[finite]
+        if values.size == 0:
+            return self
+        self.count += int(values.size)
+        self.vmin = min(self.vmin, float(values.min()))
+        self.vmax = max(self.vmax, float(values.max()))
+        if self.sketch is not None:
+            self.sketch.add(values)
+        return self
+
+    def merge(self, other):
+        if (self.sketch is None) != (other.sketch is None):
+            raise ValueError("部分摘要未统计分位数，无法合并")
+        self.count += other.count
+        self.nonfinite += other.nonfinite
+        self.vmin = min(self.vmin, other.vmin)
+        self.vmax = max(self.vmax, other.vmax)
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+        return self
+
+    def quantile(self, q):
+        """草图估计的分位数，限制在精确的 [vmin, vmax] 内"""
+        if self.sketch is None:
+            raise ValueError("该摘要未统计分位数，扫描时需启用分位数")
+        q = np.asarray(q, dtype=float)
+        estimate = np.clip(self.sketch.quantile(q), self.vmin, self.vmax)
+        # 两端直接取精确极值
+        estimate = np.where(q == 0, self.vmin, np.where(q == 1, self.vmax, estimate))
+        return float(estimate) if estimate.ndim == 0 else estimate
+
+    def color_range(self, percentiles=None, symmetric=False):
+        """
+        共享色标范围：percentiles=(低, 高)（百分数，如(1, 99)）时取稳健分位数，symmetric 时取 ±max|x|，
+        否则取精确最小/最大值；无数据或范围退化时回落 (0, 1)，与 update_global_min_max 一致
+        """
+        if self.count == 0:
+            return 0, 1
+        if percentiles and self.sketch is None:
+            raise ValueError("该摘要未统计分位数，扫描时需启用分位数")
+        mode = 'percentile' if percentiles else 'symmetric' if symmetric else 'minmax'
+        return resolve_color_range(self.vmin, self.vmax, mode, self.sketch, percentiles)
+
+    def to_dict(self):
+        return {
+            "count": self.count, "nonfinite": self.nonfinite,
+            "vmin": self.vmin if self.count else None, "vmax": self.vmax if self.count else None,
+            "sketch": self.sketch.to_dict() if self.sketch is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(
+            count=int(d["count"]), nonfinite=int(d["nonfinite"]),
+            vmin=np.inf if d["vmin"] is None else float(d["vmin"]),
+            vmax=-np.inf if d["vmax"] is None else float(d["vmax"]),
+            sketch=QuantileSketch.from_dict(d["sketch"]) if d.get("sketch") else None,
+        )
+
+
+def resolve_color_range(vmin, vmax, mode='minmax', sketch=None, percentiles=DEFAULT_PERCENTILES):
+    """
+    按色标模式（SCALE_MODES之一）由精确极值给出色标范围：
+        minmax      [vmin, vmax]
+        percentile  草图估计的 percentiles（百分数）分位数，限制在 [vmin, vmax] 内，单个离群值不再压缩整个色标
+        symmetric   ±max(|vmin|, |vmax|)，0 居中，适合发散型数据
+    范围退化时回落 (0, 1)
+    """
+    if mode not in SCALE_MODES:
+        raise ValueError(f"色标模式需为{SCALE_MODES}之一，当前{mode}")
+    if mode == 'percentile':
+        if sketch is None:
+            raise ValueError("百分位色标需要分位数草图")
+        lo, hi = percentiles
+        if not 0 <= lo < hi <= 100:
+            raise ValueError("百分位数需满足0≤低<高≤100！")
+        qs = np.clip(sketch.quantile([lo / 100, hi / 100]), vmin, vmax)
+        # 两端直接取精确极值
+        vmin, vmax = (vmin if lo == 0 else float(qs[0])), (vmax if hi == 100 else float(qs[1]))
+    elif mode == 'symmetric':
+        bound = max(abs(vmin), abs(vmax))
+        vmin, vmax = -bound, bound
+    if vmin == vmax:
+        return 0, 1
+    return vmin, vmax
+
+
+def merge_summaries(summaries):
+    """合并多个分片摘要（不修改传入的摘要）"""
+    summaries = list(summaries)
+    if not summaries:
+        raise ValueError("没有可合并的摘要！")
+    merged = RangeSummary.from_dict(summaries[0].to_dict())
+    return functools.reduce(RangeSummary.merge, summaries[1:], merged)
+
+
+def save_summary(summary, path):
+    pathlib.Path(path).write_text(json.dumps(summary.to_dict()), encoding='utf-8')
+
+
+def load_summary(path):
+    return RangeSummary.from_dict(json.loads(pathlib.Path(path).read_text(encoding='utf-8')))
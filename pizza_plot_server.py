@@ -0,0 +1,298 @@
+"""
+本地HTTP渲染服务（仅依赖标准库）：
+    POST /render/plot      JSON 或 .npy 请求体 → PNG/SVG 披萨图
+    POST /render/colorbar  JSON 请求体 → PNG/SVG 色条
+    GET  /health           队列与缓存状态
+启动：python pizza_plot_server.py serve --port 8765
+压测：python pizza_plot_server.py bench --url http://127.0.0.1:8765 -n 200 -c 8
+"""
+import io
+import json
+import time
+import hashlib
+import argparse
+import functools
+import threading
+import collections
+import urllib.parse
+import urllib.error
+import urllib.request
+import concurrent.futures
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+from pizza_plot_core import render_plot_spec, generate_colorbar
+from pizza_plot_colormap import DEFAULT_COLORMAP, get_colormap
+from pizza_plot_spec import build_plot_spec, parse_float, parse_floats
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+MAX_DPI = 600  # 单次渲染允许的最大DPI，避免超大画布占满内存
+
+
+class _LRUCache:
+    """按请求哈希缓存响应字节，超出容量时淘汰最久未用的条目"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+def parse_dpi(params):
+    dpi = int(params.get("dpi", 100))
+    if not 1 <= dpi <= MAX_DPI:
+        raise ValueError(f"dpi需在1~{MAX_DPI}之间")
+    return dpi
+
+
+def build_colorbar_args(params):
+    """把请求参数转换为 generate_colorbar 的参数（在请求阶段校验，非法参数返回400）"""
+    cb_ticks = parse_floats(params.get("cb_custom_ticks"))
+    if not all(np.isfinite(cb_ticks)):
+        raise ValueError("自定义刻度需为有限数值")
+    vmin = parse_float(params, "vmin", 0)
+    vmax = parse_float(params, "vmax", 1)
+    if cb_ticks:
+        vmin, vmax = min(cb_ticks), max(cb_ticks)
+    if vmin == vmax:
+        vmin, vmax = 0, 1
+    cb_font_size = int(params.get("cb_font_size", 10))
+    if not 1 <= cb_font_size <= 200:
+        raise ValueError("色条字号需在1~200之间")
+    cmap = params.get("cmap") or DEFAULT_COLORMAP
+    get_colormap(cmap)
+    return {"vmin": vmin, "vmax": vmax, "cb_font_size": cb_font_size,
+            "cb_custom_ticks": cb_ticks, "cmap": cmap}
+
+
+def render_colorbar_bytes(args, fmt='png', dpi=100):
+    """args 为 build_colorbar_args 的返回值"""
+    fig, ax = generate_colorbar(**args)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight', pad_inches=0.1,
+                facecolor='none', edgecolor='none')
+    return buf.getvalue()
+
+
+class RenderService:
+    """
+    渲染调度：固定大小线程池 + 有界等待队列（满则拒绝，返回503）+ 单请求超时 + LRU响应缓存；
+    相同请求正在渲染时直接等待同一结果，不重复占用队列
+    注意：超时只会让请求先返回504，已开始的渲染无法中断，会在后台跑完并占用工作线程
+    """
+
+    def __init__(self, workers=4, max_pending=16, timeout=30.0, cache_entries=128):
+        self.timeout = timeout
+        self.cache = _LRUCache(cache_entries)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._inflight = {}
+        # 任务在 add_done_callback 之前已完成时回调会在 submit 持锁期间同步执行，需可重入
+        self._inflight_lock = threading.RLock()
+
+    def submit(self, key, func):
+        """返回 (HTTP状态码, 响应字节)；命中缓存时不占用工作线程"""
+        cached = self.cache.get(key)
+        if cached is not None:
+            return 200, cached
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is None:
+                if not self._slots.acquire(blocking=False):
+                    self.rejected += 1
+                    return 503, "渲染队列已满，请稍后重试".encode('utf-8')
+                future = self._executor.submit(func)
+                self._inflight[key] = future
+                future.add_done_callback(lambda f: self._on_done(key, f))
+        try:
+            body = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            self.timed_out += 1
+            return 504, "渲染超时".encode('utf-8')
+        except ValueError as e:
+            return 400, str(e).encode('utf-8')
+        except Exception as e:  # 渲染内部错误不应让处理线程带着异常退出而不回复
+            return 500, f"渲染失败：{type(e).__name__}: {e}".encode('utf-8')
+        return 200, body
+
+    def _on_done(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+            self.completed += 1
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "completed": self.completed, "rejected": self.rejected, "timed_out": self.timed_out,
+            "cache_entries": len(self.cache), "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _RenderHandler(BaseHTTPRequestHandler):
+    service = None  # 由 make_server 绑定
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, content_type='text/plain; charset=utf-8'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path == '/health':
+            self._reply(200, json.dumps(self.service.stats()).encode('utf-8'), 'application/json')
+        else:
+            self._reply(404, b"not found")
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {k: v[-1] for k, v in urllib.parse.parse_qs(url.query).items()}
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError("Content-Length 不能为负")
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params.update(json.loads(body or b'{}'))
+                data = params.get("data")
+            else:
+                # 其余请求体按 .npy 解析，参数取自查询串
+                data = np.load(io.BytesIO(body), allow_pickle=False) if body else None
+            fmt = params.get("format", "png")
+            if fmt not in CONTENT_TYPES:
+                raise ValueError(f"输出格式需为{tuple(CONTENT_TYPES)}之一")
+            dpi = parse_dpi(params)
+            if url.path == '/render/plot':
+                if data is None:
+                    raise ValueError("缺少数据矩阵")
+                spec = build_plot_spec(params, data)
+                job = functools.partial(render_plot_spec, spec, fmt=fmt, dpi=dpi)
+            elif url.path == '/render/colorbar':
+                cb_args = build_colorbar_args(params)
+                job = functools.partial(render_colorbar_bytes, cb_args, fmt=fmt, dpi=dpi)
+            else:
+                self._reply(404, b"not found")
+                return
+        except (ValueError, TypeError, json.JSONDecodeError) as e:
+            self._reply(400, str(e).encode('utf-8'))
+            return
+
+        key = hashlib.sha256(self.path.encode('utf-8') + b'\0' + body).hexdigest()
+        status, payload = self.service.submit(key, job)
+        if status == 200:
+            self._reply(200, payload, CONTENT_TYPES[fmt])
+        else:
+            self._reply(status, payload)
+
+
+def make_server(host='127.0.0.1', port=8765, **service_kwargs):
+    service = RenderService(**service_kwargs)
+    handler = type('RenderHandler', (_RenderHandler,), {'service': service})
+    server_cls = type('RenderHTTPServer', (ThreadingHTTPServer,),
+                      {'request_queue_size': 128, 'daemon_threads': True})
+    server = server_cls((host, port), handler)
+    return server, service
+
+
+def run_load_test(url, n_requests=200, concurrency=8, m=10, n=72, distinct=20):
+    """本地压测：并发发送 n_requests 个渲染请求（distinct 种不同数据，其余命中缓存），统计吞吐与延迟"""
+    rng = np.random.default_rng(0)
+    payloads = [json.dumps({"data": rng.random((m, n)).tolist()}).encode('utf-8')
+                for _ in range(distinct)]
+
+    def one(i):
+        req = urllib.request.Request(f"{url}/render/plot", data=payloads[i % distinct],
+                                     headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        return status, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as ex:
+        results = list(ex.map(one, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([lat for status, lat in results if status == 200])
+    statuses = collections.Counter(status for status, _ in results)
+    report = {"requests": n_requests, "seconds": round(elapsed, 3),
+              "throughput_rps": round(n_requests / elapsed, 2), "status": dict(statuses)}
+    if latencies.size:
+        report.update({f"p{q}_ms": round(float(np.percentile(latencies, q)) * 1000, 1)
+                       for q in (50, 90, 99)})
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="披萨图本地HTTP渲染服务")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=4)
+    serve.add_argument("--queue", type=int, default=16, help="等待队列上限（不含执行中的请求）")
+    serve.add_argument("--timeout", type=float, default=30.0, help="单请求超时（秒）")
+    serve.add_argument("--cache", type=int, default=128, help="LRU缓存条目数")
+    bench = sub.add_parser("bench")
+    bench.add_argument("--url", default="http://127.0.0.1:8765")
+    bench.add_argument("-n", type=int, default=200)
+    bench.add_argument("-c", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        print(json.dumps(run_load_test(args.url, args.n, args.c), ensure_ascii=False, indent=2))
+        return
+    server, service = make_server(args.host, args.port, workers=args.workers,
+                                  max_pending=args.queue, timeout=args.timeout,
+                                  cache_entries=args.cache)
+    print(f"披萨图渲染服务已启动：http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
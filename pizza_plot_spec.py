@@ -0,0 +1,73 @@
+"""
+请求参数 → PlotSpec：HTTP服务、批处理与golden检查共用的参数解析与校验
+params 为字典（JSON请求体或查询串），与服务端 /render/plot 的参数一致
+"""
+import numpy as np
+from pizza_plot_core import PlotSpec, finite_data_range, RENDER_MODES
+from pizza_plot_colormap import DEFAULT_COLORMAP, get_colormap
+
+
+def parse_floats(value):
+    """逗号分隔的字符串或数值列表 → float列表；None/空串为空列表"""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [float(x) for x in value.split(',')]
+    return [float(x) for x in value]
+
+
+def parse_float(params, key, default):
+    """取 params[key] 为有限浮点数（缺省取 default），非数值或非有限值抛出 ValueError"""
+    value = params.get(key, default)
+    if isinstance(value, (list, dict, bool)):
+        raise ValueError(f"参数{key}需为数值")
+    value = float(value)
+    if not np.isfinite(value):
+        raise ValueError(f"参数{key}需为有限数值")
+    return value
+
+
+def build_plot_spec(params, data):
+    """把请求参数 + 数据矩阵转换为 PlotSpec（规则与 PizzaPlotLogic 一致），非法参数抛出 ValueError"""
+    data = np.array(data, dtype=float)
+    if data.ndim != 2:
+        raise ValueError(f"数据需为二维矩阵，当前维度{data.shape}")
+    m, n = data.shape
+    if m < 2 or n < 2:
+        raise ValueError("层数和块数必须≥2")
+
+    layer_points = parse_floats(params.get("layer_points"))
+    if not all(np.isfinite(layer_points)):
+        raise ValueError("层区域值需为有限数值")
+    if not layer_points:
+        layer_points = [i / m for i in range(1, m)]
+    if len(layer_points) != m - 1:
+        raise ValueError(f"需{m - 1}个层区域值！")
+
+    custom_ticks = parse_floats(params.get("custom_ticks"))
+    if not all(np.isfinite(custom_ticks)):
+        raise ValueError("自定义刻度需为有限数值")
+    if custom_ticks:
+        vmin, vmax = min(custom_ticks), max(custom_ticks)
+    elif params.get("vmin") is not None and params.get("vmax") is not None:
+        vmin, vmax = parse_float(params, "vmin", 0), parse_float(params, "vmax", 1)
+    else:
+        vmin, vmax = finite_data_range(data) or (0, 1)  # NaN/inf 单元透明，不参与色标
+    if vmin == vmax:
+        vmin, vmax = 0, 1
+
+    render_mode = params.get("render_mode", "polygon")
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"绘制模式需为{RENDER_MODES}之一")
+    tick_count = int(params.get("tick_count", 9))
+    if tick_count < 3:
+        raise ValueError("刻度数量必须≥3！")
+    cmap = params.get("cmap") or DEFAULT_COLORMAP
+    get_colormap(cmap)  # 未知色图在解析参数时即报错（服务端返回400）
+
+    data.flags.writeable = False
+    return PlotSpec(
+        m_layers=m, n_blocks=n, layer_points=tuple(layer_points), data=data,
+        vmin=vmin, vmax=vmax, tick_count=tick_count,
+        render_mode=render_mode, cmap=cmap,
+    )
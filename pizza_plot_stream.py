@@ -0,0 +1,211 @@
+import os
+import time
+import codecs
+import queue
+import select
+import socket
+import threading
+import collections
+
+STREAM_KINDS = ('queue', 'file', 'fifo', 'unix')
+
+
+def _iter_text_frames(read_chunk, stop_event):
+    """把文本块拆成帧：每帧若干行逗号分隔数值，帧之间以空行分隔"""
+    buf = ""
+    lines = []
+    while not stop_event.is_set():
+        chunk = read_chunk()
+        if chunk is None:  # 数据源已结束
+            break
+        buf += chunk
+        *complete, buf = buf.split('\n')
+        for line in complete:
+            line = line.strip()
+            if line:
+                lines.append(line)
+            elif lines:
+                yield "\n".join(lines)
+                lines = []
+    if lines:
+        yield "\n".join(lines)
+
+
+def _decode_chunks(read_bytes):
+    """
+    把读取字节块的函数包装为读取文本块：read_bytes 无数据时返回 b""，数据源结束时返回 None；
+    跨块截断的多字节字符由增量解码器拼接，结束时仍残留不完整字符则抛出 UnicodeDecodeError
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def read_chunk():
+        data = read_bytes()
+        if data is None:
+            decoder.decode(b'', final=True)
+            return None
+        return decoder.decode(data)
+    return read_chunk
+
+
+def _queue_reader(source):
+    def reader(stop_event):
+        while not stop_event.is_set():
+            try:
+                yield source.get(timeout=0.2)
+            except queue.Empty:
+                continue
+    return reader
+
+
+def _file_tail_reader(path):
+    """类似 tail -f：从文件当前末尾开始读取新追加的帧"""
+    def reader(stop_event):
+        with open(path, 'r', encoding='utf-8') as f:
+            f.seek(0, os.SEEK_END)
+
+            def read_chunk():
+                chunk = f.read()
+                if not chunk:
+                    stop_event.wait(0.05)
+                return chunk
+            yield from _iter_text_frames(read_chunk, stop_event)
+    return reader
+
+
+def _fifo_reader(path):
+    """命名管道：写端关闭后重新打开，等待下一个写入方"""
+    def reader(stop_event):
+        while not stop_event.is_set():
+            fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+            try:
+                def read_bytes():
+                    ready, _, _ = select.select([fd], [], [], 0.2)
+                    if not ready:
+                        return b""
+                    return os.read(fd, 65536) or None
+                yield from _iter_text_frames(_decode_chunks(read_bytes), stop_event)
+            finally:
+                os.close(fd)
+            stop_event.wait(0.05)
+    return reader
+
+
+def _unix_socket_reader(path):
+    """在 path 上监听 Unix 套接字，逐个接受连接并读取帧"""
+    def reader(stop_event):
+        if os.path.exists(path):
+            os.unlink(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(path)
+        server.listen(1)
+        server.settimeout(0.2)
+        try:
+            while not stop_event.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                with conn:
+                    conn.settimeout(0.2)
+
+                    def read_bytes():
+                        try:
+                            return conn.recv(65536) or None
+                        except socket.timeout:
+                            return b""
+                    yield from _iter_text_frames(_decode_chunks(read_bytes), stop_event)
+        finally:
+            server.close()
+            if os.path.exists(path):
+                os.unlink(path)
+    return reader
+
+
+def open_frame_reader(source, kind='queue'):
+    """按数据源类型返回帧读取器：reader(stop_event) 为产出原始帧（文本或数组）的生成器"""
+    if kind == 'queue':
+        return _queue_reader(source)
+    if kind == 'file':
+        return _file_tail_reader(source)
+    if kind == 'fifo':
+        return _fifo_reader(source)
+    if kind == 'unix':
+        return _unix_socket_reader(source)
+    raise ValueError(f"数据源类型需为{STREAM_KINDS}之一，当前{kind}")
+
+
+class PlotStream:
+    """
+    后台线程读取并解析帧，只保留最新一帧；主线程按限速取帧
+    渲染跟不上或来帧快于刷新上限时，未被取走的旧帧直接丢弃并计数
+    """
+
+    def __init__(self, reader, parse_frame, max_fps=10):
+        if max_fps <= 0:
+            raise ValueError("刷新上限必须>0")
+        self.max_fps = max_fps
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+        self.bad_frames = 0
+        self.error = None
+        self._reader = reader
+        self._parse_frame = parse_frame
+        self._lock = threading.Lock()
+        self._latest = None
+        self._last_apply = 0.0
+        self._apply_times = collections.deque(maxlen=30)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self._thread.join(timeout)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def _run(self):
+        # 任何读取/解码/解析异常都记入 error 后结束线程，不会静默退出
+        try:
+            for raw in self._reader(self._stop_event):
+                try:
+                    frame = self._parse_frame(raw)
+                except ValueError:
+                    self.bad_frames += 1
+                    continue
+                with self._lock:
+                    if self._latest is not None:
+                        self.dropped += 1
+                    self._latest = frame
+                    self.received += 1
+        except Exception as e:
+            self.error = e
+
+    def take_frame(self):
+        """取出最新一帧；未到刷新间隔或没有新帧时返回None"""
+        now = time.monotonic()
+        if now - self._last_apply < 1.0 / self.max_fps:
+            return None
+        with self._lock:
+            frame, self._latest = self._latest, None
+        if frame is not None:
+            self._last_apply = now
+            self._apply_times.append(now)
+            self.applied += 1
+        return frame
+
+    @property
+    def update_rate(self):
+        """最近若干次刷新的实际帧率（帧/秒）"""
+        if len(self._apply_times) < 2:
+            return 0.0
+        span = self._apply_times[-1] - self._apply_times[0]
+        if span <= 0 or time.monotonic() - self._apply_times[-1] > 2.0:
+            return 0.0
+        return (len(self._apply_times) - 1) / span
@@ -0,0 +1,131 @@
+import time
+import pathlib
+import contextlib
+import numpy as np
+from pizza_plot_geometry import RENDER_MODES, build_sector_verts, build_mesh_grid
+from pizza_plot_core import create_pizza_axes, measure_r_max, apply_pizza_limits, finite_data_range
+from pizza_plot_colormap import DEFAULT_COLORMAP, get_colormap
+
+TIMESERIES_FORMATS = ('mp4', 'gif', 'png')
+
+
+def load_timeseries(source):
+    """读取 (T, m, n) 时序数据；传入 .npy 路径时以内存映射方式打开"""
+    if isinstance(source, (str, pathlib.Path)):
+        source = np.load(source, mmap_mode='r')
+    if source.ndim != 3:
+        raise ValueError(f"时序数据维度需为(T, m, n)，当前{source.shape}")
+    return source
+
+
+def scan_timeseries_range(series, chunk=64):
+    """分块扫描时序数据有限值的最小/最大值（NaN/inf 绘制为透明），内存映射数据每次只驻留一个分块"""
+    vmin, vmax = np.inf, -np.inf
+    for start in range(0, series.shape[0], chunk):
+        block_range = finite_data_range(series[start:start + chunk])
+        if block_range:
+            vmin = min(vmin, block_range[0])
+            vmax = max(vmax, block_range[1])
+    if not np.isfinite(vmin) or vmin == vmax:
+        return 0, 1
+    return float(vmin), float(vmax)
+
+
+def iter_pizza_frames(series, layer_points, vmin, vmax, tick_count=9,
+                      figsize=(7, 7), dpi=100, max_chord_error=0.25, render_mode='mesh',
+                      cmap=DEFAULT_COLORMAP):
+    """几何只构建一次，之后每帧只原地更新颜色数组；逐帧产出 (帧序号, fig)"""
+    from matplotlib.colors import Normalize
+    from matplotlib.collections import PolyCollection
+    series = load_timeseries(series)
+    n_frames, m_layers, n_blocks = series.shape
+    if m_layers < 2 or n_blocks < 2:
+        raise ValueError("层数和块数必须≥2")
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"绘制模式需为{RENDER_MODES}之一，当前{render_mode}")
+
+    layer_points = np.clip(np.array(layer_points), 0.01, 0.99).tolist()
+    fig, ax = create_pizza_axes(figsize, dpi)
+    r_max = measure_r_max(fig, ax, figsize, dpi)
+    all_points = np.array([0] + layer_points + [1.0]) * r_max
+    theta = np.linspace(0, 2 * np.pi, n_blocks + 1)[::-1]
+    norm = Normalize(vmin, vmax)
+    colormap = get_colormap(cmap).cmap  # 与单图/色条共用同一LUT
+    dtype = np.result_type(series.dtype, np.float32)  # 颜色缓冲沿用数据精度，float32数据不升格
+
+    if render_mode == 'mesh':
+        x, y, seg = build_mesh_grid(all_points, theta, dpi, max_chord_error)
+        colors = np.zeros((m_layers, n_blocks * seg), dtype=dtype)
+        artist = ax.pcolormesh(x, y, colors, cmap=colormap, norm=norm,
+                               shading='flat', edgecolors='none', antialiased=False)
+        frame_view = colors.reshape(m_layers, n_blocks, seg)
+    else:
+        layer_verts = build_sector_verts(all_points[:-1], all_points[1:], theta, dpi, max_chord_error)
+        colors = np.zeros((m_layers, n_blocks), dtype=dtype)
+        artist = PolyCollection([v for verts in layer_verts for v in verts],
+                                cmap=colormap, norm=norm, edgecolors='none', linewidths=0)
+        ax.add_collection(artist)
+        frame_view = colors[:, :, None]
+    apply_pizza_limits(ax, r_max, tick_count)
+
+    for t in range(n_frames):
+        # 原地写入颜色缓冲（广播到每块的角向分段），不为每帧分配新几何
+        frame_view[...] = series[t][:, :, None]
+        artist.set_array(colors if render_mode == 'mesh' else colors.ravel())
+        yield t, fig
+
+
+def write_pizza_timeseries(series, out_path, layer_points, fmt=None, fps=10,
+                           vmin=None, vmax=None, tick_count=9, figsize=(7, 7), dpi=100,
+                           max_chord_error=0.25, render_mode='mesh', progress=None,
+                           cmap=DEFAULT_COLORMAP):
+    """
+    将时序披萨图逐帧流式写出，返回吞吐统计
+    fmt: 'mp4'（FFMpegWriter，需ffmpeg）、'gif'（PillowWriter）或 'png'（out_path为目录，逐帧编号）
+    vmin/vmax: None时先分块扫描整段数据取全局范围
+    max_chord_error: 圆弧弦高误差上限（像素），传给iter_pizza_frames
+    progress: 可选回调 progress(已完成帧数, 总帧数)
+    注意：Pillow的GIF编码器会在结束时一次性写出，帧数很多时内存随帧数增长；mp4/png为恒定内存
+    """
+    series = load_timeseries(series)
+    out_path = pathlib.Path(out_path)
+    fmt = fmt or out_path.suffix.lstrip('.').lower() or 'png'
+    if fmt not in TIMESERIES_FORMATS:
+        raise ValueError(f"输出格式需为{TIMESERIES_FORMATS}之一，当前{fmt}")
+    if vmin is None or vmax is None:
+        vmin, vmax = scan_timeseries_range(series)
+
+    n_frames, m_layers, n_blocks = series.shape
+    writer = None
+    if fmt == 'png':
+        out_path.mkdir(parents=True, exist_ok=True)
+        width = len(str(max(n_frames - 1, 0)))
+    else:
+        from matplotlib.animation import FFMpegWriter, PillowWriter
+        writer = FFMpegWriter(fps=fps) if fmt == 'mp4' else PillowWriter(fps=fps)
+
+    frames = iter_pizza_frames(series, layer_points, vmin, vmax, tick_count=tick_count,
+                               figsize=figsize, dpi=dpi, max_chord_error=max_chord_error,
+                               render_mode=render_mode, cmap=cmap)
+    count = 0
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        for t, fig in frames:
+            if writer is None:
+                fig.savefig(out_path / f"frame_{t:0{width}d}.png", dpi=dpi)
+            else:
+                if count == 0:
+                    stack.enter_context(writer.saving(fig, str(out_path), dpi))
+                writer.grab_frame()
+            count += 1
+            if progress:
+                progress(count, n_frames)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "path": out_path,
+        "frames": count,
+        "seconds": elapsed,
+        "fps": count / elapsed if elapsed > 0 else 0.0,
+        "cells_per_second": count * m_layers * n_blocks / elapsed if elapsed > 0 else 0.0,
+    }
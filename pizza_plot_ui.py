@@ -1,10 +1,13 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-import numpy as np
-from pizza_plot_logic import PizzaPlotLogic
+# numpy/matplotlib 及逻辑层均延迟导入：窗口先显示，绘图相关模块在首次使用时加载
+
+
+MEMORY_REPORT_INTERVAL_MS = 60000  # 内存诊断开启时的报告间隔
+SCALE_MODE_LABELS = {"最小/最大值": 'minmax', "百分位": 'percentile', "对称(±max|x|)": 'symmetric'}
 
 
 class PizzaPlotUI:
@@ -13,15 +16,31 @@ class PizzaPlotUI:
         self.root.title("披萨云图绘制工具")
         self.root.geometry("1200x700")
 
+        from pizza_plot_logic import PizzaPlotLogic
         self.logic = PizzaPlotLogic()
         self.plot_item_frames = {}
-        self._preview_canvas = {}
+        self._preview_labels = {}
+        self._stream_labels = {}
+        self._stream_poll_job = None
         self.export_cb_with_plot = tk.BooleanVar(value=False)
+        self.draft_export_var = tk.BooleanVar(value=False)
+        self.export_dpi_var = tk.StringVar(value="300")
+        self.export_format_var = tk.StringVar(value="png")
+        self.export_sidecar_var = tk.StringVar(value="不导出数据")
+        self.scale_mode_var = tk.StringVar(value="最小/最大值")
+        self.scale_percentile_var = tk.StringVar(value="1,99")
+        self.colormap_var = tk.StringVar(value="jet")
+        self._export_job = None
+        self._export_job_info = None
+        self._export_events = queue.Queue()  # 导出线程 → 主线程的事件（进度/日志/结束）
+        self.memory_diag_var = tk.BooleanVar(value=False)
+        self._memory_report_job = None
 
         
 
         self.logic.set_refresh_hook(self._rebuild_ui_list)
         self.logic.set_rebuild_ui_hook(self._rebuild_ui_list)
+        self.logic.set_log_hook(self._log_from_any_thread)
 
         # 仅初始化勾选框状态变量（无输入框变量）
         self.enable_custom_ticks_var = tk.BooleanVar(value=False)
@@ -36,6 +55,12 @@ class PizzaPlotUI:
         self._update_layer_display()  # 同时更新显示标签
 
         self.root.protocol("WM_DELETE_WINDOW", self._on_app_close)
+        # 窗口显示后空闲时预加载绘图后端，避免首次创建云图项时卡顿
+        self.root.after(200, self._preload_render_backend)
+
+    def _preload_render_backend(self):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg  # noqa: F401
+        from matplotlib.figure import Figure  # noqa: F401
 
     # -------------------- 布局 --------------------
     def _init_layout(self):
@@ -65,24 +90,55 @@ class PizzaPlotUI:
         self.export_cb_check = ttk.Checkbutton(op_row, text="同时导出Colorbar",
                                                variable=self.export_cb_with_plot)
         self.export_cb_check.grid(row=0, column=0, sticky='w', padx=(0, 10))
-
-        col = 1
+        ttk.Checkbutton(op_row, text="草稿导出（低压缩，更快）",
+                        variable=self.draft_export_var).grid(row=0, column=1, sticky='w', padx=(0, 10))
+        # 导出分辨率与格式：高dpi时自动分块绘制、流式写出，内存占用有上限
+        export_opts = ttk.Frame(op_row)
+        export_opts.grid(row=0, column=2, sticky='w', padx=(0, 10))
+        ttk.Label(export_opts, text="导出DPI：").pack(side='left')
+        ttk.Combobox(export_opts, textvariable=self.export_dpi_var, width=6,
+                     values=("300", "600", "1200", "2400")).pack(side='left')
+        ttk.Combobox(export_opts, textvariable=self.export_format_var, width=5, state='readonly',
+                     values=("png", "tiff")).pack(side='left', padx=(5, 0))
+        # 批量导出时附带的扇区数据表（几何、数值、颜色），便于下游分析
+        ttk.Combobox(export_opts, textvariable=self.export_sidecar_var, width=10, state='readonly',
+                     values=("不导出数据", "npz", "parquet")).pack(side='left', padx=(5, 0))
+
+        col = 3
         ttk.Button(op_row, text="创建云图项",
                    command=self._on_create_plot_click).grid(row=0, column=col, padx=2); col += 1
         ttk.Button(op_row, text="预览Colorbar",
                    command=self._on_preview_cb_click).grid(row=0, column=col, padx=2); col += 1
-        ttk.Button(op_row, text="导出Colorbar",
-                   command=self._on_export_cb_click).grid(row=0, column=col, padx=2); col += 1
+        self.export_cb_btn = ttk.Button(op_row, text="导出Colorbar",
+                                        command=self._on_export_cb_click)
+        self.export_cb_btn.grid(row=0, column=col, padx=2); col += 1
         self.delete_all_btn = ttk.Button(op_row, text="删除所有",
                                          command=self._on_delete_all_click)
         self.delete_all_btn.grid(row=0, column=col, padx=2); col += 1
         self.export_all_btn = ttk.Button(op_row, text="导出所有",
                                          command=self._on_export_all_click)
         self.export_all_btn.grid(row=0, column=col, padx=2); col += 1
+        self.export_sheet_btn = ttk.Button(op_row, text="拼版导出",
+                                           command=self._on_export_sheet_click)
+        self.export_sheet_btn.grid(row=0, column=col, padx=2); col += 1
 
         op_row.grid_columnconfigure(0, weight=0)
         op_row.grid_columnconfigure(col, weight=1)
 
+        # 后台导出进度行：导出在工作线程进行，界面保持响应，可随时取消
+        progress_row = ttk.Frame(self.root, padding=(10, 0))
+        progress_row.pack(fill='x', side='top')
+        self.export_progress = ttk.Progressbar(progress_row, mode='determinate', length=300)
+        self.export_progress.pack(side='left')
+        self.cancel_export_btn = ttk.Button(progress_row, text="取消导出", state='disabled',
+                                            command=self._on_cancel_export_click)
+        self.cancel_export_btn.pack(side='left', padx=5)
+        self.export_progress_label = ttk.Label(progress_row, text="")
+        self.export_progress_label.pack(side='left')
+        # 内存诊断：定期把内存增长、存活figure/画布/控件数写到日志面板与报告文件
+        ttk.Checkbutton(progress_row, text="内存诊断", variable=self.memory_diag_var,
+                        command=self._on_memory_diag_toggle).pack(side='right')
+
         self._update_btn_states()
 
         list_frame = ttk.LabelFrame(self.root, text="绘制列表", padding="10")
@@ -146,6 +202,13 @@ class PizzaPlotUI:
         self.modify_tick_btn = ttk.Button(self.cloud_tab, text="修改", command=self._on_modify_tick_click)
         self.modify_tick_btn.grid(row=row, column=2, padx=5, pady=5)
 
+        row += 1
+        # 整环网格绘制：块数很多时比逐扇区多边形快，且无扇区接缝
+        self.mesh_mode_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.cloud_tab, text="整环网格绘制（适合大块数）", variable=self.mesh_mode_var
+        ).grid(row=row, column=0, columnspan=3, sticky='w', padx=5, pady=5)
+
     def _init_cb_tab_layout(self):
         """初始化Colorbar标签页布局（完全匹配需求：勾选框+刻度显示+修改按钮同一行）"""
         # 核心：用一个Frame包裹同一行的所有组件，强制同行
@@ -197,6 +260,27 @@ class PizzaPlotUI:
         self.cb_font_entry.insert(0, "10")
         self.cb_font_entry.grid(row=row, column=1, padx=5, pady=5)
 
+        # 色标模式（未启用自定义刻度时生效）：单个离群值会压缩整个色标时可改用百分位/对称
+        row = 2
+        ttk.Label(self.cb_tab, text="色标模式：").grid(row=row, column=0, sticky='w', padx=5, pady=5)
+        scale_opts = ttk.Frame(self.cb_tab)
+        scale_opts.grid(row=row, column=1, sticky='w', padx=5, pady=5)
+        ttk.Combobox(scale_opts, textvariable=self.scale_mode_var, width=12, state='readonly',
+                     values=list(SCALE_MODE_LABELS)).pack(side='left')
+        ttk.Label(scale_opts, text="百分位：").pack(side='left', padx=(10, 0))
+        ttk.Entry(scale_opts, textvariable=self.scale_percentile_var, width=8).pack(side='left')
+        ttk.Button(scale_opts, text="应用", command=self._on_scale_mode_click).pack(side='left', padx=10)
+
+        # 色图：可选已注册的色图名，或直接输入逗号分隔的十六进制色标点（如 #000000,#ff0000,#ffffff）
+        row = 3
+        ttk.Label(self.cb_tab, text="色图：").grid(row=row, column=0, sticky='w', padx=5, pady=5)
+        cmap_opts = ttk.Frame(self.cb_tab)
+        cmap_opts.grid(row=row, column=1, sticky='w', padx=5, pady=5)
+        cmap_box = ttk.Combobox(cmap_opts, textvariable=self.colormap_var, width=30)
+        cmap_box.configure(postcommand=lambda: cmap_box.configure(values=self._colormap_choices()))
+        cmap_box.pack(side='left')
+        ttk.Button(cmap_opts, text="应用", command=self._on_colormap_click).pack(side='left', padx=10)
+
     # -------------------- 事件 --------------------
     def _on_create_plot_click(self):
         try:
@@ -223,7 +307,8 @@ class PizzaPlotUI:
                 layer_str=layer_str,
                 cb_font_str=self.cb_font_entry.get().strip(),
                 enable_custom_ticks=self.enable_custom_ticks_var.get(),
-                cb_tick_str=cb_tick_str  # 使用上面生成的刻度字符串
+                cb_tick_str=cb_tick_str,  # 使用上面生成的刻度字符串
+                render_mode='mesh' if self.mesh_mode_var.get() else 'polygon'
             )
             plot_id = self.logic.create_plot_item(config)
             plot_num = plot_id.split('_')[1]
@@ -312,7 +397,7 @@ class PizzaPlotUI:
         for frame in self.plot_item_frames.values():
             frame.destroy()
         self.plot_item_frames.clear()
-        self._preview_canvas.clear()
+        self._preview_labels.clear()
 
     def _on_modify_layer_click(self):
         """修改层区域（层数≥2都允许）"""
@@ -448,6 +533,7 @@ class PizzaPlotUI:
             messagebox.showerror("错误", "请输入合法数字！")
             return
 
+        import numpy as np
         mat = np.array(nums).reshape(m, n)
         data_str = '\n'.join([','.join(map(str, row)) for row in mat])
         target_text.delete('1.0', 'end')
@@ -474,6 +560,7 @@ class PizzaPlotUI:
             entries.append(row)
 
         def apply():
+            import numpy as np
             try:
                 new_mat = np.zeros((m, n))
                 for i in range(m):
@@ -494,94 +581,157 @@ class PizzaPlotUI:
         try:
             cb_font = int(self.cb_font_entry.get().strip())
             cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
-            fig = self.logic.generate_colorbar_fig(cb_font, cb_ticks)
-            
+            # 色条按设置缓存为图像，重复预览不再重建figure
+            photo = self._to_photo_image(self.logic.render_colorbar_image(cb_font, cb_ticks))
+
             cb_win = tk.Toplevel(self.root)
             cb_win.title("Colorbar预览")
-            cb_win.geometry("500x500")
             cb_win.transient(self.root)
-            
-            canvas = FigureCanvasTkAgg(fig, master=cb_win)
-            canvas.draw()
-            canvas_widget = canvas.get_tk_widget()
-            canvas_widget.pack(fill='both', expand=True)
 
-            def close_win():
-                try:
-                    # ✅ 正确的清理顺序：
-                    canvas_widget.destroy()
-                    canvas.figure = None
-                    plt.close(fig)
-                    cb_win.destroy()
-                except Exception as e:
-                    print(f"关闭Colorbar窗口时出错: {e}")
-                    cb_win.destroy()
-            
-            ttk.Button(cb_win, text="关闭", command=close_win).pack(pady=10)
-            cb_win.protocol("WM_DELETE_WINDOW", close_win)
-            
+            image_label = ttk.Label(cb_win, image=photo)
+            image_label.image = photo  # 保持引用，防止被回收
+            image_label.pack(fill='both', expand=True)
+
+            ttk.Button(cb_win, text="关闭", command=cb_win.destroy).pack(pady=10)
+
         except ValueError as e:
             messagebox.showerror("错误", str(e))
             self._log(f"预览Colorbar失败：{str(e)}")
 
     # ✅ 补回：预览按钮 → 弹窗大图
     def _on_preview_click(self, plot_id):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from pizza_plot_preview import PizzaPreview
         try:
             cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
-            fig = self.logic.generate_plot_fig(plot_id, cb_custom_ticks=cb_ticks, is_preview=False)
-            
+            spec = self.logic.snapshot_spec(plot_id, cb_custom_ticks=cb_ticks, is_preview=False)
+
             preview_win = tk.Toplevel(self.root)
             preview_win.title(f"图{plot_id.split('_')[1]} 预览")
-            preview_win.geometry("600x600")
+            preview_win.geometry("600x720")
             preview_win.transient(self.root)
 
-            canvas = FigureCanvasTkAgg(fig, master=preview_win)
+            readout = ttk.Label(preview_win, text="将鼠标移到图上查看数值（滚轮缩放，左键拖动平移）",
+                                font=("微软雅黑", 9))
+
+            def show_hover(info):
+                if info is None:
+                    readout.config(text="")
+                else:
+                    readout.config(text=f"层 {info['layer'] + 1}  块 {info['block'] + 1}  值 {info['value']:.6g}")
+
+            preview = PizzaPreview(spec, max_chord_error=self.logic.max_chord_error, on_hover=show_hover)
+            canvas = FigureCanvasTkAgg(preview.fig, master=preview_win)
             canvas.draw()
             canvas_widget = canvas.get_tk_widget()
-            canvas_widget.pack(fill='both', expand=True)
+
+            # 色标范围滑块：拖动时合并到空闲回调中执行，只重设颜色并blit
+            lo = min(spec.vmin, float(spec.data.min()))
+            hi = max(spec.vmax, float(spec.data.max()))
+            vmin_var = tk.DoubleVar(value=spec.vmin)
+            vmax_var = tk.DoubleVar(value=spec.vmax)
+            pending = []
+
+            def apply_range():
+                pending.clear()
+                try:
+                    preview.set_range(vmin_var.get(), vmax_var.get())
+                except ValueError:
+                    pass
+
+            def on_slide(_value):
+                if not pending:
+                    pending.append(preview_win.after_idle(apply_range))
+
+            range_frame = ttk.Frame(preview_win)
+            for row, (text, var) in enumerate([("最小值", vmin_var), ("最大值", vmax_var)]):
+                ttk.Label(range_frame, text=text).grid(row=row, column=0, sticky='w')
+                ttk.Scale(range_frame, from_=lo, to=hi, variable=var, command=on_slide).grid(
+                    row=row, column=1, sticky='ew', padx=5)
+                ttk.Label(range_frame, textvariable=var, width=10).grid(row=row, column=2, sticky='w')
+            range_frame.columnconfigure(1, weight=1)
 
             def close_win():
                 try:
+                    preview.close()
                     canvas_widget.destroy()   # 1. 毁 Tk 组件
-                    canvas.figure = None      # 2. 断 matplotlib 引用
-                    plt.close(fig)            # 3. 关 figure（复用型 figure 可省略这步）
+                    canvas.figure = None      # 2. 断 matplotlib 引用（figure不在pyplot中注册，无需close）
                 except Exception:
                     pass
                 finally:
                     preview_win.destroy()
-                        
-            ttk.Button(preview_win, text="关闭", command=close_win).pack(pady=10)
+
+            btn_frame = ttk.Frame(preview_win)
+            ttk.Button(btn_frame, text="复位视图", command=preview.reset_view).pack(side='left', padx=5)
+            ttk.Button(btn_frame, text="关闭", command=close_win).pack(side='left', padx=5)
+
+            # 先从底部依次放置控件，画布最后填充剩余空间，窗口缩小时控件不被挤掉
+            btn_frame.pack(side='bottom', pady=8)
+            range_frame.pack(side='bottom', fill='x', padx=10)
+            readout.pack(side='bottom', pady=2)
+            canvas_widget.pack(fill='both', expand=True)
             preview_win.protocol("WM_DELETE_WINDOW", close_win)
             
         except ValueError as e:
             messagebox.showerror("错误", str(e))
             self._log(f"预览失败：{str(e)}")
 
+    def _apply_export_settings(self):
+        """把界面上的导出DPI/格式/数据表格式写入逻辑层"""
+        dpi = self.export_dpi_var.get().strip()
+        if not dpi.isdigit() or int(dpi) <= 0:
+            raise ValueError("导出DPI需为正整数！")
+        self.logic.export_dpi = int(dpi)
+        self.logic.export_format = self.export_format_var.get()
+        from pizza_plot_export import SIDECAR_FORMATS
+        sidecar = self.export_sidecar_var.get()
+        self.logic.export_sidecar = sidecar if sidecar in SIDECAR_FORMATS else None
+
     def _on_export_single_click(self, plot_id):
         try:
+            self._apply_export_settings()
             # 从last_valid_tick_config获取刻度
             cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
-            main_path = self.logic.export_single_plot(plot_id, cb_ticks)
-            self._log(f"导出至：{main_path}")
+            draft = self.draft_export_var.get()
+            self._start_export_job(
+                lambda **callbacks: self.logic.start_export_single(plot_id, cb_ticks, draft, **callbacks),
+                "导出", lambda main_path: self._log(f"导出至：{main_path}"),
+            )
         except ValueError as e:
             messagebox.showerror("错误", str(e))
             self._log(f"导出失败：{str(e)}")
 
     def _on_export_all_click(self):
         try:
+            self._apply_export_settings()
             cb_font = int(self.cb_font_entry.get().strip())
             # 从last_valid_tick_config获取刻度
             cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
-            export_paths, export_dir = self.logic.export_all_plots(self.export_cb_with_plot.get(),
-                                                                cb_font, cb_ticks)
-            self._log(f"批量导出完成，共导出{len(export_paths)}个文件，位于：\n{export_dir.absolute()}")
+            export_cb, draft = self.export_cb_with_plot.get(), self.draft_export_var.get()
+            self._start_export_job(
+                lambda **callbacks: self.logic.start_export_all(export_cb, cb_font, cb_ticks, draft, **callbacks),
+                "批量导出",
+                lambda result: self._log(f"批量导出完成，共导出{len(result[0])}个文件，位于：\n{result[1].absolute()}"),
+            )
         except ValueError as e:
             messagebox.showerror("错误", str(e))
             self._log(f"批量导出失败：{str(e)}")
 
+    def _on_export_sheet_click(self):
+        try:
+            cb_font = int(self.cb_font_entry.get().strip())
+            cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
+            sheet_paths, export_dir = self.logic.export_plot_sheets(cb_font_size=cb_font,
+                                                                    cb_custom_ticks=cb_ticks)
+            self._log(f"拼版导出完成，共{len(sheet_paths)}页，位于：\n{export_dir.absolute()}")
+        except ValueError as e:
+            messagebox.showerror("错误", str(e))
+            self._log(f"拼版导出失败：{str(e)}")
+
     def _on_export_cb_click(self):
-        """导出Colorbar到时间戳目录，文件名：colorbar_时间戳.png"""
+        """导出Colorbar到时间戳目录，文件名：colorbar_时间戳.png（或.tiff）"""
         try:
+            self._apply_export_settings()
             enable_custom = self.enable_custom_ticks_var.get()
             cb_ticks = self.last_valid_tick_config[1] if enable_custom else []
             cb_font = int(self.cb_font_entry.get().strip() or 18)
@@ -589,17 +739,19 @@ class PizzaPlotUI:
             # 生成时间戳文件名和路径（无需用户选择）
             export_dir = self.logic._get_export_dir()  # 获取自动生成的目录
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            cb_filename = f"colorbar_{timestamp}.png"
+            cb_filename = f"colorbar_{timestamp}.{self.logic.export_format}"
             save_path = export_dir / cb_filename
 
-            # 调用logic层导出
-            self.logic.export_colorbar(
-                save_path,
-                cb_font_size=cb_font,
-                cb_custom_ticks=cb_ticks
+            # 调用logic层后台导出，完成后提示
+            def on_success(path):
+                messagebox.showinfo("成功", f"Colorbar已导出到：\n{path}")
+                self._log(f"导出Colorbar成功：{path}")
+            draft = self.draft_export_var.get()
+            self._start_export_job(
+                lambda **callbacks: self.logic.start_export_colorbar(save_path, cb_font, cb_ticks, draft,
+                                                                      **callbacks),
+                "导出Colorbar", on_success,
             )
-            messagebox.showinfo("成功", f"Colorbar已导出到：\n{save_path}")
-            self._log(f"导出Colorbar成功：{save_path}")
         except Exception as e:
             messagebox.showerror("导出失败", f"导出Colorbar出错：{str(e)}")
             self._log(f"导出Colorbar失败：{str(e)}")
@@ -669,29 +821,35 @@ class PizzaPlotUI:
         preview_frame.pack(side='left', padx=(0, 8))
         preview_frame.pack_propagate(False)
 
-        # 获取当前生效的自定义刻度
-        cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
-        # 传递cb_custom_ticks参数
-        fig = self.logic.generate_plot_fig(
-            plot_id, 
-            cb_custom_ticks=cb_ticks,  # 新增：传递自定义刻度
-            is_preview=True, 
-        )
-        canvas = FigureCanvasTkAgg(fig, master=preview_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
-        self._preview_canvas[plot_id] = canvas
+        # 缩略图为模板渲染的图像，用Label显示，不再为每项创建figure画布
+        preview_label = ttk.Label(preview_frame)
+        preview_label.pack(fill='both', expand=True)
+        self._preview_labels[plot_id] = preview_label
+        self._refresh_plot_preview(plot_id)
 
         right_frame = ttk.Frame(row_frame)
         right_frame.pack(side='left', fill='y')
 
         ttk.Label(right_frame, text=f"图{plot_id.split('_')[1]}", font=("微软雅黑", 10, "bold")).pack(anchor='w')
+        # 数据规模与内存占用
+        nbytes = self.logic.get_plot_nbytes(plot_id)
+        ttk.Label(
+            right_frame,
+            text=f"{config['m_layers']}×{config['n_blocks']}  {self.logic.storage_dtype.name}  {nbytes / 1024:.1f} KB",
+            font=("微软雅黑", 9)
+        ).pack(anchor='w')
         btn_bar = ttk.Frame(right_frame)
         btn_bar.pack(pady=2)
         ttk.Button(btn_bar, text="设置数据", command=lambda: self._on_set_data_click(plot_id)).pack(side='left', padx=2)
         ttk.Button(btn_bar, text="预览", command=lambda: self._on_preview_click(plot_id)).pack(side='left', padx=2)
         ttk.Button(btn_bar, text="导出", command=lambda: self._on_export_single_click(plot_id)).pack(side='left', padx=2)
         ttk.Button(btn_bar, text="删除", command=lambda: self._on_delete_single_click(plot_id)).pack(side='left', padx=2)
+        ttk.Button(btn_bar, text="实时数据", command=lambda: self._on_stream_click(plot_id)).pack(side='left', padx=2)
+
+        # 实时数据流状态（刷新率/丢帧数），由轮询循环更新
+        if plot_id in self.logic.streams:
+            self._stream_labels[plot_id] = ttk.Label(right_frame, font=("微软雅黑", 9))
+            self._stream_labels[plot_id].pack(anchor='w')
 
         self.plot_item_frames[plot_id] = row_frame
 
@@ -703,25 +861,202 @@ class PizzaPlotUI:
         self._rebuild_ui_list()
 
     def _refresh_plot_preview(self, plot_id):
-        fig = self.logic.generate_plot_fig(plot_id, is_preview=True, show_colorbar=False)
-        self._preview_canvas[plot_id].figure.clear()
-        self._preview_canvas[plot_id].figure = fig
-        self._preview_canvas[plot_id].draw()
+        """只重绘单个图项的缩略图，不重建整个列表"""
+        # 获取当前生效的自定义刻度
+        cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
+        image = self.logic.render_preview_image(plot_id, cb_custom_ticks=cb_ticks)
+        label = self._preview_labels[plot_id]
+        label.image = self._to_photo_image(image)  # 保留引用，避免被回收
+        label.config(image=label.image)
+
+    def _to_photo_image(self, image):
+        """RGBA数组 → Tk PhotoImage（经二进制PPM传入，无需额外依赖）；含透明像素时先叠到白底上"""
+        height, width = image.shape[:2]
+        rgb = image[:, :, :3]
+        if image[:, :, 3].min() < 255:
+            alpha = image[:, :, 3:] / 255.0
+            rgb = (rgb * alpha + 255 * (1 - alpha) + 0.5).astype('uint8')
+        ppm = f"P6 {width} {height} 255 ".encode('ascii') + rgb.tobytes()
+        return tk.PhotoImage(master=self.root, data=ppm, format='PPM')
+
+    # -------------------- 实时数据流 --------------------
+    def _on_stream_click(self, plot_id):
+        plot_num = plot_id.split('_')[1]
+        win = tk.Toplevel(self.root)
+        win.title(f"图{plot_num}实时数据")
+        win.geometry("380x180")
+        win.resizable(False, False)
+        win.transient(self.root)
+
+        ttk.Label(win, text="数据源：").grid(row=0, column=0, sticky='w', padx=10, pady=5)
+        kind_box = ttk.Combobox(win, values=["file", "fifo", "unix"], state='readonly', width=10)
+        kind_box.set("file")
+        kind_box.grid(row=0, column=1, sticky='w', padx=5, pady=5)
+        ttk.Label(win, text="路径：").grid(row=1, column=0, sticky='w', padx=10, pady=5)
+        path_entry = ttk.Entry(win, width=32)
+        path_entry.grid(row=1, column=1, sticky='w', padx=5, pady=5)
+        ttk.Label(win, text="刷新上限(帧/秒)：").grid(row=2, column=0, sticky='w', padx=10, pady=5)
+        fps_entry = ttk.Entry(win, width=10)
+        fps_entry.insert(0, "10")
+        fps_entry.grid(row=2, column=1, sticky='w', padx=5, pady=5)
+
+        def start():
+            try:
+                path = path_entry.get().strip()
+                if not path:
+                    raise ValueError("请输入数据源路径！")
+                self.logic.start_stream(plot_id, path, kind=kind_box.get(),
+                                        max_fps=float(fps_entry.get().strip()))
+                self._log(f"图{plot_num}已接入实时数据：{kind_box.get()} {path}")
+                self._rebuild_ui_list()
+                self._schedule_stream_poll()
+                win.destroy()
+            except (ValueError, OSError) as e:
+                messagebox.showerror("错误", str(e))
+
+        def stop():
+            if plot_id in self.logic.streams:
+                self.logic.stop_stream(plot_id)
+                self._log(f"图{plot_num}已停止实时数据")
+                self._rebuild_ui_list()
+            win.destroy()
+
+        btn_frame = ttk.Frame(win)
+        btn_frame.grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Button(btn_frame, text="开始", command=start).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="停止", command=stop).pack(side='left', padx=5)
+
+    def _schedule_stream_poll(self):
+        if self._stream_poll_job is None and self.logic.streams:
+            self._stream_poll_job = self.root.after(20, self._poll_streams)
+
+    def _poll_streams(self):
+        """定时取最新帧：范围不变时只重绘变化的图项，范围变化（且未启用自定义刻度）时全部重绘"""
+        self._stream_poll_job = None
+        updated, range_changed = self.logic.poll_streams()
+        if range_changed and not self.enable_custom_ticks_var.get():
+            updated = list(self._preview_labels)
+        for plot_id in updated:
+            if plot_id in self._preview_labels:
+                self._refresh_plot_preview(plot_id)
+        for plot_id, label in self._stream_labels.items():
+            stream = self.logic.streams.get(plot_id)
+            if stream:
+                status = f"实时：{stream.update_rate:.1f} 帧/秒，丢帧 {stream.dropped}"
+                if stream.error:
+                    status += f"，错误：{stream.error}"
+                label.config(text=status)
+        self._schedule_stream_poll()
 
     # 统一入口：任何数据变化 → 重建列表
     def _rebuild_ui_list(self):
-        for w in self.list_content_frame.winfo_children():
-            w.destroy()
-        self.plot_item_frames.clear()
-        self._preview_canvas.clear()
-        for plot_id, config in self.logic.plot_items.items():
-            self._add_plot_item_ui(plot_id, config)
-        self._update_btn_states()
+        with self.logic.memory_section("_rebuild_ui_list"):
+            for w in self.list_content_frame.winfo_children():
+                w.destroy()
+            self.plot_item_frames.clear()
+            self._preview_labels.clear()
+            self._stream_labels.clear()
+            for plot_id, config in self.logic.plot_items.items():
+                self._add_plot_item_ui(plot_id, config)
+            self._update_btn_states()
 
     def _update_btn_states(self):
         has_items = bool(self.logic.plot_items)
+        idle = self._export_job is None
         self.delete_all_btn.config(state='normal' if has_items else 'disabled')
-        self.export_all_btn.config(state='normal' if has_items else 'disabled')
+        self.export_all_btn.config(state='normal' if has_items and idle else 'disabled')
+        self.export_sheet_btn.config(state='normal' if has_items else 'disabled')
+        self.export_cb_btn.config(state='normal' if idle else 'disabled')
+
+    # -------------------- 后台导出 --------------------
+    def _start_export_job(self, start, title, on_success):
+        """
+        start(**callbacks) 启动逻辑层的后台导出并返回 ExportJob；导出线程的回调只往队列里放事件，
+        由 _poll_export_job 在主线程更新进度条与日志（Tk 控件只能在主线程操作）
+        """
+        if self._export_job is not None:
+            messagebox.showinfo("提示", "已有导出任务正在进行，请等待完成或先取消")
+            return
+        events = self._export_events
+        job = start(on_progress=lambda done, total: events.put(('progress', done, total)),
+                    on_done=lambda job: events.put(('done', job)))
+        self._export_job = job
+        self._export_job_info = (title, on_success)
+        self.export_progress.config(maximum=max(job.total, 1), value=0)
+        self.export_progress_label.config(text=f"{title}：0/{job.total}")
+        self.cancel_export_btn.config(state='normal')
+        self._update_btn_states()
+        self.root.after(50, self._poll_export_job)
+
+    def _poll_export_job(self):
+        while True:
+            try:
+                event = self._export_events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'log':
+                self._log(event[1])
+            elif event[0] == 'progress' and self._export_job_info:
+                _, done, total = event
+                self.export_progress.config(value=done)
+                self.export_progress_label.config(text=f"{self._export_job_info[0]}：{done}/{total}")
+            elif event[0] == 'done':
+                self._on_export_job_done(event[1])
+        if self._export_job is not None:
+            self.root.after(50, self._poll_export_job)
+
+    def _on_export_job_done(self, job):
+        title, on_success = self._export_job_info
+        self._export_job = None
+        self._export_job_info = None
+        self.cancel_export_btn.config(state='disabled')
+        self._update_btn_states()
+        done, total = job.progress
+        location = f"，位于：\n{job.paths[0].parent.absolute()}" if job.paths else ""
+        if job.status == 'done':
+            self.export_progress_label.config(text=f"{title}完成：{done}/{total}")
+            on_success(job.result())
+        elif job.status == 'cancelled':
+            self.export_progress_label.config(text=f"{title}已取消：{done}/{total}")
+            self._log(f"{title}已取消，已完成{done}/{total}个文件{location}")
+        else:
+            self.export_progress_label.config(text=f"{title}失败：{done}/{total}")
+            messagebox.showerror("错误", str(job.error))
+            self._log(f"{title}失败：{job.error}（已完成{done}/{total}个文件{location}）")
+
+    def _on_cancel_export_click(self):
+        if self._export_job is not None:
+            self._export_job.cancel()
+            self.cancel_export_btn.config(state='disabled')
+            self.export_progress_label.config(text="正在取消（等待当前文件写完）…")
+
+    # -------------------- 内存诊断 --------------------
+    def _on_memory_diag_toggle(self):
+        if self.memory_diag_var.get():
+            path = f"memory_{datetime.now():%Y%m%d_%H%M%S}.log"
+            self.logic.enable_memory_diagnostics(path)
+            self._memory_report_tick()
+        else:
+            if self._memory_report_job is not None:
+                self.root.after_cancel(self._memory_report_job)
+                self._memory_report_job = None
+            self._memory_report_tick(reschedule=False)
+            self.logic.disable_memory_diagnostics()
+
+    def _memory_report_tick(self, reschedule=True):
+        """生成一次报告：摘要写日志面板，完整报告追加到文件"""
+        from pizza_plot_memory import format_memory_summary
+        report = self.logic.memory_diagnostics_report(self.root)
+        self._log(format_memory_summary(report))
+        if reschedule:
+            self._memory_report_job = self.root.after(MEMORY_REPORT_INTERVAL_MS, self._memory_report_tick)
+
+    def _log_from_any_thread(self, msg):
+        """逻辑层日志可能来自导出线程：非主线程时放入事件队列，由主线程轮询写入"""
+        if threading.current_thread() is threading.main_thread():
+            self._log(msg)
+        else:
+            self._export_events.put(('log', msg))
 
     def _log(self, msg):
         self.log_text.config(state='normal')
@@ -805,24 +1140,63 @@ class PizzaPlotUI:
             self._rebuild_ui_list()
             self._log("取消自定义刻度，已恢复原始数据范围重绘")
 
+    def _on_scale_mode_click(self):
+        try:
+            mode = SCALE_MODE_LABELS[self.scale_mode_var.get()]
+            percentiles = [float(x) for x in self.scale_percentile_var.get().split(',')]
+            self.logic.set_scale_mode(mode, percentiles)
+            vmin, vmax = self.logic.get_global_min_max()
+            if not self.enable_custom_ticks_var.get():
+                self.logic.regenerate_all_plots(cb_custom_ticks=[])
+                self._rebuild_ui_list()
+            self._log(f"色标模式：{self.scale_mode_var.get()}，当前范围[{vmin:g}, {vmax:g}]")
+        except ValueError as e:
+            messagebox.showerror("错误", f"色标模式设置失败：{str(e)}")
+
+    def _colormap_choices(self):
+        from pizza_plot_colormap import available_colormaps
+        return available_colormaps()
+
+    def _on_colormap_click(self):
+        text = self.colormap_var.get().strip()
+        try:
+            if ',' in text:
+                self.logic.set_colormap("自定义", stops=text.split(','))
+                self.colormap_var.set("自定义")
+            else:
+                self.logic.set_colormap(text)
+            cb_ticks = self.last_valid_tick_config[1] if self.enable_custom_ticks_var.get() else []
+            self.logic.regenerate_all_plots(cb_custom_ticks=cb_ticks)
+            self._rebuild_ui_list()
+            self._log(f"色图已切换为：{self.logic.colormap}")
+        except ValueError as e:
+            messagebox.showerror("错误", f"色图设置失败：{str(e)}")
+
     def _on_app_close(self):
         """应用程序关闭时清理所有资源"""
         import gc
         
-        # 关闭所有matplotlib图形
+        # 停止所有实时数据流
+        for plot_id in list(self.logic.streams):
+            self.logic.stop_stream(plot_id)
+
+        # 取消进行中的导出：协作式，最多等当前文件写完
+        if self._export_job is not None:
+            self._export_job.cancel()
+            self._export_job.wait(5)
+
+        if self._memory_report_job is not None:
+            self.root.after_cancel(self._memory_report_job)
+        self.logic.disable_memory_diagnostics()
+
+        # 释放所有matplotlib图形引用
         for item in self.logic.plot_items.values():
-            if item["fig"]:
-                plt.close(item["fig"])
-                item["fig"] = None
+            item["fig"] = None
         
-        # 清空预览Canvas
-        for canvas in self._preview_canvas.values():
-            if canvas:
-                canvas.figure = None
-                try:
-                    canvas.get_tk_widget().destroy()
-                except:
-                    pass
+        # 清空缩略图
+        for label in self._preview_labels.values():
+            label.image = None
+        self._preview_labels.clear()
         
         # 强制垃圾回收
         gc.collect()
@@ -889,5 +1263,8 @@ class PizzaPlotUI:
 # -------------------- 启动 --------------------
 if __name__ == "__main__":
     root = tk.Tk()
+    root.title("披萨云图绘制工具")
+    root.geometry("1200x700")
+    root.update()  # 先显示窗口，再加载numpy等较重的模块
     app = PizzaPlotUI(root)
     root.mainloop()
\ No newline at end of file
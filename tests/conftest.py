@@ -0,0 +1,6 @@
+import sys
+import pathlib
+import matplotlib
+
+matplotlib.use("Agg")
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
@@ -0,0 +1,18 @@
+import numpy as np
+import pizza_plot_batch
+from pizza_plot_batch import list_plot_units, render_units
+
+
+def test_render_units_opens_each_file_once(tmp_path, monkeypatch):
+    path = tmp_path / "stack.csv"
+    np.savetxt(path, np.random.default_rng(0).random((3, 4)), delimiter=',')
+    stack = tmp_path / "stack3.npy"
+    np.save(stack, np.random.default_rng(1).random((3, 2, 4)))
+    opened = []
+    original = pizza_plot_batch.open_data_file
+    monkeypatch.setattr(pizza_plot_batch, "open_data_file", lambda p: opened.append(p) or original(p))
+    units = list_plot_units([path, stack])
+    opened.clear()
+    paths, _ = render_units(units, tmp_path / "out", 0.0, 1.0, dpi=50, workers=1)
+    assert len(paths) == 4 and all(p.exists() for p in paths)
+    assert sorted(opened) == sorted([path, stack])
@@ -0,0 +1,48 @@
+import numpy as np
+import pizza_plot_logic
+from pizza_plot_colormap import get_colormap
+from pizza_plot_logic import PizzaPlotLogic
+
+
+def _colorbar_cmap(cax):
+    from matplotlib.collections import QuadMesh
+    return next(c.get_cmap().name for c in cax.collections if isinstance(c, QuadMesh))
+
+
+def test_colorbar_cache_follows_reregistered_stops():
+    logic = PizzaPlotLogic()
+    logic.set_colormap("自定义", ["#000000", "#ffffff"])
+    black_white = logic.render_colorbar_image(10, [])
+    logic.set_colormap("自定义", ["#ff0000", "#0000ff"])
+    red_blue = logic.render_colorbar_image(10, [])
+    assert not np.array_equal(black_white, red_blue)
+    fresh = PizzaPlotLogic()
+    fresh.set_colormap("自定义", ["#ff0000", "#0000ff"])
+    assert np.array_equal(red_blue, fresh.render_colorbar_image(10, []))
+
+
+def test_sheet_draws_each_item_with_its_colormap(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sheets = []
+    generate = pizza_plot_logic.generate_pizza_sheet
+
+    def keep_sheet(*args, **kwargs):
+        sheets.append(generate(*args, **kwargs))
+        return sheets[-1]
+
+    monkeypatch.setattr(pizza_plot_logic, "generate_pizza_sheet", keep_sheet)
+    logic = PizzaPlotLogic()
+    for _ in range(2):
+        logic.create_plot_item(logic.parse_config("2", "3", "9", False, "", "10", False, ""))
+    logic.set_plot_colormap("plot_2", "viridis")
+    logic.export_plot_sheets(rows=1, cols=2, dpi=50)
+    first, second, colorbar = sheets[0].axes
+    assert first.get_title() == "plot1" and second.get_title() == "plot2 (viridis)"
+    assert _colorbar_cmap(colorbar) == "jet"
+    assert np.array_equal(second.collections[0].get_facecolor()[0], get_colormap("viridis").colors[0])
+
+    logic.set_plot_colormap("plot_1", "viridis")
+    logic.export_plot_sheets(rows=1, cols=2, dpi=50)
+    first, second, colorbar = sheets[1].axes
+    assert first.get_title() == "plot1" and second.get_title() == "plot2"
+    assert _colorbar_cmap(colorbar) == "viridis"
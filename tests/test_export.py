@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from pizza_plot_core import generate_colorbar, generate_pizza_plot, pizza_sector_table
+from PIL import Image
+from pizza_plot_export import (
+    ExportPipeline, figure_crop_box, iter_figure_strips, render_figure_rgba, write_sector_sidecar
+)
+from pizza_plot_spec import build_plot_spec
+
+
+def _plot_fig(render_mode):
+    data = np.random.default_rng(0).random((5, 24))
+    fig, _ = generate_pizza_plot(5, 24, [0.2, 0.4, 0.6, 0.8], data, 0.0, 1.0, figsize=(3, 3), dpi=100,
+                                 render_mode=render_mode)
+    return fig
+
+
+@pytest.mark.parametrize("render_mode", ["polygon", "mesh"])
+@pytest.mark.parametrize("dpi, strip_rows", [(100, 37), (150, 64), (217, 1000)])
+def test_strips_match_single_pass(render_mode, dpi, strip_rows):
+    fig = _plot_fig(render_mode)
+    full = render_figure_rgba(fig, dpi)
+    tiled = np.concatenate(list(iter_figure_strips(fig, dpi, strip_rows)))
+    assert np.array_equal(tiled, full)
+    # 分块绘制后整图绘制结果不受影响（坐标轴位置、画布尺寸已恢复）
+    assert np.array_equal(render_figure_rgba(fig, dpi), full)
+
+
+def test_strips_with_crop_box_outside_canvas():
+    fig, ax = generate_colorbar(0, 1, figsize=(2, 3))
+    dpi = 120
+    full = render_figure_rgba(fig, dpi, transparent=False)
+    top, bottom, left, right = box = figure_crop_box(fig, dpi, 20, [a for a in fig.axes if a is not ax])
+    tiled = np.concatenate(list(iter_figure_strips(fig, dpi, 50, box, transparent=False)))
+    assert tiled.shape == (bottom - top, right - left, 4)
+    expected = np.zeros_like(tiled)
+    r0, c0 = max(top, 0), max(left, 0)
+    src = full[r0:bottom, c0:right]
+    expected[r0 - top:r0 - top + src.shape[0], c0 - left:c0 - left + src.shape[1]] = src
+    assert np.array_equal(tiled, expected)
+
+
+@pytest.mark.parametrize("suffix", ["png", "tiff"])
+@pytest.mark.parametrize("tile_bytes", [None, 2**20])
+def test_export_records_dpi(tmp_path, tile_bytes, suffix):
+    path = tmp_path / f"plot.{suffix}"
+    with ExportPipeline(workers=1, tile_bytes=tile_bytes) as pipeline:
+        pipeline.submit(_plot_fig("polygon"), path, dpi=300)
+    with Image.open(path) as image:
+        assert image.info["dpi"] == pytest.approx((300, 300), abs=0.01)
+        if suffix == "tiff":
+            assert image.tag_v2[282] == image.tag_v2[283] == 300  # XResolution / YResolution
+            assert image.tag_v2[296] == 2  # ResolutionUnit：英寸
+        assert np.asarray(image).shape[2] == 4  # 加入标签后IFD仍可正常解码
+
+
+def test_sector_sidecar_npz_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    tables = [pizza_sector_table(build_plot_spec({}, rng.random((3, 8)))),
+              pizza_sector_table(build_plot_spec({"cmap": "viridis", "vmin": 0, "vmax": 2}, rng.random((5, 4))))]
+    path = write_sector_sidecar(tmp_path / "sectors.npz", tables)
+    with np.load(path) as loaded:
+        assert set(loaded.files) == set(tables[0])
+        for name in tables[0]:
+            expected = np.concatenate([table[name] for table in tables])
+            assert loaded[name].dtype == expected.dtype
+            np.testing.assert_array_equal(loaded[name], expected)
+        assert loaded["rgba"].shape == (3 * 8 + 5 * 4, 4)
+
+
+def test_sector_sidecar_parquet_round_trip(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pizza_sector_table(build_plot_spec({}, np.random.default_rng(0).random((3, 8))))
+    loaded = pq.read_table(write_sector_sidecar(tmp_path / "sectors.parquet", [table], 'parquet'))
+    for name in table:
+        values = np.array(loaded.column(name).to_pylist())
+        np.testing.assert_array_equal(values, table[name])
+
+
+@pytest.mark.parametrize("tables, fmt", [([], 'npz'), ([{"value": np.zeros(1)}], 'csv')])
+def test_sector_sidecar_rejects_bad_args(tmp_path, tables, fmt):
+    with pytest.raises(ValueError):
+        write_sector_sidecar(tmp_path / f"sectors.{fmt}", tables, fmt)
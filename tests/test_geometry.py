@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from pizza_plot_geometry import arc_point_counts, build_mesh_grid, downsample_pizza
+
+RADII_PX = np.array([0.1, 0.25, 1.0, 7.3, 50.0, 333.0, 2000.0])
+LAYER_POINTS = (0.1, 0.2, 0.3, 0.5, 0.8)
+# 块向 10→4：分界 round(linspace(0, 10, 5)) = [0, 2, 5, 8, 10]，组大小 2/3/3/2
+BLOCK_CUTS = [0, 2, 5, 8, 10]
+# 层向 6→3：目标分界 1/3、2/3 吸附到最近的原始分界 0.3、0.8
+LAYER_CUTS = [0, 3, 5, 6]
+
+
+def _reduce_blocks(data, layer_cuts, block_cuts, reduce):
+    return np.array([[reduce(data[l0:l1, b0:b1]) for b0, b1 in zip(block_cuts, block_cuts[1:])]
+                     for l0, l1 in zip(layer_cuts, layer_cuts[1:])])
+
+
+@pytest.mark.parametrize("method, reduce", [("mean", np.mean), ("max", np.max)])
+def test_downsample_uneven_blocks(method, reduce):
+    data = np.random.default_rng(0).random((6, 10))
+    out, points = downsample_pizza(data, LAYER_POINTS, 3, 4, method)
+    assert points == (0.3, 0.8)
+    np.testing.assert_allclose(out, _reduce_blocks(data, LAYER_CUTS, BLOCK_CUTS, reduce))
+
+
+def test_downsample_mean_keeps_float32_and_max_keeps_peak():
+    data = np.zeros((6, 10), dtype=np.float32)
+    data[4, 6] = 100.0
+    mean, _ = downsample_pizza(data, LAYER_POINTS, 3, 4, 'mean')
+    peak, _ = downsample_pizza(data, LAYER_POINTS, 3, 4, 'max')
+    assert mean.dtype == np.float32
+    # 峰值所在组为第3~4层、第5~7块，共6个单元
+    np.testing.assert_allclose(mean[1, 2], 100.0 / 6, rtol=1e-6)
+    assert peak[1, 2] == 100.0 and np.count_nonzero(peak) == 1
+
+
+def test_downsample_within_limits_is_unchanged():
+    data = np.random.default_rng(1).random((6, 10))
+    out, points = downsample_pizza(data, LAYER_POINTS, 6, 10)
+    assert out is data and points == LAYER_POINTS
+    # 只有块向超限时层向保持不变
+    out, points = downsample_pizza(data, LAYER_POINTS, 8, 5, 'max')
+    assert out.shape == (6, 5) and points == LAYER_POINTS
+
+
+def test_downsample_rejects_unknown_method():
+    with pytest.raises(ValueError):
+        downsample_pizza(np.zeros((2, 2)), (0.5,), 2, 2, 'median')
+
+
+@pytest.mark.parametrize("theta_span", [2 * np.pi / 3, -np.pi / 7, 2 * np.pi / 360, np.pi])
+@pytest.mark.parametrize("max_chord_error", [0.1, 0.25, 1.0])
+def test_arc_point_counts_chord_error_bound(theta_span, max_chord_error):
+    counts = arc_point_counts(theta_span, RADII_PX, max_chord_error)
+    assert counts.shape == RADII_PX.shape and (counts >= 2).all()
+
+    def chord_error(radii, n):
+        return radii * (1 - np.cos(abs(theta_span) / (n - 1) / 2))
+
+    assert (chord_error(RADII_PX, counts) <= max_chord_error * (1 + 1e-9)).all()
+    # 点数最少：再少一个点（仍≥2）就会超出误差上限
+    fewer = counts > 2
+    assert (chord_error(RADII_PX[fewer], counts[fewer] - 1) > max_chord_error).all()
+    # 半径不超过误差上限时直线即可
+    assert (counts[RADII_PX <= max_chord_error] == 2).all()
+
+
+def test_mesh_grid_vertices_within_chord_error():
+    all_points = np.array([0, 0.4, 1.0])
+    theta = np.linspace(0, 2 * np.pi, 13)[::-1]
+    x, y, seg = build_mesh_grid(all_points, theta, 300.0, 0.25)
+    assert x.shape == (3, 12 * seg + 1)
+    # 相邻顶点连线中点到圆心的距离与半径之差即弦高误差（像素）
+    mid = np.hypot(x[-1, 1:] + x[-1, :-1], y[-1, 1:] + y[-1, :-1]) / 2 * 300.0
+    assert (300.0 - mid).max() <= 0.25 * (1 + 1e-9)
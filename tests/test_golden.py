@@ -0,0 +1,55 @@
+import json
+import pathlib
+import numpy as np
+import pytest
+from pizza_plot_golden import (
+    GOLDEN_CASES, MANIFEST_NAME, check_golden, compare_images, environment_versions, format_results,
+)
+
+GOLDEN_DIR = pathlib.Path(__file__).parent / "golden"
+
+
+def _manifest():
+    return json.loads((GOLDEN_DIR / MANIFEST_NAME).read_text(encoding='utf-8'))
+
+
+@pytest.mark.parametrize("case", GOLDEN_CASES, ids=[case["name"] for case in GOLDEN_CASES])
+def test_matches_reference(case):
+    manifest = _manifest()
+    mismatched = {k: (manifest.get(k), v) for k, v in environment_versions().items() if manifest.get(k) != v}
+    if mismatched:
+        pytest.skip(f"参考图生成环境不同（参考, 当前）：{mismatched}")
+    result = check_golden(GOLDEN_DIR, [case["name"]], repeat=1)[0]
+    assert result["passed"], format_results([result])
+
+
+def test_references_come_from_baseline():
+    cases = _manifest()["cases"]
+    assert set(cases) == {case["name"] for case in GOLDEN_CASES}
+    for case in GOLDEN_CASES:
+        expected = "current" if case.get("baseline", True) is False else "baseline"
+        assert cases[case["name"]]["source"].startswith(expected)
+
+
+def _reference():
+    image = np.full((60, 60, 4), 255, dtype=np.uint8)
+    image[10:50, 10:50, :3] = (0, 0, 128)
+    image[10:50, 30:50, :3] = (255, 171, 0)
+    return image
+
+
+def test_compare_tolerates_edge_shift():
+    reference = _reference()
+    shifted = np.roll(reference, 1, axis=1)
+    assert compare_images(reference, shifted)["passed"]
+
+
+def test_compare_flags_recoloured_block():
+    reference = _reference()
+    image = reference.copy()
+    image[20:26, 14:20, :3] = (0, 255, 0)
+    result = compare_images(reference, image)
+    assert not result["passed"] and result["solid_pixels"] > 0
+    ignore = np.zeros(reference.shape[:2], dtype=bool)
+    ignore[18:28, 12:22] = True
+    assert compare_images(reference, image, ignore=ignore)["passed"]
@@ -0,0 +1,52 @@
+import pytest
+import pizza_plot_logic
+from pizza_plot_logic import PizzaPlotLogic
+
+
+def _logic_with_plots(count):
+    logic = PizzaPlotLogic()
+    logic.set_scale_mode('percentile')
+    config = logic.parse_config("2", "3", "9", False, "", "10", False, "")
+    ids = [logic.create_plot_item(config) for _ in range(count)]
+    return logic, ids
+
+
+@pytest.mark.parametrize("deleted", ["plot_1", "plot_2"])
+def test_update_plot_data_rejects_item_deleted_while_parsing(deleted):
+    logic, _ = _logic_with_plots(3)
+    parse = logic._parse_data_str
+
+    def parse_then_delete(*args):
+        data = parse(*args)
+        logic.delete_plot_item("plot_1")  # 删除 plot_1 本身，或使 plot_2 重新编号为 plot_1
+        return data
+
+    logic._parse_data_str = parse_then_delete
+    with pytest.raises(ValueError):
+        logic.update_plot_data(deleted, "1,2,3\n4,5,6")
+    assert logic._sketch.count == 2 * 6
+    assert logic.get_global_min_max() == (0, 1)
+
+
+def test_preview_reuses_image_until_inputs_change(monkeypatch):
+    calls = []
+    render = pizza_plot_logic.render_spec_image
+
+    def counting_render(spec, **kwargs):
+        calls.append(spec)
+        return render(spec, **kwargs)
+
+    monkeypatch.setattr(pizza_plot_logic, "render_spec_image", counting_render)
+    logic, ids = _logic_with_plots(2)
+    logic.regenerate_all_plots()
+    images = [logic.render_preview_image(plot_id) for plot_id in ids]
+    assert len(calls) == 2
+    logic.update_plot_data(ids[0], "1,2,3\n4,5,6")  # 色标范围随之变化，两张都需重绘
+    assert len(calls) == 4
+    assert not any(logic.render_preview_image(plot_id) is image for plot_id, image in zip(ids, images))
+    logic.render_preview_image(ids[1], cb_custom_ticks=[0, 3, 6])
+    logic.set_colormap("自定义", ["#000000", "#ffffff"])
+    logic.render_preview_image(ids[1], cb_custom_ticks=[0, 3, 6])
+    logic.set_colormap("自定义", ["#ff0000", "#0000ff"])
+    logic.render_preview_image(ids[1], cb_custom_ticks=[0, 3, 6])
+    assert len(calls) == 7
@@ -0,0 +1,66 @@
+import dataclasses
+import numpy as np
+import pytest
+from pizza_plot_colormap import BAD_INDEX
+from pizza_plot_core import (
+    map_color_indices, generate_spec_plot, render_spec_image, pizza_sector_table, RENDER_MODES
+)
+from pizza_plot_export import render_figure_rgba
+from pizza_plot_logic import PizzaPlotLogic
+from pizza_plot_spec import build_plot_spec
+
+NAN_CELL = (2, 5)
+
+
+def _spec(render_mode, custom_ticks=None):
+    data = np.random.default_rng(0).random((4, 12))
+    data[NAN_CELL] = np.nan
+    params = {"render_mode": render_mode, "custom_ticks": custom_ticks}
+    return dataclasses.replace(build_plot_spec(params, data), figsize=(4, 4), dpi=100)
+
+
+def _cell_pixel(rgba, ax, layer, block, spec):
+    """单元中心点在图像中的像素"""
+    table = pizza_sector_table(spec)
+    row = layer * spec.n_blocks + block
+    r = (table["r_inner"][row] + table["r_outer"][row]) / 2 * ax.get_xlim()[1]
+    theta = (table["theta_start"][row] + table["theta_end"][row]) / 2
+    x, y = ax.transData.transform((r * np.cos(theta), r * np.sin(theta)))
+    return rgba[rgba.shape[0] - int(y) - 1, int(x)]
+
+
+def test_map_color_indices_sends_nonfinite_to_bad_slot():
+    data = np.array([[0.0, np.nan, 1.0], [np.inf, -np.inf, 0.5]])
+    index = map_color_indices(data, 0.0, 1.0)
+    assert index[0, 1] == index[1, 0] == index[1, 1] == BAD_INDEX
+    assert index[0, 0] == 0 and index[0, 2] == BAD_INDEX - 1
+
+
+@pytest.mark.parametrize("custom_ticks", [None, "0,0.5,1"])
+@pytest.mark.parametrize("render_mode", RENDER_MODES)
+def test_nan_cell_is_transparent(render_mode, custom_ticks):
+    spec = _spec(render_mode, custom_ticks)
+    assert np.isfinite([spec.vmin, spec.vmax]).all()
+    fig, ax = generate_spec_plot(spec, target_dpi=100)
+    rgba = render_figure_rgba(fig, 100, transparent=True)
+    assert _cell_pixel(rgba, ax, *NAN_CELL, spec)[3] == 0
+    assert _cell_pixel(rgba, ax, NAN_CELL[0], NAN_CELL[1] + 1, spec)[3] == 255
+    table = pizza_sector_table(spec)
+    assert table["rgba"][NAN_CELL[0] * spec.n_blocks + NAN_CELL[1], 3] == 0
+
+
+@pytest.mark.parametrize("render_mode", RENDER_MODES)
+def test_nan_cell_in_thumbnail_template(render_mode):
+    spec = _spec(render_mode)
+    clean = dataclasses.replace(spec, data=np.nan_to_num(spec.data, nan=0.0))
+    diff = np.any(render_spec_image(spec) != render_spec_image(clean), axis=-1)
+    assert diff.any()
+
+
+def test_logic_accepts_nan_with_custom_ticks():
+    logic = PizzaPlotLogic()
+    plot_id = logic.create_plot_item(logic.parse_config("3", "4", "9", False, "", "10", False, ""))
+    logic.update_plot_data(plot_id, "1,2,3,4\n5,nan,7,8\n9,10,11,12")
+    assert logic.get_global_min_max() == (1.0, 12.0)
+    logic.generate_plot_fig(plot_id, cb_custom_ticks=[0, 5, 10], is_preview=False)
+    logic.render_preview_image(plot_id, cb_custom_ticks=[0, 5, 10])
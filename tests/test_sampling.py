@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from pizza_plot_core import pizza_cells_at, sample_pizza_points
+
+LAYER_POINTS = [0.3, 0.6]
+
+
+def _polar(r, deg):
+    t = np.deg2rad(deg)
+    return r * np.cos(t), r * np.sin(t)
+
+
+def test_cells_at_layers_and_clockwise_blocks():
+    # 块自0°起顺时针编号：-10°在第0块，+10°在最后一块
+    x, y = _polar(np.array([0.1, 0.45, 0.8, 0.45, 0.45, 1.2]), np.array([-10, -100, -190, 10, 100, 45]))
+    layer, block = pizza_cells_at(x, y, LAYER_POINTS, 4)
+    np.testing.assert_array_equal(layer, [0, 1, 2, 1, 1, -1])
+    np.testing.assert_array_equal(block, [0, 1, 2, 3, 2, -1])
+
+
+@pytest.mark.parametrize("y", [0.0, -0.0, 1e-300, -1e-300])
+def test_cells_at_theta_wraparound(y):
+    # θ=2π-ε 舍入到2π时需回绕到第0块，不能越界成 n_blocks
+    layer, block = pizza_cells_at(0.5, y, LAYER_POINTS, 4)
+    assert (layer, block) == (1, 0)
+
+
+def test_cells_at_just_below_full_turn():
+    # 紧贴+x轴上方的点 θ 略小于2π，仍属最后一块
+    layer, block = pizza_cells_at(0.5, 1e-9, LAYER_POINTS, 4)
+    assert (layer, block) == (1, 3)
+
+
+def test_sample_points_scaled_radius_and_fill():
+    data = np.arange(12, dtype=float).reshape(3, 4)
+    x, y = _polar(np.array([[0.0, 0.9], [2.0, 2.1]]) * 2, np.array([[0, -95], [-280, 0]]))
+    values = sample_pizza_points(data, LAYER_POINTS, x, y, radius=2.0, fill=-1.0)
+    assert values.shape == (2, 2)
+    np.testing.assert_array_equal(values, [[0, 9], [-1, -1]])
+
+
+def test_sample_points_rejects_wrong_layer_count():
+    with pytest.raises(ValueError):
+        sample_pizza_points(np.zeros((3, 4)), [0.5], 0.0, 0.0)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from pizza_plot_scale import DEFAULT_RELATIVE_ACCURACY, QuantileSketch, resolve_color_range
+
+QS = np.linspace(0, 1, 21)
+
+
+def _data(seed=0, size=20000):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(0, 3, size) * rng.choice([-1, 1], size)
+    values[::97] = 0.0
+    return values
+
+
+def _assert_quantiles_close(sketch, values):
+    # 草图取第 floor(q×(n-1)) 个值所在的桶，对应 numpy 的 method='lower'
+    expected = np.quantile(values, QS, method='lower')
+    np.testing.assert_allclose(sketch.quantile(QS), expected, rtol=DEFAULT_RELATIVE_ACCURACY, atol=0)
+
+
+def test_add_quantiles_within_relative_accuracy():
+    values = _data()
+    sketch = QuantileSketch().add(values[:5000]).add(np.concatenate([values[5000:], [np.nan, np.inf]]))
+    assert sketch.count == values.size
+    _assert_quantiles_close(sketch, values)
+
+
+def test_remove_matches_sketch_of_remaining_data():
+    values = _data()
+    sketch = QuantileSketch().add(values).remove(values[:8000])
+    assert sketch.to_dict() == QuantileSketch().add(values[8000:]).to_dict()
+    _assert_quantiles_close(sketch, values[8000:])
+    assert sketch.remove(values[8000:]).count == 0
+
+
+@pytest.mark.parametrize("removed", [
+    np.array([12345.0]),        # 从未加入过的桶
+    np.array([0.0, 0.0]),       # 零桶计数不够
+    np.full(3, 1.0),            # 同一桶移除次数多于加入次数
+])
+def test_remove_never_added_raises_and_keeps_sketch(removed):
+    sketch = QuantileSketch().add([0.0, 1.0, 1.0, -2.0])
+    before = sketch.to_dict()
+    with pytest.raises(ValueError):
+        sketch.remove(np.concatenate([[-2.0], removed]))
+    assert sketch.to_dict() == before
+
+
+def test_merge_is_order_independent():
+    values = _data()
+    shards = np.array_split(values, 5)
+    forward = QuantileSketch()
+    for shard in shards:
+        forward.merge(QuantileSketch().add(shard))
+    backward = QuantileSketch()
+    for shard in shards[::-1]:
+        backward.merge(QuantileSketch().add(shard))
+    assert forward.to_dict() == backward.to_dict() == QuantileSketch().add(values).to_dict()
+    _assert_quantiles_close(forward, values)
+    with pytest.raises(ValueError):
+        forward.merge(QuantileSketch(relative_accuracy=1e-2))
+
+
+def test_resolve_percentile_range_ignores_outlier():
+    values = np.concatenate([np.arange(1.0, 101.0), [1e6]])
+    sketch = QuantileSketch().add(values)
+    lo, hi = resolve_color_range(values.min(), values.max(), 'percentile', sketch, (1, 99))
+    np.testing.assert_allclose([lo, hi], np.quantile(values, [0.01, 0.99], method='lower'),
+                               rtol=DEFAULT_RELATIVE_ACCURACY)
+    # 0/100 两端取精确极值
+    assert resolve_color_range(values.min(), values.max(), 'percentile', sketch, (0, 100)) == (1.0, 1e6)
+
+
+@pytest.mark.parametrize("sketch, percentiles", [(None, (1, 99)), ("sketch", (99, 1)), ("sketch", (-1, 50))])
+def test_resolve_percentile_range_rejects_bad_args(sketch, percentiles):
+    sketch = QuantileSketch().add([1.0, 2.0]) if sketch else None
+    with pytest.raises(ValueError):
+        resolve_color_range(1.0, 2.0, 'percentile', sketch, percentiles)
+
+
+def test_resolve_symmetric_and_degenerate_ranges():
+    assert resolve_color_range(-2.0, 5.0, 'symmetric') == (-5.0, 5.0)
+    assert resolve_color_range(-7.0, 3.0, 'symmetric') == (-7.0, 7.0)
+    assert resolve_color_range(0.0, 0.0, 'symmetric') == (0, 1)
+    assert resolve_color_range(3.0, 3.0, 'minmax') == (0, 1)
+    with pytest.raises(ValueError):
+        resolve_color_range(0.0, 1.0, 'log')
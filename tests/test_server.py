@@ -0,0 +1,79 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from pizza_plot_server import MAX_DPI, RenderService, make_server
+
+
+@pytest.fixture
+def server_url():
+    server, service = make_server(port=0, workers=1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.shutdown()
+
+
+def _post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+@pytest.mark.parametrize("payload", [
+    {"vmin": [0, 1], "vmax": 2},
+    {"vmin": "abc"},
+    {"vmax": "nan"},
+    {"cb_font_size": "big"},
+    {"cb_font_size": 0},
+    {"cb_custom_ticks": "0,x,1"},
+    {"cmap": "no_such_cmap"},
+    {"dpi": MAX_DPI + 1},
+    {"dpi": 0},
+])
+def test_colorbar_rejects_bad_params(server_url, payload):
+    status, _ = _post(server_url + "/render/colorbar", payload)
+    assert status == 400
+
+
+def test_colorbar_renders(server_url):
+    status, body = _post(server_url + "/render/colorbar", {"vmin": 0, "vmax": 2, "cb_font_size": 8, "dpi": 50})
+    assert status == 200 and body.startswith(b"\x89PNG")
+
+
+@pytest.mark.parametrize("params", [
+    {"dpi": MAX_DPI * 10},
+    {"layer_points": "nan"},
+    {"layer_points": ["inf"]},
+    {"custom_ticks": "0,nan,1"},
+    {"custom_ticks": [0, "inf"]},
+])
+def test_plot_rejects_bad_params(server_url, params):
+    status, _ = _post(server_url + "/render/plot", dict(params, data=[[0, 1], [1, 0]]))
+    assert status == 400
+
+
+@pytest.mark.parametrize("length", ["abc", "-1"])
+def test_malformed_content_length_is_400(server_url, length):
+    host, port = server_url.rsplit("/", 1)[1].split(":")
+    with socket.create_connection((host, int(port)), timeout=30) as sock:
+        sock.sendall(f"POST /render/colorbar HTTP/1.0\r\nContent-Length: {length}\r\n\r\n".encode('ascii'))
+        assert sock.makefile('rb').readline().split()[1] == b"400"
+
+
+def test_submit_maps_unexpected_errors_to_500():
+    service = RenderService(workers=1)
+    try:
+        status, body = service.submit("k", lambda: 1 / 0)
+        assert status == 500 and b"ZeroDivisionError" in body
+        assert service.submit("k2", lambda: b"ok") == (200, b"ok")
+    finally:
+        service.shutdown()
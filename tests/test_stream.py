@@ -0,0 +1,60 @@
+import time
+import queue
+import threading
+import numpy as np
+import pytest
+from pizza_plot_logic import PizzaPlotLogic
+from pizza_plot_stream import PlotStream, _decode_chunks, _iter_text_frames
+
+
+def _wait_for_frame(logic, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        updated, _ = logic.poll_streams()
+        if updated:
+            return updated
+        time.sleep(0.02)
+    raise AssertionError("流数据超时未到达")
+
+
+def test_queue_stream_copies_producer_array():
+    logic = PizzaPlotLogic()
+    plot_id = logic.create_plot_item(logic.parse_config("2", "3", "9", False, "", "10", False, ""))
+    source = queue.Queue()
+    stream = logic.start_stream(plot_id, source, kind='queue', max_fps=1000)
+    try:
+        buffer = np.arange(6, dtype=logic.storage_dtype).reshape(2, 3)
+        source.put(buffer)
+        assert _wait_for_frame(logic) == [plot_id]
+        buffer[...] = -1  # 生产者原地复用自己的缓冲
+        assert buffer.flags.writeable
+        np.testing.assert_array_equal(logic.get_plot_item(plot_id)["data"], np.arange(6).reshape(2, 3))
+    finally:
+        stream.stop()
+
+
+def test_multibyte_character_split_across_chunks():
+    payload = "1,2　\n3,4\n\n".encode('utf-8')
+    cut = payload.index("　".encode('utf-8')) + 1  # 在全角空格的3个字节中间切开
+    chunks = iter([payload[:cut], b"", payload[cut:], None])
+    read_chunk = _decode_chunks(lambda: next(chunks))
+    frames = list(_iter_text_frames(read_chunk, threading.Event()))
+    assert frames == ["1,2\n3,4"]  # 行首尾空白（含全角空格）已去掉
+
+
+def test_truncated_character_at_end_is_reported():
+    chunks = iter(["1,2　".encode('utf-8')[:-1], None])
+    read_chunk = _decode_chunks(lambda: next(chunks))
+    with pytest.raises(UnicodeDecodeError):
+        list(_iter_text_frames(read_chunk, threading.Event()))
+
+
+def test_reader_exception_is_stored_on_stream():
+    def reader(stop_event):
+        yield "1,2\n3,4"
+        raise UnicodeDecodeError('utf-8', b"\xff", 0, 1, "invalid start byte")
+
+    stream = PlotStream(reader, lambda raw: raw).start()
+    stream.stop(timeout=5.0)
+    assert isinstance(stream.error, UnicodeDecodeError)
+    assert stream.received == 1
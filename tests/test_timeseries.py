@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+import pizza_plot_timeseries
+from pizza_plot_timeseries import write_pizza_timeseries
+
+
+@pytest.mark.parametrize("render_mode", ["mesh", "polygon"])
+def test_png_frames_forward_chord_error(tmp_path, monkeypatch, render_mode):
+    seen = []
+    original = pizza_plot_timeseries.iter_pizza_frames
+
+    def spy(*args, **kwargs):
+        seen.append(kwargs["max_chord_error"])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(pizza_plot_timeseries, "iter_pizza_frames", spy)
+    series = np.arange(3 * 2 * 4, dtype=float).reshape(3, 2, 4)
+    stats = write_pizza_timeseries(series, tmp_path / "frames", [0.5], fmt='png',
+                                   figsize=(2, 2), dpi=40, max_chord_error=2.0, render_mode=render_mode)
+    assert seen == [2.0]
+    assert sorted(p.name for p in (tmp_path / "frames").iterdir()) == ["frame_0.png", "frame_1.png", "frame_2.png"]
+    assert stats["frames"] == 3